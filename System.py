@@ -1,7 +1,6 @@
 import os
 import sys
 import argparse
-import urllib.parse
 import json
 import gzip
 import io
@@ -12,6 +11,9 @@ import requests
 import pandas as pd
 import numpy as np
 
+from trading_calendar import last_session_on_or_before, previous_sessions
+from universe_ingest import fetch_universe_tape
+
 # ==============================================================================
 # 0. ENGINE CONSTANTS & TERMINAL COLORS
 # ==============================================================================
@@ -45,44 +47,9 @@ def get_dynamic_fno_universe():
         print(f"{COLOR_RED}[API Error] Failed to fetch F&O universe: {e}{COLOR_RESET}")
         return []
 
-def fetch_upstox_candles_for_date(instrument_key, date_str):
-    access_token = os.environ.get("UPSTOX_ACCESS_TOKEN")
-    if not access_token:
-        return None
-    
-    headers = {'Accept': 'application/json', 'Authorization': f'Bearer {access_token}'}
-    today_str = (datetime.utcnow() + timedelta(hours=5, minutes=30)).strftime("%Y-%m-%d")
-    
-    if date_str == today_str:
-        url = f"https://api.upstox.com/v2/historical-candle/intraday/{urllib.parse.quote(instrument_key)}/1minute"
-    else:
-        url = f"https://api.upstox.com/v2/historical-candle/{urllib.parse.quote(instrument_key)}/1minute/{date_str}/{date_str}"
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=5)
-        if response.status_code != 200:
-            return None
-        data = response.json().get('data', {}).get('candles', [])
-        if not data:
-            return None
-        c_df = pd.DataFrame(data, columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume', 'OI'])
-        c_df['Datetime'] = pd.to_datetime(c_df['Timestamp']).dt.tz_localize(None) 
-        c_df = c_df.sort_values('Datetime').reset_index(drop=True)
-        return c_df
-    except:
-        return None
-
 def get_past_trading_days(target_date_str, num_days=20):
     try:
-        target_dt = datetime.strptime(target_date_str, "%Y-%m-%d")
-        trading_days = []
-        current_dt = target_dt
-        while len(trading_days) < num_days:
-            if current_dt.weekday() < 5:  
-                trading_days.append(current_dt.strftime("%Y-%m-%d"))
-            current_dt -= timedelta(days=1)
-        trading_days.reverse()
-        return trading_days
+        return previous_sessions(target_date_str, num_days)
     except Exception as e:
         print(f"{COLOR_RED}[Date Error] {e}{COLOR_RESET}")
         return []
@@ -90,7 +57,70 @@ def get_past_trading_days(target_date_str, num_days=20):
 # ==============================================================================
 # 2. QUAD-DELTA VELOCITY ENGINE & TANDEM LOCK
 # ==============================================================================
-def calculate_velocity_leaderboard(master_df, current_eval_time, rolling_master_df=None, window_mins=15):
+HISTORY_BIN = '15min'
+HISTORY_MAX_COLUMNS = ['Max_Turnover', 'Max_Mom', 'Max_Eff', 'Max_Range']
+
+def _history_bins(rows):
+    """15-min bins per symbol with the four metrics the all-time-high gate compares against."""
+    bins = rows.groupby(['Symbol', pd.Grouper(key='Datetime', freq=HISTORY_BIN)]).agg(
+        {'Turnover': 'sum', 'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'abs_move': 'sum'}
+    ).reset_index()
+    bins = bins[bins['Turnover'] > 0].copy()
+    bins['Max_Turnover'] = bins['Turnover']
+    bins['Max_Mom'] = (((bins['Close'] - bins['Open']) / (bins['Open'] + 1e-8)) * 100).abs()
+    bins['Max_Eff'] = (bins['Close'] - bins['Open']).abs() / (bins['abs_move'] + 1e-8)
+    bins['Max_Range'] = ((bins['High'] - bins['Low']) / (bins['Open'] + 1e-8)) * 100
+    return bins
+
+def build_velocity_history(rolling_master_df):
+    """Builds the 20-day 15-min bar panel ONCE, with a running per-symbol "max so far".
+
+    Each symbol keeps its bin start times (int64 ns, ascending) and the prefix
+    maxima of the four metrics, so the maxima over every bin before a cutoff
+    is one searchsorted per symbol instead of a regroup of the whole window.
+    """
+    if rolling_master_df is None or rolling_master_df.empty:
+        return None
+    raw = rolling_master_df[['Symbol', 'Datetime', 'Turnover', 'Open', 'High', 'Low', 'Close', 'abs_move']]
+    bins = _history_bins(raw)
+    bin_times = bins['Datetime'].to_numpy(dtype='datetime64[ns]').view('i8')
+    # NaN-skipping running max, same as groupby max over the bins seen so far.
+    metrics = bins[HISTORY_MAX_COLUMNS].to_numpy(dtype=np.float64)
+    symbols = {}
+    for sym, idx in bins.groupby('Symbol', sort=False).indices.items():
+        symbols[sym] = (bin_times[idx], np.fmax.accumulate(metrics[idx], axis=0))
+    return {'raw': raw, 'first_time': raw['Datetime'].min(), 'symbols': symbols}
+
+def historical_maxima_before(velocity_history, cutoff):
+    """Per-symbol max 15-min Turnover / |Pct_Move| / Efficiency / Range over all history before `cutoff`.
+
+    Returns None when no tape precedes `cutoff` (the gate is then skipped). A
+    cutoff that is not on a 15-min boundary (live scans) cuts the last bin
+    short, so that partial bin is aggregated from the raw minutes and folded in.
+    """
+    if velocity_history is None or not velocity_history['first_time'] < cutoff:
+        return None
+    bin_start = cutoff.floor(HISTORY_BIN)
+    complete_before = bin_start.value
+
+    syms, rows = [], []
+    for sym, (times, prefix) in velocity_history['symbols'].items():
+        k = np.searchsorted(times, complete_before, side='left')
+        if k:
+            syms.append(sym)
+            rows.append(prefix[k - 1])
+    hist_max = pd.DataFrame(np.array(rows).reshape(-1, len(HISTORY_MAX_COLUMNS)), columns=HISTORY_MAX_COLUMNS)
+    hist_max.insert(0, 'Symbol', syms)
+
+    if cutoff != bin_start:
+        raw = velocity_history['raw']
+        partial = raw[(raw['Datetime'] >= bin_start) & (raw['Datetime'] < cutoff)]
+        if not partial.empty:
+            partial_max = _history_bins(partial)[['Symbol'] + HISTORY_MAX_COLUMNS]
+            hist_max = pd.concat([hist_max, partial_max], ignore_index=True).groupby('Symbol', sort=False).max().reset_index()
+    return hist_max
+
+def calculate_velocity_leaderboard(master_df, current_eval_time, rolling_master_df=None, window_mins=15, velocity_history=None):
     try:
         if master_df is None or master_df.empty or 'Datetime' not in master_df.columns:
             return pd.DataFrame()
@@ -139,38 +169,21 @@ def calculate_velocity_leaderboard(master_df, current_eval_time, rolling_master_
         # NEW CONDITION: CURRENT 15-MIN BLOCK MUST BE THE ALL-TIME HIGH 
         # IN AT LEAST ONE METRIC OVER THE LAST 20 DAYS
         # ------------------------------------------------------------------
-        if rolling_master_df is not None and not rolling_master_df.empty:
-            history_slice = rolling_master_df[rolling_master_df['Datetime'] < recent_start]
-            
-            if not history_slice.empty:
-                # Group 20-day historical data into 15-min bins
-                hist_15m = history_slice.groupby(['Symbol', pd.Grouper(key='Datetime', freq='15min')]).agg(
-                    {'Turnover': 'sum', 'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'abs_move': 'sum'}
-                ).reset_index()
-                
-                hist_15m = hist_15m[hist_15m['Turnover'] > 0]
-                hist_15m['Pct_Move'] = ((hist_15m['Close'] - hist_15m['Open']) / (hist_15m['Open'] + 1e-8)) * 100
-                hist_15m['Efficiency'] = (hist_15m['Close'] - hist_15m['Open']).abs() / (hist_15m['abs_move'] + 1e-8)
-                hist_15m['candle_range'] = ((hist_15m['High'] - hist_15m['Low']) / (hist_15m['Open'] + 1e-8)) * 100
-                
-                # Find the absolute highest 15m values per symbol over the 20 days
-                hist_max = hist_15m.groupby('Symbol').agg(
-                    Max_Turnover=('Turnover', 'max'),
-                    Max_Mom=('Pct_Move', lambda x: x.abs().max()),
-                    Max_Eff=('Efficiency', 'max'),
-                    Max_Range=('candle_range', 'max')
-                ).reset_index()
-                
-                # Filter current 15m block against historical maxes (Must beat the max in at least ONE category)
-                g_rec = pd.merge(g_rec, hist_max, on='Symbol', how='left')
-                g_rec = g_rec[
-                    (g_rec['Turnover'] >= g_rec['Max_Turnover'].fillna(0)) |
-                    (g_rec['Rec_Pct_Move'].abs() >= g_rec['Max_Mom'].fillna(0)) |
-                    (g_rec['Rec_Efficiency'] >= g_rec['Max_Eff'].fillna(0)) |
-                    (g_rec['candle_range'] >= g_rec['Max_Range'].fillna(0))
-                ]
-                
-                if g_rec.empty: return pd.DataFrame()
+        if velocity_history is None and rolling_master_df is not None:
+            velocity_history = build_velocity_history(rolling_master_df)
+        hist_max = historical_maxima_before(velocity_history, recent_start)
+
+        if hist_max is not None:
+            # Filter current 15m block against historical maxes (Must beat the max in at least ONE category)
+            g_rec = pd.merge(g_rec, hist_max, on='Symbol', how='left')
+            g_rec = g_rec[
+                (g_rec['Turnover'] >= g_rec['Max_Turnover'].fillna(0)) |
+                (g_rec['Rec_Pct_Move'].abs() >= g_rec['Max_Mom'].fillna(0)) |
+                (g_rec['Rec_Efficiency'] >= g_rec['Max_Eff'].fillna(0)) |
+                (g_rec['candle_range'] >= g_rec['Max_Range'].fillna(0))
+            ]
+
+            if g_rec.empty: return pd.DataFrame()
         # ------------------------------------------------------------------
 
         merged = pd.merge(g_rec[['Symbol', 'Rec_Pct_Move', 'Close', 'Rec_Vol_Rank', 'Rec_P_Rank', 'Rec_Mom_Rank', 'Rec_Eff_Rank']], 
@@ -232,24 +245,13 @@ def scan_institutional_tape(target_date_str):
 
     print(f"🔄 Backtracing structural memory across {len(trading_days)} trading days...")
 
-    historical_dfs = []
-    for day in trading_days:
-        day_list = []
-        for item in universe:
-            df = fetch_upstox_candles_for_date(item['key'], day)
-            if df is not None and not df.empty:
-                df['Symbol'] = item['symbol']
-                df['Turnover'] = df['Volume'] * df['Close']
-                df['abs_move'] = (df['Close'] - df['Open']).abs()
-                day_list.append(df)
-        if day_list:
-            historical_dfs.append(pd.concat(day_list, ignore_index=True))
-
-    if not historical_dfs:
+    # 🌟 One ranged request per symbol (not per symbol-day), fetched concurrently under the shared rate limit
+    rolling_master_df = fetch_universe_tape(universe, trading_days)
+    if rolling_master_df is None:
         print(f"⚠️ {COLOR_RED}Fatal Error: No valid market data fetched across the window.{COLOR_RESET}")
         return
-
-    rolling_master_df = pd.concat(historical_dfs, ignore_index=True)
+    # 🌟 15-min history bins + running maxima built once, not regrouped on every leaderboard call
+    velocity_history = build_velocity_history(rolling_master_df)
     
     current_now = datetime.utcnow() + timedelta(hours=5, minutes=30)
     is_live_today = (target_date_str == current_now.strftime("%Y-%m-%d"))
@@ -312,7 +314,7 @@ def scan_institutional_tape(target_date_str):
                                 st['breach_time'] = None
                                 st['breach_days'] = 0
 
-                anomalies = calculate_velocity_leaderboard(day_master, t, rolling_master_df=rolling_master_df, window_mins=15)
+                anomalies = calculate_velocity_leaderboard(day_master, t, window_mins=15, velocity_history=velocity_history)
                 if not anomalies.empty:
                     for _, row in anomalies.iterrows():
                         sym = row['Symbol']
@@ -388,7 +390,7 @@ def scan_institutional_tape(target_date_str):
                             st['state'] = 'ACTIVE'
                             st['breach_time'] = None
 
-            curr_anomalies = calculate_velocity_leaderboard(current_slice, eval_time_current, rolling_master_df=rolling_master_df, window_mins=15)
+            curr_anomalies = calculate_velocity_leaderboard(current_slice, eval_time_current, window_mins=15, velocity_history=velocity_history)
 
             if not curr_anomalies.empty:
                 for _, row in curr_anomalies.iterrows():
@@ -558,13 +560,11 @@ def run_production_sweep():
 
     if not is_backtest:
         target_dt = datetime.utcnow() + timedelta(hours=5, minutes=30)
-        if target_dt.weekday() == 5: 
-            print(f"{COLOR_YELLOW}[System Notice] Market closed (Saturday). Auto-rolling back to Friday's tape.{COLOR_RESET}")
-            target_dt -= timedelta(days=1)
-        elif target_dt.weekday() == 6: 
-            print(f"{COLOR_YELLOW}[System Notice] Market closed (Sunday). Auto-rolling back to Friday's tape.{COLOR_RESET}")
-            target_dt -= timedelta(days=2)
         target_date_str = target_dt.strftime("%Y-%m-%d")
+        session_date_str = last_session_on_or_before(target_date_str)
+        if session_date_str != target_date_str:
+            print(f"{COLOR_YELLOW}[System Notice] Market closed ({target_dt.strftime('%A')}). Auto-rolling back to {pd.Timestamp(session_date_str).day_name()}'s tape ({session_date_str}).{COLOR_RESET}")
+            target_date_str = session_date_str
     else:
         target_date_str = datetime.strptime(raw_date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
     
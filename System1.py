@@ -15,7 +15,6 @@ import gzip
 import io
 import json
 import os
-import random
 import sys
 import time
 import urllib.parse
@@ -26,6 +25,21 @@ import numpy as np
 import pandas as pd
 import requests
 
+from adaptive_concurrency import get_concurrency_limiter
+from bar_aggregator import MultiResolutionBars
+from indicator_kernels import (
+    ewm_com, grouped_cumsum, grouped_ewm_mean, grouped_rolling_max, grouped_rolling_mean,
+    grouped_rolling_median, grouped_rolling_min, grouped_shift,
+)
+from macro_alignment import MacroAlignment
+from pillar_scorecard import ScorecardConfig, pack_pillars, pillar_score
+from rate_limiter import get_rate_limiter
+from renko_kernel import renko_brick_counts
+from symbol_layout import SymbolLayout
+from tape_panel import execution_panel
+from trade_simulator import simulate_episodes
+from trading_calendar import last_session_on_or_before, previous_session, previous_sessions
+
 warnings.filterwarnings("ignore")
 
 # ==============================================================================
@@ -84,10 +98,11 @@ BACKTRACE_DAYS = 2
 MIN_OPT_PREMIUM = 30.0        
 MIN_PREV_DAY_VOLUME = 800000  
 
-MAX_API_WORKERS = 25         
+MAX_API_WORKERS = int(get_concurrency_limiter("UPSTOX").max_limit)  # ceiling; the AIMD controller sets the live fan-out
 
 MICRO_TIMEFRAME = "1min"
 MACRO_TIMEFRAMES = ["20min"]
+SESSION_BAR_ORIGIN = pd.Timestamp("2000-01-01 09:15:00")  # bars align to the 09:15 open
 
 ATR_PERIOD = 14
 RSI_PERIOD = 14
@@ -205,13 +220,17 @@ def get_options_universe():
 
 def safe_api_request(url, headers, is_live=False):
     global _API_ERROR_PRINTED
+    limiter = get_rate_limiter("UPSTOX")
     for attempt in range(5):
         try:
-            res = requests.get(url, headers=headers, timeout=10)
+            limiter.acquire()
+            with get_concurrency_limiter("UPSTOX").request() as outcome:
+                res = requests.get(url, headers=headers, timeout=10)
+                outcome.record(res.status_code)
             if res.status_code == 200:
                 return res.json().get("data", {}).get("candles", [])
             elif res.status_code == 429:
-                time.sleep(random.uniform(0.5, 2.0) * (attempt + 1))  
+                limiter.record_throttle(res.headers.get("Retry-After"))
             else:
                 if not _API_ERROR_PRINTED:
                     print(f"\n{COLOR_RED}[API Error Diagnostic] Upstox returned HTTP {res.status_code}")
@@ -240,6 +259,7 @@ def fetch_latest_spot_prices(spot_instruments, headers, target_date_str):
             chunk_str = ",".join(chunk)
             
             try:
+                get_rate_limiter("UPSTOX").acquire()
                 res = requests.get(
                     "https://api.upstox.com/v2/market-quote/ltp", 
                     params={"instrument_key": chunk_str}, 
@@ -376,7 +396,7 @@ def filter_liquid_options(target_contracts, headers, target_date_str):
     print(f"  ├─ Rules: Prev. Day Close >= ₹{MIN_OPT_PREMIUM} | Prev. Day Vol >= {MIN_PREV_DAY_VOLUME}")
     
     target_dt = dt.strptime(target_date_str, "%Y-%m-%d")
-    prev_day = (target_dt - timedelta(days=1)).strftime("%Y-%m-%d")
+    prev_day = previous_session(target_date_str)
     fifteen_days_ago = (target_dt - timedelta(days=15)).strftime("%Y-%m-%d")
     
     filtered_contracts = []
@@ -417,155 +437,100 @@ def filter_liquid_options(target_contracts, headers, target_date_str):
     return filtered_contracts
 
 def get_past_trading_days(target_date_str, num_days=20):
-    target_dt = dt.strptime(target_date_str, "%Y-%m-%d")
-    trading_days = []
-    current_dt = target_dt
-    while len(trading_days) < num_days:
-        if current_dt.weekday() < 5:
-            trading_days.append(current_dt.strftime("%Y-%m-%d"))
-        current_dt -= timedelta(days=1)
-    trading_days.reverse()
-    return trading_days
+    return previous_sessions(target_date_str, num_days)
 
 
 # ==============================================================================
 # 2. CORE TECHNICAL & 45-DEGREE RENKO ENGINES
 # ==============================================================================
-def calculate_core_technicals(df_tf):
-    df_tf["H-L"] = df_tf["High"] - df_tf["Low"]
-    df_tf["H-PC"] = (df_tf["High"] - df_tf.groupby("Symbol")["Close"].shift(1)).abs()
-    df_tf["L-PC"] = (df_tf["Low"] - df_tf.groupby("Symbol")["Close"].shift(1)).abs()
-    df_tf["TR"] = df_tf[["H-L", "H-PC", "L-PC"]].max(axis=1)
-    df_tf["ATR"] = df_tf.groupby("Symbol")["TR"].transform(lambda x: x.ewm(alpha=1 / ATR_PERIOD, adjust=False).mean())
-    df_tf["ATR"] = df_tf["ATR"].fillna(df_tf["Close"] * RENKO_DEFAULT_PCT)
-
-    delta = df_tf.groupby("Symbol")["Close"].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.groupby(df_tf["Symbol"]).transform(lambda x: x.ewm(alpha=1 / RSI_PERIOD, adjust=False).mean())
-    avg_loss = loss.groupby(df_tf["Symbol"]).transform(lambda x: x.ewm(alpha=1 / RSI_PERIOD, adjust=False).mean())
-    df_tf["RSI"] = 100 - (100 / (1 + (avg_gain / (avg_loss + 1e-8))))
-    df_tf["RSI_SMA"] = df_tf.groupby("Symbol")["RSI"].transform(lambda x: x.rolling(BB_SMA_PERIOD, min_periods=1).mean())
-
-    high_d = df_tf["High"] - df_tf.groupby("Symbol")["High"].shift(1)
-    low_d = df_tf.groupby("Symbol")["Low"].shift(1) - df_tf["Low"]
-    df_tf["+DM"] = np.where((high_d > low_d) & (high_d > 0), high_d, 0)
-    df_tf["-DM"] = np.where((low_d > high_d) & (low_d > 0), low_d, 0)
-
-    df_tf["+DI"] = (100 * (df_tf.groupby("Symbol")["+DM"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean()) / (df_tf["ATR"] + 1e-8)))
-    df_tf["-DI"] = (100 * (df_tf.groupby("Symbol")["-DM"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean()) / (df_tf["ATR"] + 1e-8)))
-    df_tf["DX"] = (100 * abs(df_tf["+DI"] - df_tf["-DI"]) / (df_tf["+DI"] + df_tf["-DI"] + 1e-8))
-    df_tf["ADX"] = df_tf.groupby("Symbol")["DX"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean())
-
-    df_tf["EMA_8"] = df_tf.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=8, adjust=False).mean())
-    df_tf["EMA_21"] = df_tf.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=21, adjust=False).mean())
-    df_tf["EMA_Spread"] = abs(df_tf["EMA_8"] - df_tf["EMA_21"])
-    spread_thresh = df_tf.groupby("Symbol")["EMA_Spread"].transform(lambda x: x.rolling(window=20, min_periods=1).mean()) * 0.20
-    df_tf["EMA_Bull_Expanded"] = (df_tf["EMA_8"] > df_tf["EMA_21"]) & (df_tf["EMA_Spread"] >= spread_thresh)
-    df_tf["EMA_Bear_Expanded"] = (df_tf["EMA_8"] < df_tf["EMA_21"]) & (df_tf["EMA_Spread"] >= spread_thresh)
-
-    lowest_low = df_tf.groupby("Symbol")["Low"].transform(lambda x: x.rolling(window=STOCH_PERIOD, min_periods=1).min())
-    highest_high = df_tf.groupby("Symbol")["High"].transform(lambda x: x.rolling(window=STOCH_PERIOD, min_periods=1).max())
-    df_tf["Stoch_K"] = ((df_tf["Close"] - lowest_low) / (highest_high - lowest_low + 1e-9)) * 100
-    atr_median = df_tf.groupby("Symbol")["ATR"].transform(lambda x: x.rolling(window=50, min_periods=1).median())
-    df_tf["Vol_Pass"] = df_tf["ATR"] >= (atr_median * 0.75)
-    df_tf["Stoch_Bull_Pass"] = (df_tf["Stoch_K"] >= 50) & df_tf["Vol_Pass"]
-    df_tf["Stoch_Bear_Pass"] = (df_tf["Stoch_K"] <= 50) & df_tf["Vol_Pass"]
+def calculate_core_technicals(df_tf, layout=None):
+    # 🌟 Every per-symbol EWM / rolling indicator runs as ONE grouped pass over
+    # symbol-major arrays with segment offsets (indicator_kernels), instead of a
+    # Python lambda per symbol per indicator through groupby().transform().
+    # On the canonical symbol-major tape `layout` makes col/put zero-reorder.
+    # Intermediates (TR, DM, DX, EMAs, Stoch_K...) stay local arrays; only what the
+    # scorecard and the macro export read becomes a column.
+    layout = layout or SymbolLayout.of(df_tf["Symbol"])
+    offsets, put = layout.offsets, layout.scatter
+
+    def col(name):
+        return layout.gather(df_tf[name])
+
+    high, low, close = col("High"), col("Low"), col("Close")
+    prev_close = grouped_shift(close, offsets)
+
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = grouped_ewm_mean(true_range, offsets, ewm_com(alpha=1 / ATR_PERIOD))
+    atr = np.where(np.isnan(atr), close * RENKO_DEFAULT_PCT, atr)
+    df_tf["ATR"] = put(atr)
+
+    delta = close - prev_close
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = -np.where(delta < 0, delta, 0.0)
+    avg_gain = grouped_ewm_mean(gain, offsets, ewm_com(alpha=1 / RSI_PERIOD))
+    avg_loss = grouped_ewm_mean(loss, offsets, ewm_com(alpha=1 / RSI_PERIOD))
+    rsi = 100 - (100 / (1 + (avg_gain / (avg_loss + 1e-8))))
+    df_tf["RSI"] = put(rsi)
+    df_tf["RSI_SMA"] = put(grouped_rolling_mean(rsi, offsets, BB_SMA_PERIOD))
+
+    high_d = high - grouped_shift(high, offsets)
+    low_d = grouped_shift(low, offsets) - low
+    plus_dm = np.where((high_d > low_d) & (high_d > 0), high_d, 0)
+    minus_dm = np.where((low_d > high_d) & (low_d > 0), low_d, 0)
+
+    plus_di = 100 * (grouped_ewm_mean(plus_dm, offsets, ewm_com(alpha=1 / ADX_PERIOD)) / (atr + 1e-8))
+    minus_di = 100 * (grouped_ewm_mean(minus_dm, offsets, ewm_com(alpha=1 / ADX_PERIOD)) / (atr + 1e-8))
+    dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di + 1e-8)
+    df_tf["+DI"] = put(plus_di)
+    df_tf["-DI"] = put(minus_di)
+    df_tf["ADX"] = put(grouped_ewm_mean(dx, offsets, ewm_com(alpha=1 / ADX_PERIOD)))
+
+    ema_8 = grouped_ewm_mean(close, offsets, ewm_com(span=8))
+    ema_21 = grouped_ewm_mean(close, offsets, ewm_com(span=21))
+    ema_spread = np.abs(ema_8 - ema_21)
+    spread_ok = ema_spread >= grouped_rolling_mean(ema_spread, offsets, 20) * 0.20
+    df_tf["EMA_Bull_Expanded"] = layout.scatter((ema_8 > ema_21) & spread_ok)
+    df_tf["EMA_Bear_Expanded"] = layout.scatter((ema_8 < ema_21) & spread_ok)
+
+    lowest_low = grouped_rolling_min(low, offsets, STOCH_PERIOD)
+    highest_high = grouped_rolling_max(high, offsets, STOCH_PERIOD)
+    stoch_k = ((close - lowest_low) / (highest_high - lowest_low + 1e-9)) * 100
+    vol_pass = atr >= (grouped_rolling_median(atr, offsets, 50) * 0.75)
+    df_tf["Stoch_Bull_Pass"] = layout.scatter((stoch_k >= 50) & vol_pass)
+    df_tf["Stoch_Bear_Pass"] = layout.scatter((stoch_k <= 50) & vol_pass)
 
     return df_tf
 
-def construct_45deg_renko_matrix(df, tf_name, confirm_bricks):
-    renko_counts = np.zeros(len(df))
-    for sym, indices in df.groupby("Symbol").indices.items():
-        sub_closes = df["Close"].values[indices]
-        sub_atrs = df["ATR"].values[indices]
-        if len(sub_closes) > 0:
-            counts = np.zeros(len(sub_closes))
-            curr_trend, curr_count, curr_price = 0, 0, sub_closes[0]
-            for i in range(1, len(sub_closes)):
-                bs = max(sub_atrs[i], RENKO_MIN_BRICK)
-                move = sub_closes[i] - curr_price
-                if curr_trend >= 0:
-                    if move >= bs:
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = curr_count + bricks if curr_count > 0 else bricks
-                        curr_price += bricks * bs
-                    elif move <= -(2 * bs):
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = -bricks
-                        curr_price -= bricks * bs
-                else:
-                    if move <= -bs:
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = curr_count - bricks if curr_count < 0 else -bricks
-                        curr_price -= bricks * bs
-                    elif move >= (2 * bs):
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = bricks
-                        curr_price += bricks * bs
-                counts[i] = curr_count
-            renko_counts[indices] = counts
+def construct_45deg_renko_matrix(df, tf_name, confirm_bricks, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    renko_counts = layout.scatter(renko_brick_counts(
+        layout.gather(df["Close"]), layout.gather(df["ATR"]), layout.offsets, RENKO_MIN_BRICK))
     df[f"Renko_Count_{tf_name}"] = renko_counts
     df[f"Renko_Bull_{tf_name}"] = renko_counts >= confirm_bricks
     df[f"Renko_Bear_{tf_name}"] = renko_counts <= -confirm_bricks
     return df
 
-def construct_volume_delta_renko_matrix(df, tf_name, confirm_bricks):
-    df['Wick_Spread'] = df['High'] - df['Low']
-    df['Wick_Spread'] = df['Wick_Spread'].replace(0, 1e-9)
-    df['Delta_Vol'] = df['Volume'] * ((df['Close'] - df['Open']) / df['Wick_Spread'])
-    df['Cum_Delta'] = df.groupby('Symbol')['Delta_Vol'].cumsum()
-    df['Vol_SMA_20'] = df.groupby('Symbol')['Volume'].transform(lambda x: x.rolling(20, min_periods=1).mean()).fillna(100)
-    
-    vol_renko_counts = np.zeros(len(df))
-    for sym, indices in df.groupby("Symbol").indices.items():
-        sub_delta = df["Cum_Delta"].values[indices]
-        sub_bs = df["Vol_SMA_20"].values[indices]
-        if len(sub_delta) > 0:
-            counts = np.zeros(len(sub_delta))
-            curr_trend, curr_count, curr_delta = 0, 0, sub_delta[0]
-            for i in range(1, len(sub_delta)):
-                bs = max(sub_bs[i], 1.0)
-                move = sub_delta[i] - curr_delta
-                if curr_trend >= 0:
-                    if move >= bs:
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = curr_count + bricks if curr_count > 0 else bricks
-                        curr_delta += bricks * bs
-                    elif move <= -(2 * bs):
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = -bricks
-                        curr_delta -= bricks * bs
-                else:
-                    if move <= -bs:
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = curr_count - bricks if curr_count < 0 else -bricks
-                        curr_delta -= bricks * bs
-                    elif move >= (2 * bs):
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = bricks
-                        curr_delta += bricks * bs
-                counts[i] = curr_count
-            vol_renko_counts[indices] = counts
+def construct_volume_delta_renko_matrix(df, tf_name, confirm_bricks, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    high, low, open_, close, volume = (layout.gather(df[c]) for c in ("High", "Low", "Open", "Close", "Volume"))
+    wick_spread = high - low
+    wick_spread[wick_spread == 0] = 1e-9
+    cum_delta = grouped_cumsum(volume * ((close - open_) / wick_spread), layout.offsets)
+    vol_sma = grouped_rolling_mean(volume, layout.offsets, 20)
+    vol_sma[np.isnan(vol_sma)] = 100
+    vol_renko_counts = layout.scatter(renko_brick_counts(cum_delta, vol_sma, layout.offsets, 1.0))
     df[f"Vol_Renko_Count_{tf_name}"] = vol_renko_counts
     df[f"Vol_Renko_Bull_{tf_name}"] = vol_renko_counts >= confirm_bricks
     df[f"Vol_Renko_Bear_{tf_name}"] = vol_renko_counts <= -confirm_bricks
     return df
 
-def construct_renko_velocity_engine(df, tf_name):
-    brick_diff = df.groupby("Symbol")[f"Renko_Count_{tf_name}"].diff().fillna(1)
-    brick_changed = (brick_diff != 0)
-    df["Brick_ID"] = brick_changed.cumsum()
-    df[f"Bars_Since_Brick_{tf_name}"] = df.groupby(["Symbol", "Brick_ID"]).cumcount()
-    df.drop("Brick_ID", axis=1, inplace=True)
+def construct_renko_velocity_engine(df, tf_name, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    counts = layout.gather(df[f"Renko_Count_{tf_name}"])
+    # A new brick (or a symbol's first bar, where the shift is NaN) restarts the bar counter.
+    brick_changed = counts != grouped_shift(counts, layout.offsets)
+    pos = np.arange(len(counts))
+    df[f"Bars_Since_Brick_{tf_name}"] = layout.scatter(pos - np.maximum.accumulate(np.where(brick_changed, pos, 0)))
     
     is_trending_bull = df[f"Renko_Count_{tf_name}"] > 0
     is_trending_bear = df[f"Renko_Count_{tf_name}"] < 0
@@ -579,59 +544,44 @@ def construct_renko_velocity_engine(df, tf_name):
 # ==============================================================================
 # 3. DUAL-TIER SCORECARD SYSTEM (7 PILLARS)
 # ==============================================================================
-def apply_dual_tier_scorecard(df, tf_str, tier_type):
-    if SYNC_MICRO_WITH_MACRO and tier_type == "MICRO":
-        req_price, req_vol = MACRO_MANDATORY_PRICE_RENKO, MACRO_MANDATORY_VOL_RENKO
-        req_vel = MACRO_MANDATORY_RENKO_VELOCITY
-        req_rsi, req_adx = MACRO_MANDATORY_RSI_BB, MACRO_MANDATORY_ADX_DMI
-        req_ema, req_stoch = MACRO_MANDATORY_EMA_SPREAD, MACRO_MANDATORY_STOCHASTIC
-        min_score = MACRO_MINIMUM_SCORE
-    else:
-        req_price = globals()[f"{tier_type}_MANDATORY_PRICE_RENKO"]
-        req_vol = globals()[f"{tier_type}_MANDATORY_VOL_RENKO"]
-        req_vel = globals()[f"{tier_type}_MANDATORY_RENKO_VELOCITY"]
-        req_rsi = globals()[f"{tier_type}_MANDATORY_RSI_BB"]
-        req_adx = globals()[f"{tier_type}_MANDATORY_ADX_DMI"]
-        req_ema = globals()[f"{tier_type}_MANDATORY_EMA_SPREAD"]
-        req_stoch = globals()[f"{tier_type}_MANDATORY_STOCHASTIC"]
-        min_score = globals()[f"{tier_type}_MINIMUM_SCORE"]
-
-    c_price_bull, c_price_bear = df[f"Renko_Bull_{tf_str}"].astype(int), df[f"Renko_Bear_{tf_str}"].astype(int)
-    c_vol_bull, c_vol_bear = df[f"Vol_Renko_Bull_{tf_str}"].astype(int), df[f"Vol_Renko_Bear_{tf_str}"].astype(int)
-    c_vel_bull, c_vel_bear = df[f"Velocity_Bull_{tf_str}"].astype(int), df[f"Velocity_Bear_{tf_str}"].astype(int)
-    c_rsi_bull, c_rsi_bear = (df["RSI"] >= df["RSI_SMA"]).astype(int), (df["RSI"] <= df["RSI_SMA"]).astype(int)
-    c_adx_bull, c_adx_bear = ((df["ADX"] >= ADX_THRESHOLD) & (df["+DI"] > df["-DI"])).astype(int), ((df["ADX"] >= ADX_THRESHOLD) & (df["-DI"] > df["+DI"])).astype(int)
-    c_ema_bull, c_ema_bear = df["EMA_Bull_Expanded"].astype(int), df["EMA_Bear_Expanded"].astype(int)
-    c_stoch_bull, c_stoch_bear = df["Stoch_Bull_Pass"].astype(int), df["Stoch_Bear_Pass"].astype(int)
-
-    df[f"Score_Bull_{tf_str}"] = c_price_bull + c_vol_bull + c_vel_bull + c_rsi_bull + c_adx_bull + c_ema_bull + c_stoch_bull
-    df[f"Score_Bear_{tf_str}"] = c_price_bear + c_vol_bear + c_vel_bear + c_rsi_bear + c_adx_bear + c_ema_bear + c_stoch_bear
-
-    bull_veto, bear_veto = pd.Series(False, index=df.index), pd.Series(False, index=df.index)
-    if req_price: bull_veto, bear_veto = bull_veto | (c_price_bull == 0), bear_veto | (c_price_bear == 0)
-    if req_vol: bull_veto, bear_veto = bull_veto | (c_vol_bull == 0), bear_veto | (c_vol_bear == 0)
-    if req_vel: bull_veto, bear_veto = bull_veto | (c_vel_bull == 0), bear_veto | (c_vel_bear == 0)
-    if req_rsi: bull_veto, bear_veto = bull_veto | (c_rsi_bull == 0), bear_veto | (c_rsi_bear == 0)
-    if req_adx: bull_veto, bear_veto = bull_veto | (c_adx_bull == 0), bear_veto | (c_adx_bear == 0)
-    if req_ema: bull_veto, bear_veto = bull_veto | (c_ema_bull == 0), bear_veto | (c_ema_bear == 0)
-    if req_stoch: bull_veto, bear_veto = bull_veto | (c_stoch_bull == 0), bear_veto | (c_stoch_bear == 0)
-
-    df[f"Armed_Bull_{tf_str}"] = (df[f"Score_Bull_{tf_str}"] >= min_score) & (~bull_veto)
-    df[f"Armed_Bear_{tf_str}"] = (df[f"Score_Bear_{tf_str}"] >= min_score) & (~bear_veto)
+def scorecard_config(tier_type):
+    """The tier's mandatory pillars (PILLARS order) and minimum score."""
+    if tier_type == "MACRO" or SYNC_MICRO_WITH_MACRO:
+        return ScorecardConfig([MACRO_MANDATORY_PRICE_RENKO, MACRO_MANDATORY_VOL_RENKO, MACRO_MANDATORY_RENKO_VELOCITY,
+                                MACRO_MANDATORY_RSI_BB, MACRO_MANDATORY_ADX_DMI, MACRO_MANDATORY_EMA_SPREAD,
+                                MACRO_MANDATORY_STOCHASTIC], MACRO_MINIMUM_SCORE)
+    return ScorecardConfig([MICRO_MANDATORY_PRICE_RENKO, MICRO_MANDATORY_VOL_RENKO, MICRO_MANDATORY_RENKO_VELOCITY,
+                            MICRO_MANDATORY_RSI_BB, MICRO_MANDATORY_ADX_DMI, MICRO_MANDATORY_EMA_SPREAD,
+                            MICRO_MANDATORY_STOCHASTIC], MICRO_MINIMUM_SCORE)
+
+def apply_dual_tier_scorecard(df, tf_str, tier_type, config=None):
+    config = config or scorecard_config(tier_type)
+
+    # 🌟 Seven pillars -> one uint8 bitmask per bar and direction (pillar_scorecard.py):
+    # Score is its popcount, Armed a single lookup in the config's 256-entry table.
+    rsi, rsi_sma, adx, plus_di, minus_di = (df[c].to_numpy() for c in ("RSI", "RSI_SMA", "ADX", "+DI", "-DI"))
+    bull_mask = pack_pillars([
+        df[f"Renko_Bull_{tf_str}"], df[f"Vol_Renko_Bull_{tf_str}"], df[f"Velocity_Bull_{tf_str}"],
+        rsi >= rsi_sma, (adx >= ADX_THRESHOLD) & (plus_di > minus_di), df["EMA_Bull_Expanded"], df["Stoch_Bull_Pass"],
+    ])
+    bear_mask = pack_pillars([
+        df[f"Renko_Bear_{tf_str}"], df[f"Vol_Renko_Bear_{tf_str}"], df[f"Velocity_Bear_{tf_str}"],
+        rsi <= rsi_sma, (adx >= ADX_THRESHOLD) & (minus_di > plus_di), df["EMA_Bear_Expanded"], df["Stoch_Bear_Pass"],
+    ])
+    df[f"Pillars_Bull_{tf_str}"], df[f"Pillars_Bear_{tf_str}"] = bull_mask, bear_mask
+    df[f"Score_Bull_{tf_str}"], df[f"Score_Bear_{tf_str}"] = pillar_score(bull_mask), pillar_score(bear_mask)
+    df[f"Armed_Bull_{tf_str}"], df[f"Armed_Bear_{tf_str}"] = config.armed(bull_mask), config.armed(bear_mask)
     return df
 
-def evaluate_single_timeframe_gates(df_base, tf_str):
-    df_tf = (
-        df_base.groupby(["Symbol", pd.Grouper(key="Datetime", freq=tf_str, closed="left", label="left", origin=pd.Timestamp('2000-01-01 09:15:00'))])
-        .agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
-        .reset_index()
-    )
-    df_tf = df_tf.dropna(subset=["Close"]).sort_values(["Symbol", "Datetime"])
-    df_tf = calculate_core_technicals(df_tf)
+def evaluate_single_timeframe_gates(df_base, tf_str, bars=None):
+    if bars is None:
+        bars = MultiResolutionBars(df_base, origin=SESSION_BAR_ORIGIN)
+    df_tf, layout = bars.bars(tf_str), bars.layout(tf_str)
+    df_tf = calculate_core_technicals(df_tf, layout)
     
-    df_tf = construct_45deg_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS)
-    df_tf = construct_volume_delta_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS)
-    df_tf = construct_renko_velocity_engine(df_tf, tf_str)
+    df_tf = construct_45deg_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS, layout)
+    df_tf = construct_volume_delta_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS, layout)
+    df_tf = construct_renko_velocity_engine(df_tf, tf_str, layout)
     
     df_tf = apply_dual_tier_scorecard(df_tf, tf_str, "MACRO")
     df_tf["Eval_Time"] = df_tf["Datetime"] + pd.to_timedelta(tf_str)
@@ -644,57 +594,54 @@ def evaluate_single_timeframe_gates(df_base, tf_str):
         f"Bars_Since_Brick_{tf_str}", "ATR", "ADX"
     ]
     env_df = df_tf[export_cols].copy().rename(columns={"Eval_Time": "Datetime", "ATR": f"ATR_{tf_str}", "ADX": f"ADX_{tf_str}"})
-    return env_df.sort_values("Datetime").reset_index(drop=True)
+    return env_df
 
 
 # ==============================================================================
 # 4. MICRO EXECUTION TAPE & CONFLUENCE MATCHER
 # ==============================================================================
 def prepare_unified_execution_tape(rolling_master_df, micro_tf, macro_timeframes):
+    # 🌟 ONE symbol-major pass builds the micro bars and every macro tier; coarser
+    # tiers are rolled up from finer ones instead of re-grouping the 1min tape, and
+    # its symbol-major ordering is the canonical layout every stage below shares.
+    bars = MultiResolutionBars(rolling_master_df, origin=SESSION_BAR_ORIGIN).build(macro_timeframes if micro_tf == "1min" else [micro_tf, *macro_timeframes])
     if micro_tf != "1min":
-        df_micro = (
-            rolling_master_df.groupby(["Symbol", pd.Grouper(key="Datetime", freq=micro_tf, closed="left", label="left", origin=pd.Timestamp('2000-01-01 09:15:00'))])
-            .agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
-            .reset_index()
-        )
-        df_micro = df_micro.dropna(subset=["Close"]).sort_values(["Symbol", "Datetime"])
+        df_micro, layout = bars.bars(micro_tf), bars.layout(micro_tf)
     else:
-        df_micro = rolling_master_df.sort_values(["Symbol", "Datetime"]).copy()
+        df_micro, layout = rolling_master_df.take(bars.rows).reset_index(drop=True), bars.layout()
 
-    df_micro = calculate_core_technicals(df_micro)
-    df_micro = construct_45deg_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS)
-    df_micro = construct_volume_delta_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS)
-    df_micro = construct_renko_velocity_engine(df_micro, micro_tf)
+    df_micro = calculate_core_technicals(df_micro, layout)
+    df_micro = construct_45deg_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS, layout)
+    df_micro = construct_volume_delta_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS, layout)
+    df_micro = construct_renko_velocity_engine(df_micro, micro_tf, layout)
     df_micro = apply_dual_tier_scorecard(df_micro, micro_tf, "MICRO")
-    df_micro = df_micro.sort_values("Datetime").reset_index(drop=True)
+    # 🌟 Macro tiers are gathered by index onto the tape in its symbol-major order
+    # (no per-tier merge_asof, copy or re-sort).
+    alignment = MacroAlignment(df_micro)
 
     bull_gate_cols, bear_gate_cols = [], []
     for tf in macro_timeframes:
         print(f"   ├─ Evaluating Macro Context Gates + Price/Vol/Vel Renko for [{tf}]...")
-        env_df = evaluate_single_timeframe_gates(rolling_master_df, tf)
-        env_df = env_df.sort_values("Datetime").reset_index(drop=True)
+        env_df = evaluate_single_timeframe_gates(rolling_master_df, tf, bars)
         
         bull_col, bear_col = f"Armed_Bull_{tf}", f"Armed_Bear_{tf}"
         bull_gate_cols.append(bull_col)
         bear_gate_cols.append(bear_col)
         
-        df_micro = pd.merge_asof(df_micro, env_df, on="Datetime", by="Symbol", direction="backward")
-        df_micro[bull_col] = df_micro[bull_col].fillna(False)
-        df_micro[bear_col] = df_micro[bear_col].fillna(False)
-        df_micro[f"Score_Bull_{tf}"] = df_micro[f"Score_Bull_{tf}"].fillna(0).astype(int)
-        df_micro[f"Score_Bear_{tf}"] = df_micro[f"Score_Bear_{tf}"].fillna(0).astype(int)
-        df_micro[f"Renko_Count_{tf}"] = df_micro[f"Renko_Count_{tf}"].fillna(0).astype(int)
-        df_micro[f"Vol_Renko_Count_{tf}"] = df_micro[f"Vol_Renko_Count_{tf}"].fillna(0).astype(int)
+        alignment.attach(df_micro, env_df, fills={
+            bull_col: False, bear_col: False,
+            f"Score_Bull_{tf}": 0, f"Score_Bear_{tf}": 0,
+            f"Renko_Count_{tf}": 0, f"Vol_Renko_Count_{tf}": 0,
+        })
 
     df_micro["Master_Armed_Bull"] = df_micro[bull_gate_cols].any(axis=1)
     df_micro["Master_Armed_Bear"] = df_micro[bear_gate_cols].any(axis=1)
-    df_micro = df_micro.sort_values(["Symbol", "Datetime"]).reset_index(drop=True)
 
     df_micro["Trigger_Bull"] = df_micro["Master_Armed_Bull"] & df_micro[f"Armed_Bull_{micro_tf}"]
     df_micro["Trigger_Bear"] = df_micro["Master_Armed_Bear"] & df_micro[f"Armed_Bear_{micro_tf}"]
 
-    df_micro["Trigger_Bull_Prev"] = df_micro.groupby("Symbol")["Trigger_Bull"].shift(1).fillna(False)
-    df_micro["Trigger_Bear_Prev"] = df_micro.groupby("Symbol")["Trigger_Bear"].shift(1).fillna(False)
+    df_micro["Trigger_Bull_Prev"] = layout.scatter(grouped_shift(layout.gather(df_micro["Trigger_Bull"]), layout.offsets) == 1)
+    df_micro["Trigger_Bear_Prev"] = layout.scatter(grouped_shift(layout.gather(df_micro["Trigger_Bear"]), layout.offsets) == 1)
 
     df_micro["New_Bull"] = df_micro["Trigger_Bull"] & ~df_micro["Trigger_Bull_Prev"]
     df_micro["New_Bear"] = df_micro["Trigger_Bear"] & ~df_micro["Trigger_Bear_Prev"]
@@ -809,90 +756,32 @@ def scan_institutional_tape(target_date_str):
     tape_exec["Direction"] = np.where(tape_exec["Direction"] == 1, 1, 0)
 
     all_anomalies = tape_exec[tape_exec["Direction"] == 1].copy()
-    anomalies_by_time = all_anomalies.groupby("Datetime")
 
-    closes_dict = tape_exec.set_index(["Datetime", "Symbol"])["Close"].to_dict()
-    micro_price_renko = tape_exec.set_index(["Datetime", "Symbol"])[f"Renko_Count_{MICRO_TIMEFRAME}"].to_dict()
-    micro_vol_renko = tape_exec.set_index(["Datetime", "Symbol"])[f"Vol_Renko_Count_{MICRO_TIMEFRAME}"].to_dict()
-    micro_vel_bars = tape_exec.set_index(["Datetime", "Symbol"])[f"Bars_Since_Brick_{MICRO_TIMEFRAME}"].to_dict()
-    
-    macro_price_renkos = {tf: tape_exec.set_index(["Datetime", "Symbol"])[f"Renko_Count_{tf}"].to_dict() for tf in MACRO_TIMEFRAMES}
-    macro_vol_renkos = {tf: tape_exec.set_index(["Datetime", "Symbol"])[f"Vol_Renko_Count_{tf}"].to_dict() for tf in MACRO_TIMEFRAMES}
-    
-    all_times = np.sort(tape_exec["Datetime"].unique())
-    memory_bank = {}
-    cutoff_time_obj = pd.to_datetime(ENTRY_CUTOFF_TIME).time()
+    # 🌟 Dense (time x symbol) panel + event-driven simulator: each episode's exit
+    # is a first-hit lookup over precomputed exit-condition columns instead of a
+    # per-minute walk over every open trade with dict lookups and iterrows().
+    panel = execution_panel(tape_exec, MICRO_TIMEFRAME, MACRO_TIMEFRAMES)
+    episodes_by_sym = simulate_episodes(
+        panel, all_anomalies, MICRO_TIMEFRAME, MACRO_TIMEFRAMES,
+        max_stall_bars=RENKO_VELOCITY_MAX_BARS,
+        micro_price_bricks=MICRO_EXIT_PRICE_BRICKS, micro_vol_bricks=MICRO_EXIT_VOL_BRICKS,
+        macro_price_bricks=MACRO_EXIT_PRICE_BRICKS, macro_vol_bricks=MACRO_EXIT_VOL_BRICKS,
+        entry_cutoff=ENTRY_CUTOFF_TIME, eod_start="15:15", eod_end="16:00", eod_tag="EOD",
+    )
 
-    for t in all_times:
-        t_dt = pd.to_datetime(t)
-        
-        for sym, st in memory_bank.items():
-            if st["state"] == "ACTIVE":
-                ltp = closes_dict.get((t_dt, sym))
-                mi_p_count = micro_price_renko.get((t_dt, sym), 0)
-                mi_v_count = micro_vol_renko.get((t_dt, sym), 0)
-                mi_bars_stalled = micro_vel_bars.get((t_dt, sym), 0)
-
-                if ltp is not None:
-                    exit_reason = None
-                    
-                    if mi_bars_stalled > RENKO_VELOCITY_MAX_BARS:
-                        exit_reason = f"Velocity Stall (No brick in {RENKO_VELOCITY_MAX_BARS} bars)"
-                    
-                    if not exit_reason:
-                        if st["dir"] == 1:
-                            if mi_p_count <= -MICRO_EXIT_PRICE_BRICKS: exit_reason = "Micro Price Reversal"
-                            elif mi_v_count <= -MICRO_EXIT_VOL_BRICKS: exit_reason = "Micro Volume Reversal"
-                            else:
-                                for tf in st["triggering_macro_tfs"]:
-                                    ma_p = macro_price_renkos[tf].get((t_dt, sym), 0)
-                                    ma_v = macro_vol_renkos[tf].get((t_dt, sym), 0)
-                                    if ma_p <= -MACRO_EXIT_PRICE_BRICKS:
-                                        exit_reason = f"Macro [{tf}] Price Break"
-                                        break
-                                    if ma_v <= -MACRO_EXIT_VOL_BRICKS:
-                                        exit_reason = f"Macro [{tf}] Volume Break"
-                                        break
-                    
-                    if exit_reason:
-                        st["state"] = "EXITED"
-                        st["exit_time"] = t_dt.strftime("%Y-%m-%d %H:%M")
-                        st["exit_price"] = ltp
-                        st["exit_reason"] = exit_reason
-
-        if t_dt in anomalies_by_time.groups and t_dt.time() <= cutoff_time_obj:
-            for _, row in anomalies_by_time.get_group(t_dt).iterrows():
-                sym = row["Symbol"]
-                direction = row["Direction"]
-                
-                triggered_m_tfs = []
-                for tf in MACRO_TIMEFRAMES:
-                    armed_col = f"Armed_Bull_{tf}" if direction == 1 else f"Armed_Bear_{tf}"
-                    if row.get(armed_col, False):
-                        triggered_m_tfs.append(tf)
-
-                if sym not in memory_bank or memory_bank[sym]["state"] == "EXITED":
-                    memory_bank[sym] = {
-                        "state": "ACTIVE",
-                        "origin": row["Close"],              
-                        "date": t_dt.strftime("%Y-%m-%d"),
-                        "time": t_dt.strftime("%H:%M"),      
-                        "dir": direction,
-                        "exit_time": None,
-                        "exit_price": None,
-                        "exit_reason": None,
-                        "triggering_macro_tfs": triggered_m_tfs, 
-                        "macro_scores": {tf: row.get(f"Score_Bull_{tf}" if direction == 1 else f"Score_Bear_{tf}", 0) for tf in MACRO_TIMEFRAMES},
-                        "micro_score": row.get(f"Score_Bull_{MICRO_TIMEFRAME}" if direction == 1 else f"Score_Bear_{MICRO_TIMEFRAME}", 0)
-                    }
-
-        if t_dt.hour == 15 and t_dt.minute >= 15:
-            for sym, st in memory_bank.items():
-                if st["state"] == "ACTIVE":
-                    st["state"] = "EXITED"
-                    st["exit_time"] = t_dt.strftime("%Y-%m-%d %H:%M") + " (EOD)"
-                    st["exit_price"] = closes_dict.get((t_dt, sym), st["origin"])
-                    st["exit_reason"] = "End of Day Market Close"
+    def score_column(col):
+        return all_anomalies[col].to_numpy() if col in all_anomalies else np.zeros(len(all_anomalies))
+
+    scores = {(side, tf): score_column(f"Score_{side}_{tf}") for side in ("Bull", "Bear") for tf in MACRO_TIMEFRAMES + [MICRO_TIMEFRAME]}
+
+    # Only each contract's latest episode is tracked, as before.
+    memory_bank = {}
+    for sym, episodes in episodes_by_sym.items():
+        st = episodes[-1]
+        side = "Bull" if st["dir"] == 1 else "Bear"
+        st["macro_scores"] = {tf: scores[(side, tf)][st["entry_row"]] for tf in MACRO_TIMEFRAMES}
+        st["micro_score"] = scores[(side, MICRO_TIMEFRAME)][st["entry_row"]]
+        memory_bank[sym] = st
 
     today_master = tape_exec[tape_exec["Datetime"].dt.date == target_dt.date()]
     if today_master.empty:
@@ -958,9 +847,7 @@ def run_production_sweep():
 
     if not raw_date_str:
         target_dt = get_ist_now()
-        if target_dt.weekday() == 5: target_dt -= timedelta(days=1)
-        elif target_dt.weekday() == 6: target_dt -= timedelta(days=2)
-        target_date_str = target_dt.strftime("%Y-%m-%d")
+        target_date_str = last_session_on_or_before(target_dt.strftime("%Y-%m-%d"))
     else:
         target_date_str = dt.strptime(raw_date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
 
@@ -969,6 +856,8 @@ def run_production_sweep():
         return
 
     scan_institutional_tape(target_date_str)
+    print(f"{COLOR_DIM}{get_rate_limiter('UPSTOX').format_stats()}{COLOR_RESET}")
+    print(f"{COLOR_DIM}{get_concurrency_limiter('UPSTOX').format_stats()}{COLOR_RESET}")
 
 if __name__ == "__main__":
     run_production_sweep()
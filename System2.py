@@ -1,17 +1,19 @@
 import os
 import sys
 import argparse
-import urllib.parse
 import json
 import gzip
 import io
-import time
 from datetime import datetime, timedelta
 
 import requests
 import pandas as pd
 import numpy as np
 
+from async_fetcher import fetch_days
+from trading_calendar import last_session_on_or_before, previous_sessions
+from universe_ingest import fetch_universe_tape
+
 # ==============================================================================
 # 0. ENGINE CONSTANTS & TERMINAL COLORS
 # ==============================================================================
@@ -58,44 +60,9 @@ def get_dynamic_non_fno_universe():
         print(f"{COLOR_RED}[API Error] Failed to fetch Non-F&O universe: {e}{COLOR_RESET}")
         return []
 
-def fetch_upstox_candles_for_date(instrument_key, date_str):
-    access_token = os.environ.get("UPSTOX_ACCESS_TOKEN")
-    if not access_token:
-        return None
-    
-    headers = {'Accept': 'application/json', 'Authorization': f'Bearer {access_token}'}
-    today_str = (datetime.utcnow() + timedelta(hours=5, minutes=30)).strftime("%Y-%m-%d")
-    
-    if date_str == today_str:
-        url = f"https://api.upstox.com/v2/historical-candle/intraday/{urllib.parse.quote(instrument_key)}/1minute"
-    else:
-        url = f"https://api.upstox.com/v2/historical-candle/{urllib.parse.quote(instrument_key)}/1minute/{date_str}/{date_str}"
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=5)
-        if response.status_code != 200:
-            return None
-        data = response.json().get('data', {}).get('candles', [])
-        if not data:
-            return None
-        c_df = pd.DataFrame(data, columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume', 'OI'])
-        c_df['Datetime'] = pd.to_datetime(c_df['Timestamp']).dt.tz_localize(None) 
-        c_df = c_df.sort_values('Datetime').reset_index(drop=True)
-        return c_df
-    except:
-        return None
-
 def get_past_trading_days(target_date_str, num_days=20):
     try:
-        target_dt = datetime.strptime(target_date_str, "%Y-%m-%d")
-        trading_days = []
-        current_dt = target_dt
-        while len(trading_days) < num_days:
-            if current_dt.weekday() < 5:  
-                trading_days.append(current_dt.strftime("%Y-%m-%d"))
-            current_dt -= timedelta(days=1)
-        trading_days.reverse()
-        return trading_days
+        return previous_sessions(target_date_str, num_days)
     except Exception as e:
         print(f"{COLOR_RED}[Date Error] {e}{COLOR_RESET}")
         return []
@@ -211,37 +178,26 @@ def scan_institutional_tape(target_date_str):
     print(f"🔄 Pre-filtering ~{len(universe_raw)} Non-F&O stocks...")
     print(f"   [Parameters] Price: ₹{MIN_PRICE}-₹{MAX_PRICE} | Min Vol: {MIN_DAILY_VOLUME} | Anchor Day: {filter_date}")
     
+    today_str = (datetime.utcnow() + timedelta(hours=5, minutes=30)).strftime("%Y-%m-%d")
+    anchor_candles = fetch_days([item['key'] for item in universe_raw], [filter_date], broker="UPSTOX",
+                                live_day=filter_date if filter_date == today_str else None)
     universe = []
     for item in universe_raw:
-        df = fetch_upstox_candles_for_date(item['key'], filter_date)
+        df = anchor_candles.get(item['key'])
         if df is not None and not df.empty:
             daily_vol = df['Volume'].sum()
             close_px = df['Close'].iloc[-1]
             if MIN_PRICE <= close_px <= MAX_PRICE and daily_vol >= MIN_DAILY_VOLUME:
                 universe.append(item)
-        time.sleep(0.01) # Very slight delay to prevent API 429 Too Many Requests errors
 
     print(f"✅ Filter Complete: Tracked universe narrowed down to {COLOR_GREEN}{len(universe)} qualified stocks{COLOR_RESET}.")
     print(f"🔄 Backtracing structural memory across {len(trading_days)} trading days for qualified universe...")
 
-    historical_dfs = []
-    for day in trading_days:
-        day_list = []
-        for item in universe:
-            df = fetch_upstox_candles_for_date(item['key'], day)
-            if df is not None and not df.empty:
-                df['Symbol'] = item['symbol']
-                df['Turnover'] = df['Volume'] * df['Close']
-                df['abs_move'] = (df['Close'] - df['Open']).abs()
-                day_list.append(df)
-        if day_list:
-            historical_dfs.append(pd.concat(day_list, ignore_index=True))
-
-    if not historical_dfs:
+    # 🌟 One ranged request per symbol (not per symbol-day), fetched concurrently under the shared rate limit
+    rolling_master_df = fetch_universe_tape(universe, trading_days)
+    if rolling_master_df is None:
         print(f"⚠️ {COLOR_RED}Fatal Error: No valid market data fetched across the window.{COLOR_RESET}")
         return
-
-    rolling_master_df = pd.concat(historical_dfs, ignore_index=True)
     
     current_now = datetime.utcnow() + timedelta(hours=5, minutes=30)
     is_live_today = (target_date_str == current_now.strftime("%Y-%m-%d"))
@@ -548,13 +504,11 @@ def run_production_sweep():
 
     if not is_backtest:
         target_dt = datetime.utcnow() + timedelta(hours=5, minutes=30)
-        if target_dt.weekday() == 5: 
-            print(f"{COLOR_YELLOW}[System Notice] Market closed (Saturday). Auto-rolling back to Friday's tape.{COLOR_RESET}")
-            target_dt -= timedelta(days=1)
-        elif target_dt.weekday() == 6: 
-            print(f"{COLOR_YELLOW}[System Notice] Market closed (Sunday). Auto-rolling back to Friday's tape.{COLOR_RESET}")
-            target_dt -= timedelta(days=2)
         target_date_str = target_dt.strftime("%Y-%m-%d")
+        session_date_str = last_session_on_or_before(target_date_str)
+        if session_date_str != target_date_str:
+            print(f"{COLOR_YELLOW}[System Notice] Market closed ({target_dt.strftime('%A')}). Auto-rolling back to {pd.Timestamp(session_date_str).day_name()}'s tape ({session_date_str}).{COLOR_RESET}")
+            target_date_str = session_date_str
     else:
         target_date_str = datetime.strptime(raw_date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
     
@@ -27,6 +27,22 @@ import numpy as np
 import pandas as pd
 import requests
 
+from adaptive_concurrency import get_concurrency_limiter
+from bar_aggregator import MultiResolutionBars
+from indicator_kernels import (
+    ewm_com, grouped_cumsum, grouped_ewm_mean, grouped_rolling_max, grouped_rolling_mean,
+    grouped_rolling_median, grouped_rolling_min, grouped_shift,
+)
+from instrument_master import OptionIndex, load_fyers_segment
+from macro_alignment import MacroAlignment
+from pillar_scorecard import ScorecardConfig, pack_pillars, pillar_score
+from rate_limiter import get_rate_limiter
+from renko_kernel import renko_brick_counts
+from symbol_layout import SymbolLayout
+from tape_panel import execution_panel
+from trade_simulator import simulate_episodes
+from trading_calendar import last_session_on_or_before, previous_sessions
+
 warnings.filterwarnings("ignore")
 
 # ==============================================================================
@@ -120,69 +136,23 @@ ENTRY_CUTOFF_TIME = "14:30"  # Prevent EOD Theta traps
 # ==============================================================================
 def fetch_fyers_instruments(segment):
     """
-    Indestructible Fuzzy Parser for Fyers CSV. 
-    Bypasses rigid column numbers and identifies data by its literal value structure.
+    Index option contracts for `segment` from the shared daily-cached instrument master.
+    Columns are detected by value structure once, in instrument_master, not per line here.
     """
-    url = f"https://public.fyers.in/sym_details/{segment}.csv"
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-        }
-        res = requests.get(url, headers=headers, timeout=15)
-        if res.status_code != 200:
-            print(f"{COLOR_RED}[API Error] HTTP {res.status_code} fetching {segment}{COLOR_RESET}")
-            return []
-            
-        text_data = res.text.strip()
-        lines = text_data.split('\n')
-        print(f"   ├─ {COLOR_DIM}[Data Loader] Downloaded {len(lines)} raw lines from {segment}{COLOR_RESET}")
+        table = OptionIndex(load_fyers_segment(segment)).table
+        print(f"   ├─ {COLOR_DIM}[Data Loader] Loaded {len(table)} option rows from {segment} master{COLOR_RESET}")
 
-        contracts = []
-        
-        for line in lines:
-            parts = line.split(',')
-            if len(parts) < 10:
-                continue
-            
-            symbol = next((p for p in parts if p.startswith("NSE:") or p.startswith("BSE:")), None)
-            if not symbol: continue
-            
-            if "NIFTY" not in symbol and "SENSEX" not in symbol:
-                continue
+        is_index = table["ticker"].str.contains("NIFTY", regex=False) | table["ticker"].str.contains("SENSEX", regex=False)
+        table = table[is_index & table["ticker"].str.match(r"^(NSE|BSE):")]
 
-            opt_type = next((p.strip().upper() for p in parts if p.strip().upper() in ["CE", "PE"]), None)
-            if not opt_type:
-                if symbol.endswith("CE"): opt_type = "CE"
-                elif symbol.endswith("PE"): opt_type = "PE"
-                else: continue
+        contracts = pd.DataFrame({
+            "symbolDetails": table["ticker"],
+            "expiry": table["expiry"].dt.strftime('%Y-%m-%d'),
+            "strikePrice": table["strike"],
+            "optionType": table["opt_type"].astype(str),
+        }).to_dict("records")
 
-            valid_prefixes = tuple(str(i) for i in range(16, 22))
-            expiry_epoch_str = next((p for p in parts if p.isdigit() and len(p) == 10 and p.startswith(valid_prefixes)), None)
-            if not expiry_epoch_str: continue
-            
-            expiry_epoch = int(expiry_epoch_str)
-            expiry_date = datetime.utcfromtimestamp(expiry_epoch).strftime('%Y-%m-%d')
-
-            strike = None
-            for p in reversed(parts):
-                try:
-                    val = float(p)
-                    if 1000.0 <= val <= 200000.0 and val % 50 == 0:
-                        if str(int(val)) != expiry_epoch_str:
-                            strike = val
-                            break
-                except ValueError:
-                    pass
-                    
-            if not strike: continue
-
-            contracts.append({
-                "symbolDetails": symbol,
-                "expiry": expiry_date,
-                "strikePrice": strike,
-                "optionType": opt_type
-            })
-            
         print(f"   ├─ {COLOR_DIM}[Data Loader] Successfully extracted {len(contracts)} Index Options from {segment}{COLOR_RESET}")
         return contracts
     except Exception as e:
@@ -200,6 +170,7 @@ def get_fyers_spot_opening_price_at_0915(spot_key, target_date_str, headers):
         "range_to": target_date_str
     }
     try:
+        get_rate_limiter("FYERS").acquire()
         res = requests.get(url, headers=headers, params=params, timeout=10)
         if res.status_code == 200:
             data = res.json()
@@ -279,153 +250,100 @@ def build_locked_options_universe(target_date_str, headers):
     return selected_option_universe
 
 def get_past_trading_days(target_date_str, num_days=20):
-    target_dt = datetime.strptime(target_date_str, "%Y-%m-%d")
-    trading_days = []
-    current_dt = target_dt
-    while len(trading_days) < num_days:
-        if current_dt.weekday() < 5:
-            trading_days.append(current_dt.strftime("%Y-%m-%d"))
-        current_dt -= timedelta(days=1)
-    trading_days.reverse()
-    return trading_days
+    return previous_sessions(target_date_str, num_days)
 
 
 # ==============================================================================
 # 2. CORE TECHNICAL & RENKO ENGINES
 # ==============================================================================
-def calculate_core_technicals(df_tf):
-    df_tf["H-L"] = df_tf["High"] - df_tf["Low"]
-    df_tf["H-PC"] = (df_tf["High"] - df_tf.groupby("Symbol")["Close"].shift(1)).abs()
-    df_tf["L-PC"] = (df_tf["Low"] - df_tf.groupby("Symbol")["Close"].shift(1)).abs()
-    df_tf["TR"] = df_tf[["H-L", "H-PC", "L-PC"]].max(axis=1)
-    df_tf["ATR"] = df_tf.groupby("Symbol")["TR"].transform(lambda x: x.ewm(alpha=1 / ATR_PERIOD, adjust=False).mean())
-    df_tf["ATR"] = df_tf["ATR"].fillna(df_tf["Close"] * RENKO_DEFAULT_PCT)
-
-    delta = df_tf.groupby("Symbol")["Close"].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.groupby(df_tf["Symbol"]).transform(lambda x: x.ewm(alpha=1 / RSI_PERIOD, adjust=False).mean())
-    avg_loss = loss.groupby(df_tf["Symbol"]).transform(lambda x: x.ewm(alpha=1 / RSI_PERIOD, adjust=False).mean())
-    df_tf["RSI"] = 100 - (100 / (1 + (avg_gain / (avg_loss + 1e-8))))
-    df_tf["RSI_SMA"] = df_tf.groupby("Symbol")["RSI"].transform(lambda x: x.rolling(BB_SMA_PERIOD, min_periods=1).mean())
-
-    high_d = df_tf["High"] - df_tf.groupby("Symbol")["High"].shift(1)
-    low_d = df_tf.groupby("Symbol")["Low"].shift(1) - df_tf["Low"]
-    df_tf["+DM"] = np.where((high_d > low_d) & (high_d > 0), high_d, 0)
-    df_tf["-DM"] = np.where((low_d > high_d) & (low_d > 0), low_d, 0)
-    df_tf["+DI"] = (100 * (df_tf.groupby("Symbol")["+DM"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean()) / (df_tf["ATR"] + 1e-8)))
-    df_tf["-DI"] = (100 * (df_tf.groupby("Symbol")["-DM"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean()) / (df_tf["ATR"] + 1e-8)))
-    df_tf["DX"] = (100 * abs(df_tf["+DI"] - df_tf["-DI"]) / (df_tf["+DI"] + df_tf["-DI"] + 1e-8))
-    df_tf["ADX"] = df_tf.groupby("Symbol")["DX"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean())
-
-    df_tf["EMA_8"] = df_tf.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=8, adjust=False).mean())
-    df_tf["EMA_21"] = df_tf.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=21, adjust=False).mean())
-    df_tf["EMA_Spread"] = abs(df_tf["EMA_8"] - df_tf["EMA_21"])
-    spread_thresh = df_tf.groupby("Symbol")["EMA_Spread"].transform(lambda x: x.rolling(window=20, min_periods=1).mean()) * 0.20
-    df_tf["EMA_Bull_Expanded"] = (df_tf["EMA_8"] > df_tf["EMA_21"]) & (df_tf["EMA_Spread"] >= spread_thresh)
-    df_tf["EMA_Bear_Expanded"] = (df_tf["EMA_8"] < df_tf["EMA_21"]) & (df_tf["EMA_Spread"] >= spread_thresh)
-
-    lowest_low = df_tf.groupby("Symbol")["Low"].transform(lambda x: x.rolling(window=STOCH_PERIOD, min_periods=1).min())
-    highest_high = df_tf.groupby("Symbol")["High"].transform(lambda x: x.rolling(window=STOCH_PERIOD, min_periods=1).max())
-    df_tf["Stoch_K"] = ((df_tf["Close"] - lowest_low) / (highest_high - lowest_low + 1e-9)) * 100
-    atr_median = df_tf.groupby("Symbol")["ATR"].transform(lambda x: x.rolling(window=50, min_periods=1).median())
-    df_tf["Vol_Pass"] = df_tf["ATR"] >= (atr_median * 0.75)
-    df_tf["Stoch_Bull_Pass"] = (df_tf["Stoch_K"] >= 50) & df_tf["Vol_Pass"]
-    df_tf["Stoch_Bear_Pass"] = (df_tf["Stoch_K"] <= 50) & df_tf["Vol_Pass"]
+def calculate_core_technicals(df_tf, layout=None):
+    # 🌟 Every per-symbol EWM / rolling indicator runs as ONE grouped pass over
+    # symbol-major arrays with segment offsets (indicator_kernels), instead of a
+    # Python lambda per symbol per indicator through groupby().transform().
+    # On the canonical symbol-major tape `layout` makes col/put zero-reorder.
+    # Intermediates (TR, DM, DX, EMAs, Stoch_K...) stay local arrays; only what the
+    # scorecard and the macro export read becomes a column.
+    layout = layout or SymbolLayout.of(df_tf["Symbol"])
+    offsets, put = layout.offsets, layout.scatter
+
+    def col(name):
+        return layout.gather(df_tf[name])
+
+    high, low, close = col("High"), col("Low"), col("Close")
+    prev_close = grouped_shift(close, offsets)
+
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = grouped_ewm_mean(true_range, offsets, ewm_com(alpha=1 / ATR_PERIOD))
+    atr = np.where(np.isnan(atr), close * RENKO_DEFAULT_PCT, atr)
+    df_tf["ATR"] = put(atr)
+
+    delta = close - prev_close
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = -np.where(delta < 0, delta, 0.0)
+    avg_gain = grouped_ewm_mean(gain, offsets, ewm_com(alpha=1 / RSI_PERIOD))
+    avg_loss = grouped_ewm_mean(loss, offsets, ewm_com(alpha=1 / RSI_PERIOD))
+    rsi = 100 - (100 / (1 + (avg_gain / (avg_loss + 1e-8))))
+    df_tf["RSI"] = put(rsi)
+    df_tf["RSI_SMA"] = put(grouped_rolling_mean(rsi, offsets, BB_SMA_PERIOD))
+
+    high_d = high - grouped_shift(high, offsets)
+    low_d = grouped_shift(low, offsets) - low
+    plus_dm = np.where((high_d > low_d) & (high_d > 0), high_d, 0)
+    minus_dm = np.where((low_d > high_d) & (low_d > 0), low_d, 0)
+
+    plus_di = 100 * (grouped_ewm_mean(plus_dm, offsets, ewm_com(alpha=1 / ADX_PERIOD)) / (atr + 1e-8))
+    minus_di = 100 * (grouped_ewm_mean(minus_dm, offsets, ewm_com(alpha=1 / ADX_PERIOD)) / (atr + 1e-8))
+    dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di + 1e-8)
+    df_tf["+DI"] = put(plus_di)
+    df_tf["-DI"] = put(minus_di)
+    df_tf["ADX"] = put(grouped_ewm_mean(dx, offsets, ewm_com(alpha=1 / ADX_PERIOD)))
+
+    ema_8 = grouped_ewm_mean(close, offsets, ewm_com(span=8))
+    ema_21 = grouped_ewm_mean(close, offsets, ewm_com(span=21))
+    ema_spread = np.abs(ema_8 - ema_21)
+    spread_ok = ema_spread >= grouped_rolling_mean(ema_spread, offsets, 20) * 0.20
+    df_tf["EMA_Bull_Expanded"] = layout.scatter((ema_8 > ema_21) & spread_ok)
+    df_tf["EMA_Bear_Expanded"] = layout.scatter((ema_8 < ema_21) & spread_ok)
+
+    lowest_low = grouped_rolling_min(low, offsets, STOCH_PERIOD)
+    highest_high = grouped_rolling_max(high, offsets, STOCH_PERIOD)
+    stoch_k = ((close - lowest_low) / (highest_high - lowest_low + 1e-9)) * 100
+    vol_pass = atr >= (grouped_rolling_median(atr, offsets, 50) * 0.75)
+    df_tf["Stoch_Bull_Pass"] = layout.scatter((stoch_k >= 50) & vol_pass)
+    df_tf["Stoch_Bear_Pass"] = layout.scatter((stoch_k <= 50) & vol_pass)
+
     return df_tf
 
-def construct_45deg_renko_matrix(df, tf_name, confirm_bricks):
-    renko_counts = np.zeros(len(df))
-    for sym, indices in df.groupby("Symbol").indices.items():
-        sub_closes = df["Close"].values[indices]
-        sub_atrs = df["ATR"].values[indices]
-        if len(sub_closes) > 0:
-            counts = np.zeros(len(sub_closes))
-            curr_trend, curr_count, curr_price = 0, 0, sub_closes[0]
-            for i in range(1, len(sub_closes)):
-                bs = max(sub_atrs[i], RENKO_MIN_BRICK)
-                move = sub_closes[i] - curr_price
-                if curr_trend >= 0:
-                    if move >= bs:
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = curr_count + bricks if curr_count > 0 else bricks
-                        curr_price += bricks * bs
-                    elif move <= -(2 * bs):
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = -bricks
-                        curr_price -= bricks * bs
-                else:
-                    if move <= -bs:
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = curr_count - bricks if curr_count < 0 else -bricks
-                        curr_price -= bricks * bs
-                    elif move >= (2 * bs):
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = bricks
-                        curr_price += bricks * bs
-                counts[i] = curr_count
-            renko_counts[indices] = counts
+def construct_45deg_renko_matrix(df, tf_name, confirm_bricks, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    renko_counts = layout.scatter(renko_brick_counts(
+        layout.gather(df["Close"]), layout.gather(df["ATR"]), layout.offsets, RENKO_MIN_BRICK))
     df[f"Renko_Count_{tf_name}"] = renko_counts
     df[f"Renko_Bull_{tf_name}"] = renko_counts >= confirm_bricks
     df[f"Renko_Bear_{tf_name}"] = renko_counts <= -confirm_bricks
     return df
 
-def construct_volume_delta_renko_matrix(df, tf_name, confirm_bricks):
-    df['Wick_Spread'] = df['High'] - df['Low']
-    df['Wick_Spread'] = df['Wick_Spread'].replace(0, 1e-9)
-    df['Delta_Vol'] = df['Volume'] * ((df['Close'] - df['Open']) / df['Wick_Spread'])
-    df['Cum_Delta'] = df.groupby('Symbol')['Delta_Vol'].cumsum()
-    df['Vol_SMA_20'] = df.groupby('Symbol')['Volume'].transform(lambda x: x.rolling(20, min_periods=1).mean()).fillna(1000)
-    
-    vol_renko_counts = np.zeros(len(df))
-    for sym, indices in df.groupby("Symbol").indices.items():
-        sub_delta = df["Cum_Delta"].values[indices]
-        sub_bs = df["Vol_SMA_20"].values[indices]
-        if len(sub_delta) > 0:
-            counts = np.zeros(len(sub_delta))
-            curr_trend, curr_count, curr_delta = 0, 0, sub_delta[0]
-            for i in range(1, len(sub_delta)):
-                bs = max(sub_bs[i], 1.0)
-                move = sub_delta[i] - curr_delta
-                if curr_trend >= 0:
-                    if move >= bs:
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = curr_count + bricks if curr_count > 0 else bricks
-                        curr_delta += bricks * bs
-                    elif move <= -(2 * bs):
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = -bricks
-                        curr_delta -= bricks * bs
-                else:
-                    if move <= -bs:
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = curr_count - bricks if curr_count < 0 else -bricks
-                        curr_delta -= bricks * bs
-                    elif move >= (2 * bs):
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = bricks
-                        curr_delta += bricks * bs
-                counts[i] = curr_count
-            vol_renko_counts[indices] = counts
+def construct_volume_delta_renko_matrix(df, tf_name, confirm_bricks, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    high, low, open_, close, volume = (layout.gather(df[c]) for c in ("High", "Low", "Open", "Close", "Volume"))
+    wick_spread = high - low
+    wick_spread[wick_spread == 0] = 1e-9
+    cum_delta = grouped_cumsum(volume * ((close - open_) / wick_spread), layout.offsets)
+    vol_sma = grouped_rolling_mean(volume, layout.offsets, 20)
+    vol_sma[np.isnan(vol_sma)] = 1000
+    vol_renko_counts = layout.scatter(renko_brick_counts(cum_delta, vol_sma, layout.offsets, 1.0))
     df[f"Vol_Renko_Count_{tf_name}"] = vol_renko_counts
     df[f"Vol_Renko_Bull_{tf_name}"] = vol_renko_counts >= confirm_bricks
     df[f"Vol_Renko_Bear_{tf_name}"] = vol_renko_counts <= -confirm_bricks
     return df
 
-def construct_renko_velocity_engine(df, tf_name):
-    brick_diff = df.groupby("Symbol")[f"Renko_Count_{tf_name}"].diff().fillna(1)
-    brick_changed = (brick_diff != 0)
-    df["Brick_ID"] = brick_changed.cumsum()
-    df[f"Bars_Since_Brick_{tf_name}"] = df.groupby(["Symbol", "Brick_ID"]).cumcount()
-    df.drop("Brick_ID", axis=1, inplace=True)
+def construct_renko_velocity_engine(df, tf_name, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    counts = layout.gather(df[f"Renko_Count_{tf_name}"])
+    # A new brick (or a symbol's first bar, where the shift is NaN) restarts the bar counter.
+    brick_changed = counts != grouped_shift(counts, layout.offsets)
+    pos = np.arange(len(counts))
+    df[f"Bars_Since_Brick_{tf_name}"] = layout.scatter(pos - np.maximum.accumulate(np.where(brick_changed, pos, 0)))
     
     is_trending_bull = df[f"Renko_Count_{tf_name}"] > 0
     is_trending_bear = df[f"Renko_Count_{tf_name}"] < 0
@@ -439,52 +357,44 @@ def construct_renko_velocity_engine(df, tf_name):
 # ==============================================================================
 # 3. DUAL-TIER SCORECARD SYSTEM
 # ==============================================================================
-def apply_dual_tier_scorecard(df, tf_str, tier_type):
-    req_price = globals()[f"{tier_type}_MANDATORY_PRICE_RENKO"]
-    req_vol = globals()[f"{tier_type}_MANDATORY_VOL_RENKO"]
-    req_vel = globals()[f"{tier_type}_MANDATORY_RENKO_VELOCITY"]
-    req_rsi = globals()[f"{tier_type}_MANDATORY_RSI_BB"]
-    req_adx = globals()[f"{tier_type}_MANDATORY_ADX_DMI"]
-    req_ema = globals()[f"{tier_type}_MANDATORY_EMA_SPREAD"]
-    req_stoch = globals()[f"{tier_type}_MANDATORY_STOCHASTIC"]
-    min_score = globals()[f"{tier_type}_MINIMUM_SCORE"]
-
-    c_price_bull, c_price_bear = df[f"Renko_Bull_{tf_str}"].astype(int), df[f"Renko_Bear_{tf_str}"].astype(int)
-    c_vol_bull, c_vol_bear = df[f"Vol_Renko_Bull_{tf_str}"].astype(int), df[f"Vol_Renko_Bear_{tf_str}"].astype(int)
-    c_vel_bull, c_vel_bear = df[f"Velocity_Bull_{tf_str}"].astype(int), df[f"Velocity_Bear_{tf_str}"].astype(int)
-    c_rsi_bull, c_rsi_bear = (df["RSI"] >= df["RSI_SMA"]).astype(int), (df["RSI"] <= df["RSI_SMA"]).astype(int)
-    c_adx_bull, c_adx_bear = ((df["ADX"] >= ADX_THRESHOLD) & (df["+DI"] > df["-DI"])).astype(int), ((df["ADX"] >= ADX_THRESHOLD) & (df["-DI"] > df["+DI"])).astype(int)
-    c_ema_bull, c_ema_bear = df["EMA_Bull_Expanded"].astype(int), df["EMA_Bear_Expanded"].astype(int)
-    c_stoch_bull, c_stoch_bear = df["Stoch_Bull_Pass"].astype(int), df["Stoch_Bear_Pass"].astype(int)
-
-    df[f"Score_Bull_{tf_str}"] = c_price_bull + c_vol_bull + c_vel_bull + c_rsi_bull + c_adx_bull + c_ema_bull + c_stoch_bull
-    df[f"Score_Bear_{tf_str}"] = c_price_bear + c_vol_bear + c_vel_bear + c_rsi_bear + c_adx_bear + c_ema_bear + c_stoch_bear
-
-    bull_veto, bear_veto = pd.Series(False, index=df.index), pd.Series(False, index=df.index)
-    if req_price: bull_veto, bear_veto = bull_veto | (c_price_bull == 0), bear_veto | (c_price_bear == 0)
-    if req_vol: bull_veto, bear_veto = bull_veto | (c_vol_bull == 0), bear_veto | (c_vol_bear == 0)
-    if req_vel: bull_veto, bear_veto = bull_veto | (c_vel_bull == 0), bear_veto | (c_vel_bear == 0)
-    if req_rsi: bull_veto, bear_veto = bull_veto | (c_rsi_bull == 0), bear_veto | (c_rsi_bear == 0)
-    if req_adx: bull_veto, bear_veto = bull_veto | (c_adx_bull == 0), bear_veto | (c_adx_bear == 0)
-    if req_ema: bull_veto, bear_veto = bull_veto | (c_ema_bull == 0), bear_veto | (c_ema_bear == 0)
-    if req_stoch: bull_veto, bear_veto = bull_veto | (c_stoch_bull == 0), bear_veto | (c_stoch_bear == 0)
-
-    df[f"Armed_Bull_{tf_str}"] = (df[f"Score_Bull_{tf_str}"] >= min_score) & (~bull_veto)
-    df[f"Armed_Bear_{tf_str}"] = (df[f"Score_Bear_{tf_str}"] >= min_score) & (~bear_veto)
+def scorecard_config(tier_type):
+    """The tier's mandatory pillars (PILLARS order) and minimum score."""
+    if tier_type == "MACRO":
+        return ScorecardConfig([MACRO_MANDATORY_PRICE_RENKO, MACRO_MANDATORY_VOL_RENKO, MACRO_MANDATORY_RENKO_VELOCITY,
+                                MACRO_MANDATORY_RSI_BB, MACRO_MANDATORY_ADX_DMI, MACRO_MANDATORY_EMA_SPREAD,
+                                MACRO_MANDATORY_STOCHASTIC], MACRO_MINIMUM_SCORE)
+    return ScorecardConfig([MICRO_MANDATORY_PRICE_RENKO, MICRO_MANDATORY_VOL_RENKO, MICRO_MANDATORY_RENKO_VELOCITY,
+                            MICRO_MANDATORY_RSI_BB, MICRO_MANDATORY_ADX_DMI, MICRO_MANDATORY_EMA_SPREAD,
+                            MICRO_MANDATORY_STOCHASTIC], MICRO_MINIMUM_SCORE)
+
+def apply_dual_tier_scorecard(df, tf_str, tier_type, config=None):
+    config = config or scorecard_config(tier_type)
+
+    # 🌟 Seven pillars -> one uint8 bitmask per bar and direction (pillar_scorecard.py):
+    # Score is its popcount, Armed a single lookup in the config's 256-entry table.
+    rsi, rsi_sma, adx, plus_di, minus_di = (df[c].to_numpy() for c in ("RSI", "RSI_SMA", "ADX", "+DI", "-DI"))
+    bull_mask = pack_pillars([
+        df[f"Renko_Bull_{tf_str}"], df[f"Vol_Renko_Bull_{tf_str}"], df[f"Velocity_Bull_{tf_str}"],
+        rsi >= rsi_sma, (adx >= ADX_THRESHOLD) & (plus_di > minus_di), df["EMA_Bull_Expanded"], df["Stoch_Bull_Pass"],
+    ])
+    bear_mask = pack_pillars([
+        df[f"Renko_Bear_{tf_str}"], df[f"Vol_Renko_Bear_{tf_str}"], df[f"Velocity_Bear_{tf_str}"],
+        rsi <= rsi_sma, (adx >= ADX_THRESHOLD) & (minus_di > plus_di), df["EMA_Bear_Expanded"], df["Stoch_Bear_Pass"],
+    ])
+    df[f"Pillars_Bull_{tf_str}"], df[f"Pillars_Bear_{tf_str}"] = bull_mask, bear_mask
+    df[f"Score_Bull_{tf_str}"], df[f"Score_Bear_{tf_str}"] = pillar_score(bull_mask), pillar_score(bear_mask)
+    df[f"Armed_Bull_{tf_str}"], df[f"Armed_Bear_{tf_str}"] = config.armed(bull_mask), config.armed(bear_mask)
     return df
 
-def evaluate_single_timeframe_gates(df_base, tf_str):
-    df_tf = (
-        df_base.groupby(["Symbol", pd.Grouper(key="Datetime", freq=tf_str, closed="left", label="left")])
-        .agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
-        .reset_index()
-    )
-    df_tf = df_tf.dropna(subset=["Close"]).sort_values(["Symbol", "Datetime"])
-    df_tf = calculate_core_technicals(df_tf)
+def evaluate_single_timeframe_gates(df_base, tf_str, bars=None):
+    if bars is None:
+        bars = MultiResolutionBars(df_base)
+    df_tf, layout = bars.bars(tf_str), bars.layout(tf_str)
+    df_tf = calculate_core_technicals(df_tf, layout)
     
-    df_tf = construct_45deg_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS)
-    df_tf = construct_volume_delta_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS)
-    df_tf = construct_renko_velocity_engine(df_tf, tf_str)
+    df_tf = construct_45deg_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS, layout)
+    df_tf = construct_volume_delta_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS, layout)
+    df_tf = construct_renko_velocity_engine(df_tf, tf_str, layout)
     
     df_tf = apply_dual_tier_scorecard(df_tf, tf_str, "MACRO")
     df_tf["Eval_Time"] = df_tf["Datetime"] + pd.to_timedelta(tf_str)
@@ -497,42 +407,42 @@ def evaluate_single_timeframe_gates(df_base, tf_str):
         f"Bars_Since_Brick_{tf_str}"
     ]
     env_df = df_tf[export_cols].copy().rename(columns={"Eval_Time": "Datetime"})
-    return env_df.sort_values("Datetime").reset_index(drop=True)
+    return env_df
 
 
 # ==============================================================================
 # 4. MICRO EXECUTION TAPE & CONFLUENCE MATCHER
 # ==============================================================================
 def prepare_unified_execution_tape(rolling_master_df, micro_tf, macro_timeframes):
-    df_micro = rolling_master_df.sort_values(["Symbol", "Datetime"]).copy()
-    
+    # 🌟 Every macro tier comes out of ONE symbol-major pass over the 1min tape, and
+    # that pass's ordering is the tape's canonical layout (no separate sort).
+    bars = MultiResolutionBars(rolling_master_df).build(macro_timeframes)
+    df_micro, layout = rolling_master_df.take(bars.rows).reset_index(drop=True), bars.layout()
+
     df_micro["Datetime"] = pd.to_datetime(df_micro["Datetime"]).astype("datetime64[ns]")
 
-    df_micro = calculate_core_technicals(df_micro)
-    df_micro = construct_45deg_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS)
-    df_micro = construct_volume_delta_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS)
-    df_micro = construct_renko_velocity_engine(df_micro, micro_tf)
+    df_micro = calculate_core_technicals(df_micro, layout)
+    df_micro = construct_45deg_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS, layout)
+    df_micro = construct_volume_delta_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS, layout)
+    df_micro = construct_renko_velocity_engine(df_micro, micro_tf, layout)
     df_micro = apply_dual_tier_scorecard(df_micro, micro_tf, "MICRO")
-    df_micro = df_micro.sort_values("Datetime").reset_index(drop=True)
+    # 🌟 Macro tiers are gathered by index onto the tape in its symbol-major order
+    # (no per-tier merge_asof, copy or re-sort).
+    alignment = MacroAlignment(df_micro)
 
     bull_gate_cols, bear_gate_cols = [], []
     for tf in macro_timeframes:
         print(f"   ├─ Evaluating Macro Context Gates for Options [{tf}]...")
-        env_df = evaluate_single_timeframe_gates(rolling_master_df, tf)
-        
-        env_df["Datetime"] = pd.to_datetime(env_df["Datetime"]).astype("datetime64[ns]")
+        env_df = evaluate_single_timeframe_gates(rolling_master_df, tf, bars)
 
         bull_col, bear_col = f"Armed_Bull_{tf}", f"Armed_Bear_{tf}"
         bull_gate_cols.append(bull_col)
         bear_gate_cols.append(bear_col)
         
-        df_micro = pd.merge_asof(df_micro, env_df, on="Datetime", by="Symbol", direction="backward")
-        df_micro[bull_col] = df_micro[bull_col].fillna(False)
-        df_micro[bear_col] = df_micro[bear_col].fillna(False)
+        alignment.attach(df_micro, env_df, fills={bull_col: False, bear_col: False})
 
     df_micro["Master_Armed_Bull"] = df_micro[bull_gate_cols].any(axis=1)
     df_micro["Master_Armed_Bear"] = df_micro[bear_gate_cols].any(axis=1)
-    df_micro = df_micro.sort_values(["Symbol", "Datetime"]).reset_index(drop=True)
 
     # 🔥 SNIPER MANDATE: Force execution exactly on the minute a new brick is born.
     df_micro["Fresh_Brick"] = df_micro[f"Bars_Since_Brick_{micro_tf}"] == 0
@@ -540,8 +450,8 @@ def prepare_unified_execution_tape(rolling_master_df, micro_tf, macro_timeframes
     df_micro["Trigger_Bull"] = df_micro["Master_Armed_Bull"] & df_micro[f"Armed_Bull_{micro_tf}"] & df_micro["Fresh_Brick"]
     df_micro["Trigger_Bear"] = df_micro["Master_Armed_Bear"] & df_micro[f"Armed_Bear_{micro_tf}"] & df_micro["Fresh_Brick"]
     
-    df_micro["Trigger_Bull_Prev"] = df_micro.groupby("Symbol")["Trigger_Bull"].shift(1).fillna(False)
-    df_micro["Trigger_Bear_Prev"] = df_micro.groupby("Symbol")["Trigger_Bear"].shift(1).fillna(False)
+    df_micro["Trigger_Bull_Prev"] = layout.scatter(grouped_shift(layout.gather(df_micro["Trigger_Bull"]), layout.offsets) == 1)
+    df_micro["Trigger_Bear_Prev"] = layout.scatter(grouped_shift(layout.gather(df_micro["Trigger_Bear"]), layout.offsets) == 1)
 
     df_micro["New_Bull"] = df_micro["Trigger_Bull"] & ~df_micro["Trigger_Bull_Prev"]
     
@@ -593,9 +503,13 @@ def scan_fyers_institutional_tape(target_date_str):
                 "range_to": end_date
             }
             
+            limiter = get_rate_limiter("FYERS")
             for attempt in range(3):
                 try:
-                    res = requests.get(url, headers=headers, params=params, timeout=15)
+                    limiter.acquire()
+                    with get_concurrency_limiter("FYERS").request() as outcome:
+                        res = requests.get(url, headers=headers, params=params, timeout=15)
+                        outcome.record(res.status_code)
                     if res.status_code == 200:
                         data = res.json()
                         if data.get("s") == "ok" and data.get("candles"):
@@ -609,12 +523,13 @@ def scan_fyers_institutional_tape(target_date_str):
                             df["Symbol"] = symbol
                             return df
                         break
-                    elif res.status_code == 429: time.sleep(1.5)
+                    elif res.status_code == 429: limiter.record_throttle(res.headers.get("Retry-After"))
                     else: break
                 except Exception: time.sleep(1)
             return None
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        # Pool size is only a ceiling; the AIMD controller decides how many requests are in flight.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=int(get_concurrency_limiter("FYERS").max_limit)) as executor:
             futures = {executor.submit(fetch_fyers_worker, task): task for task in fetch_tasks}
             completed = 0
             for future in concurrent.futures.as_completed(futures):
@@ -635,89 +550,34 @@ def scan_fyers_institutional_tape(target_date_str):
         tape_exec = prepare_unified_execution_tape(rolling_master_df, MICRO_TIMEFRAME, MACRO_TIMEFRAMES)
 
         all_anomalies = tape_exec[tape_exec["Direction"] != 0].copy()
-        anomalies_by_time = all_anomalies.groupby("Datetime")
-
-        closes_dict = tape_exec.set_index(["Datetime", "Symbol"])["Close"].to_dict()
-        micro_price_renko = tape_exec.set_index(["Datetime", "Symbol"])[f"Renko_Count_{MICRO_TIMEFRAME}"].to_dict()
-        micro_vol_renko = tape_exec.set_index(["Datetime", "Symbol"])[f"Vol_Renko_Count_{MICRO_TIMEFRAME}"].to_dict()
-        micro_vel_bars = tape_exec.set_index(["Datetime", "Symbol"])[f"Bars_Since_Brick_{MICRO_TIMEFRAME}"].to_dict()
-        macro_price_renkos = {tf: tape_exec.set_index(["Datetime", "Symbol"])[f"Renko_Count_{tf}"].to_dict() for tf in MACRO_TIMEFRAMES}
-        macro_vol_renkos = {tf: tape_exec.set_index(["Datetime", "Symbol"])[f"Vol_Renko_Count_{tf}"].to_dict() for tf in MACRO_TIMEFRAMES}
-        
-        all_times = np.sort(tape_exec["Datetime"].unique())
-        
+
+        # 🌟 Dense (time x symbol) panel + event-driven simulator: each episode's exit
+        # is a first-hit lookup over precomputed exit-condition columns instead of a
+        # per-minute walk over every open trade with dict lookups and iterrows().
+        panel = execution_panel(tape_exec, MICRO_TIMEFRAME, MACRO_TIMEFRAMES)
+
+        # Long-only book: exits always test for bearish structure breaks.
+        episodes_by_sym = simulate_episodes(
+            panel, all_anomalies, MICRO_TIMEFRAME, MACRO_TIMEFRAMES,
+            max_stall_bars=RENKO_VELOCITY_MAX_BARS,
+            micro_price_bricks=MICRO_EXIT_PRICE_BRICKS, micro_vol_bricks=MICRO_EXIT_VOL_BRICKS,
+            macro_price_bricks=MACRO_EXIT_PRICE_BRICKS, macro_vol_bricks=MACRO_EXIT_VOL_BRICKS,
+            entry_cutoff=ENTRY_CUTOFF_TIME, eod_start="14:30", eod_end="15:00", eod_tag="EOD Cutoff",
+            long_only_exits=True,
+        )
+
         active_trades = {}
         closed_trades_history = []
-        cutoff_time_obj = pd.to_datetime(ENTRY_CUTOFF_TIME).time()
-
-        for t in all_times:
-            t_dt = pd.to_datetime(t)
-            
-            # 1. Manage Active Trades (Checking for Exits)
-            for sym in list(active_trades.keys()):
-                st = active_trades[sym]
-                ltp = closes_dict.get((t_dt, sym))
-                mi_p_count = micro_price_renko.get((t_dt, sym), 0)
-                mi_v_count = micro_vol_renko.get((t_dt, sym), 0)
-                mi_bars_stalled = micro_vel_bars.get((t_dt, sym), 0)
-
-                if ltp is not None:
-                    exit_reason = None
-                    if mi_bars_stalled > RENKO_VELOCITY_MAX_BARS:
-                        exit_reason = f"Velocity Stall (No brick in {RENKO_VELOCITY_MAX_BARS} bars)"
-                    
-                    if not exit_reason:
-                        # Since we are Long Only, we only check for Bearish structure breaks (-1 values)
-                        if mi_p_count <= -MICRO_EXIT_PRICE_BRICKS: exit_reason = "Micro Price Reversal"
-                        elif mi_v_count <= -MICRO_EXIT_VOL_BRICKS: exit_reason = "Micro Volume Reversal"
-                        else:
-                            for tf in st["triggering_macro_tfs"]:
-                                if macro_price_renkos[tf].get((t_dt, sym), 0) <= -MACRO_EXIT_PRICE_BRICKS:
-                                    exit_reason = f"Macro [{tf}] Price Break"
-                                    break
-                                if macro_vol_renkos[tf].get((t_dt, sym), 0) <= -MACRO_EXIT_VOL_BRICKS:
-                                    exit_reason = f"Macro [{tf}] Volume Break"
-                                    break
-                    
-                    if exit_reason:
-                        st["state"] = "EXITED"
-                        st["exit_time"] = t_dt.strftime("%Y-%m-%d %H:%M")
-                        st["exit_price"] = ltp
-                        st["exit_reason"] = exit_reason
-                        closed_trades_history.append(st)
-                        del active_trades[sym]
-
-            # 2. Process New Entrances
-            if t_dt in anomalies_by_time.groups and t_dt.time() <= cutoff_time_obj:
-                for _, row in anomalies_by_time.get_group(t_dt).iterrows():
-                    sym = row["Symbol"]
-                    direction = row["Direction"]
-                    triggered_m_tfs = [tf for tf in MACRO_TIMEFRAMES if row.get(f"Armed_Bull_{tf}" if direction == 1 else f"Armed_Bear_{tf}", False)]
-
-                    if sym not in active_trades:
-                        active_trades[sym] = {
-                            "sym": sym,
-                            "state": "ACTIVE",
-                            "origin": row["Close"],              
-                            "date": t_dt.strftime("%Y-%m-%d"),
-                            "time": t_dt.strftime("%H:%M"),      
-                            "dir": direction,
-                            "exit_time": None,
-                            "exit_price": None,
-                            "exit_reason": None,
-                            "triggering_macro_tfs": triggered_m_tfs
-                        }
-
-            # 3. End of Day Forced Exit (14:30)
-            if t_dt.hour == 14 and t_dt.minute >= 30:
-                for sym in list(active_trades.keys()):
-                    st = active_trades[sym]
-                    st["state"] = "EXITED"
-                    st["exit_time"] = t_dt.strftime("%Y-%m-%d %H:%M") + " (EOD Cutoff)"
-                    st["exit_price"] = closes_dict.get((t_dt, sym), st["origin"])
-                    st["exit_reason"] = "End of Day Market Close"
+        for sym, episodes in episodes_by_sym.items():
+            for st in episodes:
+                st["sym"] = sym
+                if st["state"] == "ACTIVE":
+                    active_trades[sym] = st
+                else:
                     closed_trades_history.append(st)
-                    del active_trades[sym]
+        # Chronological exit order; on a shared bar signal exits precede the EOD sweep.
+        closed_trades_history.sort(key=lambda st: (st["exit_bar"], st["exit_reason"] == "End of Day Market Close",
+                                                   st["entry_bar"], st["entry_row"]))
 
         today_master = tape_exec[tape_exec["Datetime"].dt.date == target_dt.date()]
         if today_master.empty: return
@@ -771,14 +631,14 @@ def run_production_sweep():
 
     if not raw_date_str:
         target_dt = datetime.utcnow() + timedelta(hours=5, minutes=30)
-        # Offset for weekends if backtest date isn't explicitly provided
-        if target_dt.weekday() == 5: target_dt -= timedelta(days=1)
-        elif target_dt.weekday() == 6: target_dt -= timedelta(days=2)
-        target_date_str = target_dt.strftime("%Y-%m-%d")
+        # Roll back to the last session (weekends / exchange holidays) if no date is provided
+        target_date_str = last_session_on_or_before(target_dt.strftime("%Y-%m-%d"))
     else:
         target_date_str = datetime.strptime(raw_date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
 
     scan_fyers_institutional_tape(target_date_str)
+    print(f"{COLOR_DIM}{get_rate_limiter('FYERS').format_stats()}{COLOR_RESET}")
+    print(f"{COLOR_DIM}{get_concurrency_limiter('FYERS').format_stats()}{COLOR_RESET}")
 
 if __name__ == "__main__":
     run_production_sweep()
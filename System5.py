@@ -16,7 +16,6 @@ import gzip
 import io
 import json
 import os
-import random
 import sys
 import time
 import urllib.parse
@@ -27,6 +26,29 @@ import numpy as np
 import pandas as pd
 import requests
 
+from adaptive_concurrency import get_concurrency_limiter
+from async_fetcher import fetch_many, fetch_ranges
+from auth_breaker import BrokerAuthError, get_auth_breaker
+from bar_aggregator import MultiResolutionBars
+from candle_store import CandleStore
+from fetch_planner import FALLBACK_SESSIONS, fallback_range, plan_history_ranges
+from indicator_kernels import (
+    ewm_com, grouped_cumsum, grouped_ewm_mean, grouped_rolling_max, grouped_rolling_mean,
+    grouped_rolling_median, grouped_rolling_min, grouped_shift,
+)
+from instrument_master import OptionIndex, get_equity_ticker_map, load_fyers_segment
+from macro_alignment import MacroAlignment
+from market_quotes import fetch_quotes, get_ltp_batch
+from pillar_scorecard import ScorecardConfig, pack_pillars, pillar_score
+from rate_limiter import get_rate_limiter
+from renko_kernel import renko_brick_counts
+from run_profiler import count_event, get_profiler, observe_latency, profile_stage, start_run
+from symbol_layout import SymbolLayout
+from tape_memory import compact_tape, frame_megabytes
+from tape_panel import execution_panel
+from trade_simulator import simulate_episodes
+from trading_calendar import last_session_on_or_before, previous_session, previous_sessions, sessions_between
+
 warnings.filterwarnings("ignore")
 
 # ==============================================================================
@@ -52,7 +74,35 @@ BACKTRACE_DAYS = 15
 MIN_OPT_PREMIUM = 15.0
 MIN_PREV_DAY_VOLUME = 250000
 
-MAX_API_WORKERS = 40 if ACTIVE_BROKER == "UPSTOX" else 80
+# 🌟 QUOTE PRE-FILTER: Stage 1 first asks the batch quotes endpoint (50 symbols per call
+# on Fyers) and only sends the contracts a snapshot cannot decide to daily history.
+USE_QUOTE_PREFILTER = True
+
+# 🌟 ADAPTIVE CONCURRENCY: the pool size is only a ceiling. The AIMD controller grows
+# in-flight requests while responses stay fast and halves them on 429/5xx, so the
+# broker's limits for the day decide the real fan-out (bounds: FYERS_MAX_CONCURRENCY etc).
+MAX_API_WORKERS = int(get_concurrency_limiter(ACTIVE_BROKER).max_limit)
+
+# 🌟 LOCAL CANDLE STORE: closed sessions are cached on disk per symbol/resolution/day,
+# so Stage 2 only asks the broker for days it has never seen (plus the live tail).
+USE_CANDLE_STORE = True
+CANDLE_STORE = CandleStore()
+
+# 🌟 RUN PROFILE: per-stage timers, counters, fetch latency histograms and peak RSS,
+# written as JSON to PROFILE_REPORT_DIR (run_profiler.py) after every run.
+WRITE_PROFILE_REPORT = True
+
+# 🌟 LEAN TAPE: categorical Symbol + float32 prices and indicator columns (tape_memory.py),
+# for universes whose history tape would not fit in RAM at float64. Off by default:
+# float32 prices can move a Renko brick edge by a tick against the float64 run.
+LEAN_TAPE = False
+TAPE_FLOAT = np.float32 if LEAN_TAPE else np.float64
+
+# 🌟 BATCH BACKTEST (--from-date / --to-date): one data load for the whole range,
+# one trades-ledger CSV with a row per trade per target date.
+BACKTEST_LEDGER_FILE = "backtest_ledger_{from_date}_{to_date}.csv"
+BACKTEST_LEDGER_COLUMNS = ["target_date", "symbol", "direction", "status", "entry_date", "entry_time", "entry_price",
+                           "exit_time", "exit_price", "exit_reason", "pnl_pct", "macro_tfs", "micro_score"]
 
 MICRO_TIMEFRAME = "1min"
 MACRO_TIMEFRAMES = ["30min"]
@@ -147,6 +197,7 @@ def validate_broker_auth():
         # once, up front, and fail fast with the real reason.
         try:
             headers = get_auth_headers()
+            get_rate_limiter(ACTIVE_BROKER).acquire()
             res = requests.get("https://api-t1.fyers.in/api/v3/profile", headers=headers, timeout=10)
             body = {}
             try:
@@ -205,119 +256,60 @@ def get_universe_data():
                 try: strike_val = float(raw_strike)
                 except: strike_val = None
 
-                if strike_val is not None and item.get("expiry"):
+                # Upstox ships expiry as epoch milliseconds; normalise it to YYYY-MM-DD once
+                # here, like the Fyers master, so every downstream date comparison agrees.
+                raw_expiry = item.get("expiry")
+                try:
+                    if isinstance(raw_expiry, (int, float)) and len(str(int(raw_expiry))) == 13:
+                        expiry_val = pd.to_datetime(raw_expiry, unit="ms").strftime("%Y-%m-%d")
+                    else:
+                        expiry_val = pd.to_datetime(raw_expiry).strftime("%Y-%m-%d") if raw_expiry else None
+                except (TypeError, ValueError):
+                    expiry_val = None
+
+                if strike_val is not None and expiry_val:
                     opt_inst.append({
                         "symbol": item.get("trading_symbol", item.get("tradingsymbol", "UNKNOWN")),
                         "key": item["instrument_key"],
                         "underlying": item["underlying_symbol"],
                         "type": "CE" if "CE" in item.get("instrument_type", "") or "CE" in item.get("trading_symbol", "") else "PE",
                         "strike": strike_val,
-                        "expiry": item["expiry"]
+                        "expiry": expiry_val
                     })
 
     elif ACTIVE_BROKER == "FYERS":
         try:
-            print("  Downloading & Parsing FYERS F&O Data...")
-            headers = {'User-Agent': 'Mozilla/5.0'}
-
-            res_cm = requests.get("https://public.fyers.in/sym_details/NSE_CM.csv", headers=headers, timeout=15)
-            spot_key_map = {}
-            if res_cm.status_code == 200:
-                for line in res_cm.text.strip().split('\n'):
-                    cols = [c.strip() for c in line.split(',')]
-                    for c in cols:
-                        if c.startswith("NSE:") and c.endswith("-EQ"):
-                            base = c.replace("NSE:", "").replace("-EQ", "")
-                            spot_key_map[base] = c
-                            break
-
-            res_fo = requests.get("https://public.fyers.in/sym_details/NSE_FO.csv", headers=headers, timeout=15)
-            valid_underlyings = set()
-
-            for line in res_fo.text.strip().split('\n'):
-                cols = [c.strip() for c in line.split(',')]
-
-                opt_type = None
-                type_idx = -1
-                for i in range(len(cols)-1, -1, -1):
-                    if cols[i] in ("CE", "PE"):
-                        opt_type = cols[i]
-                        type_idx = i
-                        break
-
-                if not opt_type or type_idx < 3:
-                    continue
-
-                try:
-                    strike_val = float(cols[type_idx - 1])
-                    # 🌟 FIX: base_symbol sits 3 columns left of CE/PE, not 2.
-                    # The column at (type_idx - 2) is a raw numeric underlying instrument
-                    # token (e.g. 26037 = NIFTY FIN SERVICE, 26009 = NIFTY BANK), NOT the
-                    # symbol name. Reading it as the name caused EXCLUDED_INDICES (which
-                    # matches on names like "BANKNIFTY") to silently miss index derivatives,
-                    # which then produced bogus spot tickers like "NSE:26037-EQ" downstream.
-                    base_symbol = cols[type_idx - 3].strip()
-
-                    if base_symbol in EXCLUDED_INDICES:
-                        continue
-
-                    # Defensive guard: real NSE symbol names are never purely numeric.
-                    # If parsing still lands on a numeric token for any row (format drift,
-                    # malformed line, etc.), skip it instead of building an invalid ticker.
-                    if base_symbol.isdigit() or not base_symbol:
-                        continue
-
-                    sym_ticker = None
-                    for c in cols:
-                        if c.startswith("NSE:") and opt_type in c:
-                            sym_ticker = c
-                            break
-
-                    if not sym_ticker:
-                        continue
-
-                    expiry_date = None
-                    for c in cols:
-                        try:
-                            num = int(float(c))
-                            if 1.5e9 < num < 3e9:
-                                expiry_date = dt.fromtimestamp(num).strftime("%Y-%m-%d")
-                                break
-                        except: pass
-
-                    if not expiry_date:
-                        continue
-
-                    opt_inst.append({
-                        "symbol": sym_ticker,
-                        "key": sym_ticker,
-                        "underlying": base_symbol,
-                        "type": opt_type,
-                        "strike": strike_val,
-                        "expiry": expiry_date
-                    })
-
-                    if base_symbol not in valid_underlyings:
-                        valid_underlyings.add(base_symbol)
-                        # 🌟 FIX: only trust a symbol that's a CONFIRMED equity ticker
-                        # from the NSE_CM.csv map. The old fallback f"NSE:{base_symbol}-EQ"
-                        # blindly guessed a ticker for anything not found there — which is
-                        # exactly how non-equity index names (NIFTYNXT50, NIFTYFPI, etc.,
-                        # which have F&O contracts but no underlying "-EQ" stock) leaked
-                        # into the spot universe and got rejected by Fyers as invalid.
-                        spot_ticker = spot_key_map.get(base_symbol)
-                        if spot_ticker:
-                            spot_inst.append({
-                                "symbol": base_symbol,
-                                "key": spot_ticker,
-                                "underlying": base_symbol
-                            })
-
-                except Exception:
-                    pass
+            print("  Loading FYERS F&O Instrument Master (downloaded at most once per day)...")
+            spot_key_map = get_equity_ticker_map("NSE_CM")
+            fo = OptionIndex(load_fyers_segment("NSE_FO")).table
+            underlying = fo["underlying"].astype(str)
+
+            # Real NSE symbol names are never purely numeric; a numeric token here means
+            # format drift (it's the raw underlying instrument id), so skip those rows
+            # instead of building bogus tickers like "NSE:26037-EQ" downstream.
+            keep = ~underlying.isin(EXCLUDED_INDICES) & ~underlying.str.isdigit() & (underlying != "")
+            keep &= fo["ticker"].str.startswith("NSE:")
+            fo, underlying = fo[keep], underlying[keep]
+
+            opt_inst = pd.DataFrame({
+                "symbol": fo["ticker"],
+                "key": fo["ticker"],
+                "underlying": underlying,
+                "type": fo["opt_type"].astype(str),
+                "strike": fo["strike"],
+                "expiry": fo["expiry"].dt.strftime("%Y-%m-%d"),
+            }).to_dict("records")
+
+            # 🌟 FIX: only trust a symbol that's a CONFIRMED equity ticker from NSE_CM.
+            # Index names with F&O contracts but no "-EQ" stock (NIFTYNXT50, NIFTYFPI, ...)
+            # must not leak into the spot universe as guessed tickers.
+            spot_inst = [
+                {"symbol": base, "key": spot_key_map[base], "underlying": base}
+                for base in underlying.unique() if base in spot_key_map
+            ]
 
         except Exception as e:
-            print(f"{COLOR_RED}[Error] FYERS CSV fetch failed: {e}{COLOR_RESET}")
+            print(f"{COLOR_RED}[Error] FYERS instrument master load failed: {e}{COLOR_RESET}")
 
     print(f"  Mapped {len(spot_inst)} Spot Instruments & {len(opt_inst)} Options Contracts.")
     return spot_inst, opt_inst
@@ -325,8 +317,14 @@ def get_universe_data():
 def fetch_broker_data(key, tf_type, start_dt, end_dt, is_live=False):
     """Universal safe fetcher that routes requests cleanly without crashing"""
     headers = get_auth_headers()
+    limiter = get_rate_limiter(ACTIVE_BROKER)
+    concurrency = get_concurrency_limiter(ACTIVE_BROKER)
+    breaker = get_auth_breaker(ACTIVE_BROKER)
 
     for attempt in range(3):
+        if not breaker.allow():
+            # A token failure elsewhere already doomed this request; don't spend budget on it.
+            return None
         try:
             if ACTIVE_BROKER == "UPSTOX":
                 encoded_key = urllib.parse.quote(key)
@@ -337,7 +335,13 @@ def fetch_broker_data(key, tf_type, start_dt, end_dt, is_live=False):
                 else:
                     url = f"https://api.upstox.com/v2/historical-candle/{encoded_key}/{res_tf}/{end_dt}/{start_dt}"
 
-                res = requests.get(url, headers=headers, timeout=10)
+                limiter.acquire()
+                started = time.perf_counter()
+                with concurrency.request() as outcome:
+                    res = requests.get(url, headers=headers, timeout=10)
+                    outcome.record(res.status_code)
+                observe_latency(f"fetch_broker_data[{tf_type}]", time.perf_counter() - started)
+                count_event(f"http_status_{res.status_code}")
                 if res.status_code == 200:
                     body = res.json()
                     if not body: return None
@@ -349,9 +353,10 @@ def fetch_broker_data(key, tf_type, start_dt, end_dt, is_live=False):
                     df = pd.DataFrame(candles, columns=["Timestamp", "Open", "High", "Low", "Close", "Volume", "OI"])
                     df["Datetime"] = pd.to_datetime(df["Timestamp"]).dt.tz_localize(None).astype("datetime64[ns]")
                     return df
+                if breaker.observe(f"history {key}", res.status_code, res.text[:300]):
+                    return None
 
             elif ACTIVE_BROKER == "FYERS":
-                time.sleep(0.2)
                 res_tf = "1" if tf_type == "1minute" else "D"
 
                 # 🌟 FIX: symbols like "NSE:GVT&D-EQ" contain a literal "&", which — left
@@ -361,7 +366,13 @@ def fetch_broker_data(key, tf_type, start_dt, end_dt, is_live=False):
                 # rejects an encoded colon, per their API's documented quirk).
                 encoded_symbol = urllib.parse.quote(key, safe=':')
                 url = f"https://api-t1.fyers.in/data/history?symbol={encoded_symbol}&resolution={res_tf}&date_format=1&range_from={start_dt}&range_to={end_dt}"
-                res = requests.get(url, headers=headers, timeout=10)
+                limiter.acquire()
+                started = time.perf_counter()
+                with concurrency.request() as outcome:
+                    res = requests.get(url, headers=headers, timeout=10)
+                    outcome.record(res.status_code)
+                observe_latency(f"fetch_broker_data[{tf_type}]", time.perf_counter() - started)
+                count_event(f"http_status_{res.status_code}")
 
                 if res.status_code == 200:
                     try:
@@ -390,27 +401,36 @@ def fetch_broker_data(key, tf_type, start_dt, end_dt, is_live=False):
 
                     # status == "error" (e.g. code -16 "Could not authenticate the user",
                     # invalid symbol, bad date range, etc.) — THIS is what was previously hidden.
+                    if breaker.observe(f"history {key}", res.status_code, data):
+                        # Auth errors won't fix themselves on retry: trip the shared breaker
+                        # so every other worker stops too, and report it once at the end.
+                        return None
                     _log_fyers_error(
                         f"API error for {key} (code={data.get('code')}, msg={data.get('message')})",
                         res.status_code
                     )
-                    if data.get("code") == -16:
-                        # Auth errors won't fix themselves on retry — stop wasting attempts.
-                        return None
                     # Otherwise fall through to the shared retry logic below.
 
-                elif res.status_code in (429, 500, 502, 503):
-                    time.sleep(random.uniform(1.0, 3.0) * (attempt + 1))
+                elif res.status_code == 429:
+                    # Pauses the shared bucket once for every worker; the next
+                    # acquire() waits out the cool-down, so no per-thread sleep here.
+                    limiter.record_throttle(res.headers.get("Retry-After"))
+                    continue
+                elif res.status_code in (500, 502, 503):
+                    # The controller already halved the fan-out; this is just the retry back-off.
+                    time.sleep(attempt + 1)
                     continue
                 else:
-                    _log_fyers_error(f"HTTP failure for {key}", res.status_code, res.text[:300])
+                    if not breaker.observe(f"history {key}", res.status_code, res.text[:300]):
+                        _log_fyers_error(f"HTTP failure for {key}", res.status_code, res.text[:300])
                     return None
 
             if res.status_code == 429:
-                time.sleep(random.uniform(1.0, 3.0) * (attempt + 1))
+                limiter.record_throttle(res.headers.get("Retry-After"))
             else:
                 break
         except requests.exceptions.RequestException as e:
+            count_event("http_network_errors")
             _log_fyers_error(f"Network exception on attempt {attempt + 1}: {e}")
             time.sleep(1)
         except Exception as e:
@@ -421,7 +441,14 @@ def fetch_broker_data(key, tf_type, start_dt, end_dt, is_live=False):
 
 def fetch_latest_spot_prices(spot_instruments):
     print(f"Fetching Spot Prices for {len(spot_instruments)} Underlyings ({ACTIVE_BROKER})...")
-    spot_prices = {}
+
+    # 🌟 One batch quote call per 50 underlyings; candle history only for symbols it missed.
+    ltps = get_ltp_batch([inst["key"] for inst in spot_instruments], broker=ACTIVE_BROKER, log_error=_log_fyers_error)
+    get_auth_breaker(ACTIVE_BROKER).raise_if_tripped()
+    spot_prices = {inst["underlying"]: ltps[inst["key"]] for inst in spot_instruments if inst["key"] in ltps}
+    missing = [inst for inst in spot_instruments if inst["underlying"] not in spot_prices]
+    print(f"  Batch LTP: {len(spot_prices)}/{len(spot_instruments)} quoted"
+          + (f" | {len(missing)} falling back to candle history" if missing else ""))
 
     def worker(inst):
         try:
@@ -440,7 +467,7 @@ def fetch_latest_spot_prices(spot_instruments):
         return inst["underlying"], None
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_API_WORKERS) as executor:
-        futures = {executor.submit(worker, inst): inst for inst in spot_instruments}
+        futures = {executor.submit(worker, inst): inst for inst in missing}
         for future in concurrent.futures.as_completed(futures):
             try:
                 sym, price = future.result()
@@ -448,6 +475,7 @@ def fetch_latest_spot_prices(spot_instruments):
             except Exception:
                 pass
 
+    get_auth_breaker(ACTIVE_BROKER).raise_if_tripped()
     if not spot_prices:
         if _fyers_error_log_count > 0:
             print(f"{COLOR_RED}  [Critical Error] Fyers returned NO spot prices. "
@@ -492,196 +520,205 @@ def build_options_matrix(spot_prices, options_instruments):
 
     return target_contracts
 
-def filter_liquid_options(target_contracts, target_date_str):
-    print(f"\nSTAGE 1 INGESTION: Pre-Filtering {len(target_contracts)} contracts...")
-    print(f"  Rules: Prev. Day Close >= Rs{MIN_OPT_PREMIUM} | Prev. Day Vol >= {MIN_PREV_DAY_VOLUME}")
+def get_previous_trading_day(target_date_str):
+    return previous_session(target_date_str)
+
+def quote_liquidity_verdict(quote, target_date_str, prev_day):
+    """True / False when a quote snapshot settles the Stage 1 rule, None when history must decide.
+
+    A snapshot of the completed previous session carries its close and volume.
+    A live snapshot of the target session only knows the previous close, which
+    is enough to reject a contract under the premium floor.
+    """
+    if quote["session_date"] == prev_day and quote["volume"]:
+        return quote["ltp"] >= MIN_OPT_PREMIUM and quote["volume"] >= MIN_PREV_DAY_VOLUME
+    if quote["session_date"] == target_date_str and quote["prev_close"] is not None:
+        if quote["prev_close"] < MIN_OPT_PREMIUM:
+            return False
+    return None
 
-    target_dt = dt.strptime(target_date_str, "%Y-%m-%d")
-    prev_dt = target_dt - timedelta(days=1)
-    while prev_dt.weekday() >= 5: prev_dt -= timedelta(days=1)
-    prev_day = prev_dt.strftime("%Y-%m-%d")
-    five_days_ago = (prev_dt - timedelta(days=7)).strftime("%Y-%m-%d")
+def screen_liquidity_by_date(target_contracts, target_dates):
+    """Stage 1 for one or many target dates from ONE daily-candle fetch per contract.
 
-    filtered_contracts = []
+    Returns {target_date: [contracts]}; each date applies exactly the single-date
+    rule (latest daily candle in the 7 days up to the previous trading day).
+    For the current session, batch quote snapshots settle what they can first and
+    only the remaining contracts are sent to daily history.
+    """
+    print(f"\nSTAGE 1 INGESTION: Pre-Filtering {len(target_contracts)} contracts...")
+    print(f"  Rules: Prev. Day Close >= Rs{MIN_OPT_PREMIUM} | Prev. Day Vol >= {MIN_PREV_DAY_VOLUME}")
 
-    def worker(contract):
+    passed = {target_date_str: [] for target_date_str in target_dates}
+    contract_by_key = {c["key"]: c for c in target_contracts}
+    pending = {target_date_str: set(contract_by_key) for target_date_str in target_dates}
+
+    # Snapshots only describe the latest session, so past (backtest) dates skip them.
+    current_session = last_session_on_or_before((dt.utcnow() + timedelta(hours=5, minutes=30)).strftime("%Y-%m-%d"))
+    quote_dates = [d for d in target_dates if d >= current_session]
+    if USE_QUOTE_PREFILTER and quote_dates and contract_by_key:
+        quotes = fetch_quotes(list(contract_by_key), broker=ACTIVE_BROKER, log_error=_log_fyers_error)
+        for target_date_str in quote_dates:
+            prev_day = get_previous_trading_day(target_date_str)
+            for key, quote in quotes.items():
+                verdict = quote_liquidity_verdict(quote, target_date_str, prev_day)
+                if verdict is None:
+                    continue
+                pending[target_date_str].discard(key)
+                if verdict:
+                    passed[target_date_str].append(contract_by_key[key])
+        settled = sum(len(contract_by_key) - len(keys) for keys in pending.values())
+        print(f"  Quote Snapshot: {len(quotes)}/{len(contract_by_key)} quoted | {settled} contract-dates settled without history")
+
+    windows = {}
+    for target_date_str in target_dates:
+        if not pending[target_date_str]:
+            continue
+        prev_day = get_previous_trading_day(target_date_str)
+        windows[target_date_str] = ((dt.strptime(prev_day, "%Y-%m-%d") - timedelta(days=7)).strftime("%Y-%m-%d"), prev_day)
+    history_keys = [key for key in contract_by_key if any(key in keys for keys in pending.values())]
+    completed = 0
+
+    def on_progress(key, df):
+        nonlocal completed
+        completed += 1
+        sys.stdout.write(f"\r  Checking Liquidity... {completed}/{len(history_keys)} processed")
+        sys.stdout.flush()
         try:
-            df = fetch_broker_data(contract["key"], "day", five_days_ago, prev_day)
             if df is not None and not df.empty:
                 df = df.sort_values("Datetime")
-                latest_candle = df.iloc[-1]
-                if latest_candle["Close"] >= MIN_OPT_PREMIUM and latest_candle["Volume"] >= MIN_PREV_DAY_VOLUME:
-                    return contract
+                days = df["Datetime"].dt.strftime("%Y-%m-%d").to_numpy()
+                for target_date_str, (lo, hi) in windows.items():
+                    if key not in pending[target_date_str]:
+                        continue
+                    in_window = np.flatnonzero((days >= lo) & (days <= hi))
+                    if not len(in_window):
+                        continue
+                    latest_candle = df.iloc[in_window[-1]]
+                    if latest_candle["Close"] >= MIN_OPT_PREMIUM and latest_candle["Volume"] >= MIN_PREV_DAY_VOLUME:
+                        passed[target_date_str].append(contract_by_key[key])
         except Exception:
             pass
-        return None
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_API_WORKERS) as executor:
-        futures = {executor.submit(worker, c): c for c in target_contracts}
-        completed = 0
-        for future in concurrent.futures.as_completed(futures):
-            completed += 1
-            sys.stdout.write(f"\r  Checking Liquidity... {completed}/{len(target_contracts)} processed")
-            sys.stdout.flush()
-            try:
-                res = future.result()
-                if res: filtered_contracts.append(res)
-            except Exception:
-                pass
+    if history_keys:
+        fetch_start = min(lo for lo, _ in windows.values())
+        fetch_end = max(hi for _, hi in windows.values())
+        fetch_many(history_keys, "day", fetch_start, fetch_end, broker=ACTIVE_BROKER,
+                   progress=on_progress, log_error=_log_fyers_error)
+    get_auth_breaker(ACTIVE_BROKER).raise_if_tripped()
+
+    if len(target_dates) == 1:
+        print(f"\n  Pre-Filter Complete: {len(passed[target_dates[0]])} highly liquid contracts passed.")
+    else:
+        union = {c["key"] for contracts in passed.values() for c in contracts}
+        counts = [len(contracts) for contracts in passed.values()]
+        print(f"\n  Pre-Filter Complete: {len(union)} contracts passed on at least one date "
+              f"({min(counts)}-{max(counts)} per date).")
+    return passed
 
-    print(f"\n  Pre-Filter Complete: {len(filtered_contracts)} highly liquid contracts passed.")
-    return filtered_contracts
+def filter_liquid_options(target_contracts, target_date_str):
+    return screen_liquidity_by_date(target_contracts, [target_date_str])[target_date_str]
 
 def get_past_trading_days(target_date_str, num_days=20):
-    target_dt = dt.strptime(target_date_str, "%Y-%m-%d")
-    trading_days = []
-    current_dt = target_dt
-    while len(trading_days) < num_days:
-        if current_dt.weekday() < 5:
-            trading_days.append(current_dt.strftime("%Y-%m-%d"))
-        current_dt -= timedelta(days=1)
-    trading_days.reverse()
-    return trading_days
+    return previous_sessions(target_date_str, num_days)
 
 
+def get_trading_days_between(from_date_str, to_date_str):
+    return sessions_between(from_date_str, to_date_str)
+
 # ==============================================================================
 # 2. CORE TECHNICAL & 45-DEGREE RENKO ENGINES
 # ==============================================================================
-def calculate_core_technicals(df_tf):
-    df_tf["H-L"] = df_tf["High"] - df_tf["Low"]
-    df_tf["H-PC"] = (df_tf["High"] - df_tf.groupby("Symbol")["Close"].shift(1)).abs()
-    df_tf["L-PC"] = (df_tf["Low"] - df_tf.groupby("Symbol")["Close"].shift(1)).abs()
-    df_tf["TR"] = df_tf[["H-L", "H-PC", "L-PC"]].max(axis=1)
-    df_tf["ATR"] = df_tf.groupby("Symbol")["TR"].transform(lambda x: x.ewm(alpha=1 / ATR_PERIOD, adjust=False).mean())
-    df_tf["ATR"] = df_tf["ATR"].fillna(df_tf["Close"] * RENKO_DEFAULT_PCT)
-
-    delta = df_tf.groupby("Symbol")["Close"].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    avg_gain = gain.groupby(df_tf["Symbol"]).transform(lambda x: x.ewm(alpha=1 / RSI_PERIOD, adjust=False).mean())
-    avg_loss = loss.groupby(df_tf["Symbol"]).transform(lambda x: x.ewm(alpha=1 / RSI_PERIOD, adjust=False).mean())
-    df_tf["RSI"] = 100 - (100 / (1 + (avg_gain / (avg_loss + 1e-8))))
-    df_tf["RSI_SMA"] = df_tf.groupby("Symbol")["RSI"].transform(lambda x: x.rolling(BB_SMA_PERIOD, min_periods=1).mean())
-
-    high_d = df_tf["High"] - df_tf.groupby("Symbol")["High"].shift(1)
-    low_d = df_tf.groupby("Symbol")["Low"].shift(1) - df_tf["Low"]
-    df_tf["+DM"] = np.where((high_d > low_d) & (high_d > 0), high_d, 0)
-    df_tf["-DM"] = np.where((low_d > high_d) & (low_d > 0), low_d, 0)
-
-    df_tf["+DI"] = (100 * (df_tf.groupby("Symbol")["+DM"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean()) / (df_tf["ATR"] + 1e-8)))
-    df_tf["-DI"] = (100 * (df_tf.groupby("Symbol")["-DM"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean()) / (df_tf["ATR"] + 1e-8)))
-    df_tf["DX"] = (100 * abs(df_tf["+DI"] - df_tf["-DI"]) / (df_tf["+DI"] + df_tf["-DI"] + 1e-8))
-    df_tf["ADX"] = df_tf.groupby("Symbol")["DX"].transform(lambda x: x.ewm(alpha=1 / ADX_PERIOD, adjust=False).mean())
-
-    df_tf["EMA_8"] = df_tf.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=8, adjust=False).mean())
-    df_tf["EMA_21"] = df_tf.groupby("Symbol")["Close"].transform(lambda x: x.ewm(span=21, adjust=False).mean())
-    df_tf["EMA_Spread"] = abs(df_tf["EMA_8"] - df_tf["EMA_21"])
-    spread_thresh = df_tf.groupby("Symbol")["EMA_Spread"].transform(lambda x: x.rolling(window=20, min_periods=1).mean()) * 0.20
-    df_tf["EMA_Bull_Expanded"] = (df_tf["EMA_8"] > df_tf["EMA_21"]) & (df_tf["EMA_Spread"] >= spread_thresh)
-    df_tf["EMA_Bear_Expanded"] = (df_tf["EMA_8"] < df_tf["EMA_21"]) & (df_tf["EMA_Spread"] >= spread_thresh)
-
-    lowest_low = df_tf.groupby("Symbol")["Low"].transform(lambda x: x.rolling(window=STOCH_PERIOD, min_periods=1).min())
-    highest_high = df_tf.groupby("Symbol")["High"].transform(lambda x: x.rolling(window=STOCH_PERIOD, min_periods=1).max())
-    df_tf["Stoch_K"] = ((df_tf["Close"] - lowest_low) / (highest_high - lowest_low + 1e-9)) * 100
-    atr_median = df_tf.groupby("Symbol")["ATR"].transform(lambda x: x.rolling(window=50, min_periods=1).median())
-    df_tf["Vol_Pass"] = df_tf["ATR"] >= (atr_median * 0.75)
-    df_tf["Stoch_Bull_Pass"] = (df_tf["Stoch_K"] >= 50) & df_tf["Vol_Pass"]
-    df_tf["Stoch_Bear_Pass"] = (df_tf["Stoch_K"] <= 50) & df_tf["Vol_Pass"]
+def calculate_core_technicals(df_tf, layout=None):
+    # 🌟 Every per-symbol EWM / rolling indicator runs as ONE grouped pass over
+    # symbol-major arrays with segment offsets (indicator_kernels), instead of a
+    # Python lambda per symbol per indicator through groupby().transform().
+    # On the canonical symbol-major tape `layout` makes col/put zero-reorder.
+    # Intermediates (TR, DM, DX, EMAs, Stoch_K...) stay local arrays; only what the
+    # scorecard and the macro export read becomes a column.
+    layout = layout or SymbolLayout.of(df_tf["Symbol"])
+    offsets = layout.offsets
+
+    def put(values):
+        return layout.scatter(values).astype(TAPE_FLOAT, copy=False)
+
+    def col(name):
+        return layout.gather(df_tf[name])
+
+    high, low, close = col("High"), col("Low"), col("Close")
+    prev_close = grouped_shift(close, offsets)
+
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr = grouped_ewm_mean(true_range, offsets, ewm_com(alpha=1 / ATR_PERIOD))
+    atr = np.where(np.isnan(atr), close * RENKO_DEFAULT_PCT, atr)
+    df_tf["ATR"] = put(atr)
+
+    delta = close - prev_close
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = -np.where(delta < 0, delta, 0.0)
+    avg_gain = grouped_ewm_mean(gain, offsets, ewm_com(alpha=1 / RSI_PERIOD))
+    avg_loss = grouped_ewm_mean(loss, offsets, ewm_com(alpha=1 / RSI_PERIOD))
+    rsi = 100 - (100 / (1 + (avg_gain / (avg_loss + 1e-8))))
+    df_tf["RSI"] = put(rsi)
+    df_tf["RSI_SMA"] = put(grouped_rolling_mean(rsi, offsets, BB_SMA_PERIOD))
+
+    high_d = high - grouped_shift(high, offsets)
+    low_d = grouped_shift(low, offsets) - low
+    plus_dm = np.where((high_d > low_d) & (high_d > 0), high_d, 0)
+    minus_dm = np.where((low_d > high_d) & (low_d > 0), low_d, 0)
+
+    plus_di = 100 * (grouped_ewm_mean(plus_dm, offsets, ewm_com(alpha=1 / ADX_PERIOD)) / (atr + 1e-8))
+    minus_di = 100 * (grouped_ewm_mean(minus_dm, offsets, ewm_com(alpha=1 / ADX_PERIOD)) / (atr + 1e-8))
+    dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di + 1e-8)
+    df_tf["+DI"] = put(plus_di)
+    df_tf["-DI"] = put(minus_di)
+    df_tf["ADX"] = put(grouped_ewm_mean(dx, offsets, ewm_com(alpha=1 / ADX_PERIOD)))
+
+    ema_8 = grouped_ewm_mean(close, offsets, ewm_com(span=8))
+    ema_21 = grouped_ewm_mean(close, offsets, ewm_com(span=21))
+    ema_spread = np.abs(ema_8 - ema_21)
+    spread_ok = ema_spread >= grouped_rolling_mean(ema_spread, offsets, 20) * 0.20
+    df_tf["EMA_Bull_Expanded"] = layout.scatter((ema_8 > ema_21) & spread_ok)
+    df_tf["EMA_Bear_Expanded"] = layout.scatter((ema_8 < ema_21) & spread_ok)
+
+    lowest_low = grouped_rolling_min(low, offsets, STOCH_PERIOD)
+    highest_high = grouped_rolling_max(high, offsets, STOCH_PERIOD)
+    stoch_k = ((close - lowest_low) / (highest_high - lowest_low + 1e-9)) * 100
+    vol_pass = atr >= (grouped_rolling_median(atr, offsets, 50) * 0.75)
+    df_tf["Stoch_Bull_Pass"] = layout.scatter((stoch_k >= 50) & vol_pass)
+    df_tf["Stoch_Bear_Pass"] = layout.scatter((stoch_k <= 50) & vol_pass)
 
     return df_tf
 
-def construct_45deg_renko_matrix(df, tf_name, confirm_bricks):
-    renko_counts = np.zeros(len(df))
-    for sym, indices in df.groupby("Symbol").indices.items():
-        sub_closes = df["Close"].values[indices]
-        sub_atrs = df["ATR"].values[indices]
-        if len(sub_closes) > 0:
-            counts = np.zeros(len(sub_closes))
-            curr_trend, curr_count, curr_price = 0, 0, sub_closes[0]
-            for i in range(1, len(sub_closes)):
-                bs = max(sub_atrs[i], RENKO_MIN_BRICK)
-                move = sub_closes[i] - curr_price
-                if curr_trend >= 0:
-                    if move >= bs:
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = curr_count + bricks if curr_count > 0 else bricks
-                        curr_price += bricks * bs
-                    elif move <= -(2 * bs):
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = -bricks
-                        curr_price -= bricks * bs
-                else:
-                    if move <= -bs:
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = curr_count - bricks if curr_count < 0 else -bricks
-                        curr_price -= bricks * bs
-                    elif move >= (2 * bs):
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = bricks
-                        curr_price += bricks * bs
-                counts[i] = curr_count
-            renko_counts[indices] = counts
+def construct_45deg_renko_matrix(df, tf_name, confirm_bricks, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    renko_counts = layout.scatter(renko_brick_counts(
+        layout.gather(df["Close"]), layout.gather(df["ATR"]), layout.offsets, RENKO_MIN_BRICK))
     df[f"Renko_Count_{tf_name}"] = renko_counts
     df[f"Renko_Bull_{tf_name}"] = renko_counts >= confirm_bricks
     df[f"Renko_Bear_{tf_name}"] = renko_counts <= -confirm_bricks
     return df
 
-def construct_volume_delta_renko_matrix(df, tf_name, confirm_bricks):
-    df['Wick_Spread'] = df['High'] - df['Low']
-    df['Wick_Spread'] = df['Wick_Spread'].replace(0, 1e-9)
-    df['Delta_Vol'] = df['Volume'] * ((df['Close'] - df['Open']) / df['Wick_Spread'])
-    df['Cum_Delta'] = df.groupby('Symbol')['Delta_Vol'].cumsum()
-    df['Vol_SMA_20'] = df.groupby('Symbol')['Volume'].transform(lambda x: x.rolling(20, min_periods=1).mean()).fillna(100)
-
-    vol_renko_counts = np.zeros(len(df))
-    for sym, indices in df.groupby("Symbol").indices.items():
-        sub_delta = df["Cum_Delta"].values[indices]
-        sub_bs = df["Vol_SMA_20"].values[indices]
-        if len(sub_delta) > 0:
-            counts = np.zeros(len(sub_delta))
-            curr_trend, curr_count, curr_delta = 0, 0, sub_delta[0]
-            for i in range(1, len(sub_delta)):
-                bs = max(sub_bs[i], 1.0)
-                move = sub_delta[i] - curr_delta
-                if curr_trend >= 0:
-                    if move >= bs:
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = curr_count + bricks if curr_count > 0 else bricks
-                        curr_delta += bricks * bs
-                    elif move <= -(2 * bs):
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = -bricks
-                        curr_delta -= bricks * bs
-                else:
-                    if move <= -bs:
-                        bricks = int(abs(move) // bs)
-                        curr_trend = -1
-                        curr_count = curr_count - bricks if curr_count < 0 else -bricks
-                        curr_delta -= bricks * bs
-                    elif move >= (2 * bs):
-                        bricks = int(move // bs)
-                        curr_trend = 1
-                        curr_count = bricks
-                        curr_delta += bricks * bs
-                counts[i] = curr_count
-            vol_renko_counts[indices] = counts
+def construct_volume_delta_renko_matrix(df, tf_name, confirm_bricks, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    high, low, open_, close, volume = (layout.gather(df[c]) for c in ("High", "Low", "Open", "Close", "Volume"))
+    wick_spread = high - low
+    wick_spread[wick_spread == 0] = 1e-9
+    cum_delta = grouped_cumsum(volume * ((close - open_) / wick_spread), layout.offsets)
+    vol_sma = grouped_rolling_mean(volume, layout.offsets, 20)
+    vol_sma[np.isnan(vol_sma)] = 100
+    vol_renko_counts = layout.scatter(renko_brick_counts(cum_delta, vol_sma, layout.offsets, 1.0))
     df[f"Vol_Renko_Count_{tf_name}"] = vol_renko_counts
     df[f"Vol_Renko_Bull_{tf_name}"] = vol_renko_counts >= confirm_bricks
     df[f"Vol_Renko_Bear_{tf_name}"] = vol_renko_counts <= -confirm_bricks
     return df
 
-def construct_renko_velocity_engine(df, tf_name):
-    brick_diff = df.groupby("Symbol")[f"Renko_Count_{tf_name}"].diff().fillna(1)
-    brick_changed = (brick_diff != 0)
-    df["Brick_ID"] = brick_changed.cumsum()
-    df[f"Bars_Since_Brick_{tf_name}"] = df.groupby(["Symbol", "Brick_ID"]).cumcount()
-    df.drop("Brick_ID", axis=1, inplace=True)
+def construct_renko_velocity_engine(df, tf_name, layout=None):
+    layout = layout or SymbolLayout.of(df["Symbol"])
+    counts = layout.gather(df[f"Renko_Count_{tf_name}"])
+    # A new brick (or a symbol's first bar, where the shift is NaN) restarts the bar counter.
+    brick_changed = counts != grouped_shift(counts, layout.offsets)
+    pos = np.arange(len(counts))
+    df[f"Bars_Since_Brick_{tf_name}"] = layout.scatter(pos - np.maximum.accumulate(np.where(brick_changed, pos, 0)))
 
     is_trending_bull = df[f"Renko_Count_{tf_name}"] > 0
     is_trending_bear = df[f"Renko_Count_{tf_name}"] < 0
@@ -695,59 +732,44 @@ def construct_renko_velocity_engine(df, tf_name):
 # ==============================================================================
 # 3. DUAL-TIER SCORECARD SYSTEM (7 PILLARS)
 # ==============================================================================
-def apply_dual_tier_scorecard(df, tf_str, tier_type):
-    if SYNC_MICRO_WITH_MACRO and tier_type == "MICRO":
-        req_price, req_vol = MACRO_MANDATORY_PRICE_RENKO, MACRO_MANDATORY_VOL_RENKO
-        req_vel = MACRO_MANDATORY_RENKO_VELOCITY
-        req_rsi, req_adx = MACRO_MANDATORY_RSI_BB, MACRO_MANDATORY_ADX_DMI
-        req_ema, req_stoch = MACRO_MANDATORY_EMA_SPREAD, MACRO_MANDATORY_STOCHASTIC
-        min_score = MACRO_MINIMUM_SCORE
-    else:
-        req_price = globals()[f"{tier_type}_MANDATORY_PRICE_RENKO"]
-        req_vol = globals()[f"{tier_type}_MANDATORY_VOL_RENKO"]
-        req_vel = globals()[f"{tier_type}_MANDATORY_RENKO_VELOCITY"]
-        req_rsi = globals()[f"{tier_type}_MANDATORY_RSI_BB"]
-        req_adx = globals()[f"{tier_type}_MANDATORY_ADX_DMI"]
-        req_ema = globals()[f"{tier_type}_MANDATORY_EMA_SPREAD"]
-        req_stoch = globals()[f"{tier_type}_MANDATORY_STOCHASTIC"]
-        min_score = globals()[f"{tier_type}_MINIMUM_SCORE"]
-
-    c_price_bull, c_price_bear = df[f"Renko_Bull_{tf_str}"].astype(int), df[f"Renko_Bear_{tf_str}"].astype(int)
-    c_vol_bull, c_vol_bear = df[f"Vol_Renko_Bull_{tf_str}"].astype(int), df[f"Vol_Renko_Bear_{tf_str}"].astype(int)
-    c_vel_bull, c_vel_bear = df[f"Velocity_Bull_{tf_str}"].astype(int), df[f"Velocity_Bear_{tf_str}"].astype(int)
-    c_rsi_bull, c_rsi_bear = (df["RSI"] >= df["RSI_SMA"]).astype(int), (df["RSI"] <= df["RSI_SMA"]).astype(int)
-    c_adx_bull, c_adx_bear = ((df["ADX"] >= ADX_THRESHOLD) & (df["+DI"] > df["-DI"])).astype(int), ((df["ADX"] >= ADX_THRESHOLD) & (df["-DI"] > df["+DI"])).astype(int)
-    c_ema_bull, c_ema_bear = df["EMA_Bull_Expanded"].astype(int), df["EMA_Bear_Expanded"].astype(int)
-    c_stoch_bull, c_stoch_bear = df["Stoch_Bull_Pass"].astype(int), df["Stoch_Bear_Pass"].astype(int)
-
-    df[f"Score_Bull_{tf_str}"] = c_price_bull + c_vol_bull + c_vel_bull + c_rsi_bull + c_adx_bull + c_ema_bull + c_stoch_bull
-    df[f"Score_Bear_{tf_str}"] = c_price_bear + c_vol_bear + c_vel_bear + c_rsi_bear + c_adx_bear + c_ema_bear + c_stoch_bear
-
-    bull_veto, bear_veto = pd.Series(False, index=df.index), pd.Series(False, index=df.index)
-    if req_price: bull_veto, bear_veto = bull_veto | (c_price_bull == 0), bear_veto | (c_price_bear == 0)
-    if req_vol: bull_veto, bear_veto = bull_veto | (c_vol_bull == 0), bear_veto | (c_vol_bear == 0)
-    if req_vel: bull_veto, bear_veto = bull_veto | (c_vel_bull == 0), bear_veto | (c_vel_bear == 0)
-    if req_rsi: bull_veto, bear_veto = bull_veto | (c_rsi_bull == 0), bear_veto | (c_rsi_bear == 0)
-    if req_adx: bull_veto, bear_veto = bull_veto | (c_adx_bull == 0), bear_veto | (c_adx_bear == 0)
-    if req_ema: bull_veto, bear_veto = bull_veto | (c_ema_bull == 0), bear_veto | (c_ema_bear == 0)
-    if req_stoch: bull_veto, bear_veto = bull_veto | (c_stoch_bull == 0), bear_veto | (c_stoch_bear == 0)
-
-    df[f"Armed_Bull_{tf_str}"] = (df[f"Score_Bull_{tf_str}"] >= min_score) & (~bull_veto)
-    df[f"Armed_Bear_{tf_str}"] = (df[f"Score_Bear_{tf_str}"] >= min_score) & (~bear_veto)
+def scorecard_config(tier_type):
+    """The tier's mandatory pillars (PILLARS order) and minimum score."""
+    if tier_type == "MACRO" or SYNC_MICRO_WITH_MACRO:
+        return ScorecardConfig([MACRO_MANDATORY_PRICE_RENKO, MACRO_MANDATORY_VOL_RENKO, MACRO_MANDATORY_RENKO_VELOCITY,
+                                MACRO_MANDATORY_RSI_BB, MACRO_MANDATORY_ADX_DMI, MACRO_MANDATORY_EMA_SPREAD,
+                                MACRO_MANDATORY_STOCHASTIC], MACRO_MINIMUM_SCORE)
+    return ScorecardConfig([MICRO_MANDATORY_PRICE_RENKO, MICRO_MANDATORY_VOL_RENKO, MICRO_MANDATORY_RENKO_VELOCITY,
+                            MICRO_MANDATORY_RSI_BB, MICRO_MANDATORY_ADX_DMI, MICRO_MANDATORY_EMA_SPREAD,
+                            MICRO_MANDATORY_STOCHASTIC], MICRO_MINIMUM_SCORE)
+
+def apply_dual_tier_scorecard(df, tf_str, tier_type, config=None):
+    config = config or scorecard_config(tier_type)
+
+    # 🌟 Seven pillars -> one uint8 bitmask per bar and direction (pillar_scorecard.py):
+    # Score is its popcount, Armed a single lookup in the config's 256-entry table.
+    rsi, rsi_sma, adx, plus_di, minus_di = (df[c].to_numpy() for c in ("RSI", "RSI_SMA", "ADX", "+DI", "-DI"))
+    bull_mask = pack_pillars([
+        df[f"Renko_Bull_{tf_str}"], df[f"Vol_Renko_Bull_{tf_str}"], df[f"Velocity_Bull_{tf_str}"],
+        rsi >= rsi_sma, (adx >= ADX_THRESHOLD) & (plus_di > minus_di), df["EMA_Bull_Expanded"], df["Stoch_Bull_Pass"],
+    ])
+    bear_mask = pack_pillars([
+        df[f"Renko_Bear_{tf_str}"], df[f"Vol_Renko_Bear_{tf_str}"], df[f"Velocity_Bear_{tf_str}"],
+        rsi <= rsi_sma, (adx >= ADX_THRESHOLD) & (minus_di > plus_di), df["EMA_Bear_Expanded"], df["Stoch_Bear_Pass"],
+    ])
+    df[f"Pillars_Bull_{tf_str}"], df[f"Pillars_Bear_{tf_str}"] = bull_mask, bear_mask
+    df[f"Score_Bull_{tf_str}"], df[f"Score_Bear_{tf_str}"] = pillar_score(bull_mask), pillar_score(bear_mask)
+    df[f"Armed_Bull_{tf_str}"], df[f"Armed_Bear_{tf_str}"] = config.armed(bull_mask), config.armed(bear_mask)
     return df
 
-def evaluate_single_timeframe_gates(df_base, tf_str):
-    df_tf = (
-        df_base.groupby(["Symbol", pd.Grouper(key="Datetime", freq=tf_str, closed="left", label="left")])
-        .agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
-        .reset_index()
-    )
-    df_tf = df_tf.dropna(subset=["Close"]).sort_values(["Symbol", "Datetime"])
-    df_tf = calculate_core_technicals(df_tf)
+def evaluate_single_timeframe_gates(df_base, tf_str, bars=None):
+    if bars is None:
+        bars = MultiResolutionBars(df_base)
+    df_tf, layout = bars.bars(tf_str), bars.layout(tf_str)
+    df_tf = calculate_core_technicals(df_tf, layout)
 
-    df_tf = construct_45deg_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS)
-    df_tf = construct_volume_delta_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS)
-    df_tf = construct_renko_velocity_engine(df_tf, tf_str)
+    df_tf = construct_45deg_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS, layout)
+    df_tf = construct_volume_delta_renko_matrix(df_tf, tf_str, MACRO_RENKO_CONFIRM_BRICKS, layout)
+    df_tf = construct_renko_velocity_engine(df_tf, tf_str, layout)
 
     df_tf = apply_dual_tier_scorecard(df_tf, tf_str, "MACRO")
 
@@ -761,52 +783,52 @@ def evaluate_single_timeframe_gates(df_base, tf_str):
         f"Bars_Since_Brick_{tf_str}", "ATR", "ADX"
     ]
     env_df = df_tf[export_cols].copy().rename(columns={"Eval_Time": "Datetime", "ATR": f"ATR_{tf_str}", "ADX": f"ADX_{tf_str}"})
-    return env_df.sort_values("Datetime").reset_index(drop=True)
+    return env_df
 
 
 # ==============================================================================
 # 4. MICRO EXECUTION TAPE & CONFLUENCE MATCHER
 # ==============================================================================
 def prepare_unified_execution_tape(rolling_master_df, micro_tf, macro_timeframes, strategy_mode="BOTH"):
+    # 🌟 ONE symbol-major pass builds the micro bars and every macro tier; coarser
+    # tiers are rolled up from finer ones instead of re-grouping the 1min tape, and
+    # its symbol-major ordering is the canonical layout every stage below shares.
+    with profile_stage("bars"):
+        bars = MultiResolutionBars(rolling_master_df).build(macro_timeframes if micro_tf == "1min" else [micro_tf, *macro_timeframes])
     if micro_tf != "1min":
-        df_micro = (
-            rolling_master_df.groupby(["Symbol", pd.Grouper(key="Datetime", freq=micro_tf, closed="left", label="left")])
-            .agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
-            .reset_index()
-        )
-        df_micro = df_micro.dropna(subset=["Close"]).sort_values(["Symbol", "Datetime"])
+        df_micro, layout = bars.bars(micro_tf), bars.layout(micro_tf)
     else:
-        df_micro = rolling_master_df.sort_values(["Symbol", "Datetime"]).copy()
-
-    df_micro = calculate_core_technicals(df_micro)
-    df_micro = construct_45deg_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS)
-    df_micro = construct_volume_delta_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS)
-    df_micro = construct_renko_velocity_engine(df_micro, micro_tf)
-    df_micro = apply_dual_tier_scorecard(df_micro, micro_tf, "MICRO")
-    df_micro = df_micro.sort_values("Datetime").reset_index(drop=True)
+        df_micro, layout = rolling_master_df.take(bars.rows).reset_index(drop=True), bars.layout()
+
+    with profile_stage(f"technicals[{micro_tf}]"):
+        df_micro = calculate_core_technicals(df_micro, layout)
+    with profile_stage(f"renko[{micro_tf}]"):
+        df_micro = construct_45deg_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS, layout)
+        df_micro = construct_volume_delta_renko_matrix(df_micro, micro_tf, MICRO_RENKO_CONFIRM_BRICKS, layout)
+        df_micro = construct_renko_velocity_engine(df_micro, micro_tf, layout)
+    with profile_stage(f"scorecard[{micro_tf}]"):
+        df_micro = apply_dual_tier_scorecard(df_micro, micro_tf, "MICRO")
+    # 🌟 Datetime is pinned to [ns] once (pandas can hand back [s]/[us] depending on how
+    # the tape was built); every macro tier is then gathered by index onto the tape
+    # in its symbol-major order, with no per-tier merge, copy or re-sort.
+    df_micro["Datetime"] = df_micro["Datetime"].astype("datetime64[ns]")
+    alignment = MacroAlignment(df_micro)
 
     bull_gate_cols, bear_gate_cols = [], []
     for tf in macro_timeframes:
         print(f"   Evaluating Macro Context Gates + Price/Vol/Vel Renko for [{tf}]...")
-        env_df = evaluate_single_timeframe_gates(rolling_master_df, tf)
+        with profile_stage(f"macro_gates[{tf}]"):
+            env_df = evaluate_single_timeframe_gates(rolling_master_df, tf, bars)
         bull_col, bear_col = f"Armed_Bull_{tf}", f"Armed_Bear_{tf}"
         bull_gate_cols.append(bull_col)
         bear_gate_cols.append(bear_col)
 
-        # 🌟 Defensive cast: pandas 2.x can produce mixed datetime64 precisions
-        # ([s] vs [us] vs [ns]) depending on how a column was derived (raw epoch
-        # conversion vs. arithmetic vs. groupby resampling). merge_asof requires
-        # both join keys to share the exact same dtype, so we pin both explicitly
-        # right before merging rather than relying on it matching by accident.
-        df_micro["Datetime"] = df_micro["Datetime"].astype("datetime64[ns]")
-        env_df["Datetime"] = env_df["Datetime"].astype("datetime64[ns]")
-        df_micro = pd.merge_asof(df_micro, env_df, on="Datetime", by="Symbol", direction="backward")
-        df_micro[bull_col] = df_micro[bull_col].fillna(False)
-        df_micro[bear_col] = df_micro[bear_col].fillna(False)
-        df_micro[f"Score_Bull_{tf}"] = df_micro[f"Score_Bull_{tf}"].fillna(0).astype(int)
-        df_micro[f"Score_Bear_{tf}"] = df_micro[f"Score_Bear_{tf}"].fillna(0).astype(int)
-        df_micro[f"Renko_Count_{tf}"] = df_micro[f"Renko_Count_{tf}"].fillna(0).astype(int)
-        df_micro[f"Vol_Renko_Count_{tf}"] = df_micro[f"Vol_Renko_Count_{tf}"].fillna(0).astype(int)
+        with profile_stage(f"align[{tf}]"):
+            alignment.attach(df_micro, env_df, fills={
+                bull_col: False, bear_col: False,
+                f"Score_Bull_{tf}": 0, f"Score_Bear_{tf}": 0,
+                f"Renko_Count_{tf}": 0, f"Vol_Renko_Count_{tf}": 0,
+            })
 
     df_micro["Master_Armed_Bull"] = df_micro[bull_gate_cols].any(axis=1)
     df_micro["Master_Armed_Bear"] = df_micro[bear_gate_cols].any(axis=1)
@@ -820,13 +842,12 @@ def prepare_unified_execution_tape(rolling_master_df, micro_tf, macro_timeframes
         df_micro["Master_Armed_Bear"] = False
     elif strategy_mode == "BEARISH":
         df_micro["Master_Armed_Bull"] = False
-    df_micro = df_micro.sort_values(["Symbol", "Datetime"]).reset_index(drop=True)
 
     df_micro["Trigger_Bull"] = df_micro["Master_Armed_Bull"] & df_micro[f"Armed_Bull_{micro_tf}"]
     df_micro["Trigger_Bear"] = df_micro["Master_Armed_Bear"] & df_micro[f"Armed_Bear_{micro_tf}"]
 
-    df_micro["Trigger_Bull_Prev"] = df_micro.groupby("Symbol")["Trigger_Bull"].shift(1).fillna(False)
-    df_micro["Trigger_Bear_Prev"] = df_micro.groupby("Symbol")["Trigger_Bear"].shift(1).fillna(False)
+    df_micro["Trigger_Bull_Prev"] = layout.scatter(grouped_shift(layout.gather(df_micro["Trigger_Bull"]), layout.offsets) == 1)
+    df_micro["Trigger_Bear_Prev"] = layout.scatter(grouped_shift(layout.gather(df_micro["Trigger_Bear"]), layout.offsets) == 1)
 
     df_micro["New_Bull"] = df_micro["Trigger_Bull"] & ~df_micro["Trigger_Bull_Prev"]
     df_micro["New_Bear"] = df_micro["Trigger_Bear"] & ~df_micro["Trigger_Bear_Prev"]
@@ -838,220 +859,205 @@ def prepare_unified_execution_tape(rolling_master_df, micro_tf, macro_timeframes
 # ==============================================================================
 # 5. TRADE MANAGEMENT & EXECUTION ENGINE
 # ==============================================================================
-def scan_institutional_tape(target_date_str):
-    print(f"\nInitiating Options Engine for {target_date_str} [{ACTIVE_BROKER}]...")
+def ingest_option_history(target_contracts, trading_days, last_date_str):
+    """Stage 2: 1-min history for every contract across `trading_days` (ending on last_date_str)."""
+    current_now = dt.utcnow() + timedelta(hours=5, minutes=30)
+    is_live_today = last_date_str == current_now.strftime("%Y-%m-%d")
+
+    print(f"\nSTAGE 2 INGESTION: Async Bulk 1-Min Data for {len(target_contracts)} Contracts...")
+    hist_end = last_date_str if not is_live_today else previous_session(last_date_str)
+    hist_days = [d for d in trading_days if d <= hist_end]
+    contract_by_key = {item["key"]: item for item in target_contracts}
+    frames = {key: [] for key in contract_by_key}
+    missing_by_key = {}
+
+    # 🌟 Consult the local candle store first: only the days it has never seen are
+    # candidates for a broker request (its empty partitions are the known-empty cache).
+    for key in contract_by_key:
+        cached_df, missing_days = None, hist_days
+        if USE_CANDLE_STORE:
+            cached_df, missing_days = CANDLE_STORE.load(key, "1minute", hist_days)
+            if cached_df is not None:
+                frames[key].append(cached_df)
+        missing_by_key[key] = missing_days
+
+    # 🌟 FETCH PLANNER: one request per contract, bounded by its listing/expiry and the
+    # trading calendar. Fyers serves today from the history endpoint, so the live
+    # session rides along instead of costing a second round trip.
+    fold_live = is_live_today and ACTIVE_BROKER == "FYERS"
+    expiry_by_key = {key: item.get("expiry") for key, item in contract_by_key.items()}
+    plan = plan_history_ranges(expiry_by_key, missing_by_key, live_day=last_date_str if fold_live else None)
+    count_event("history_requests_skipped", len(contract_by_key) - len(plan))
+
+    def fetch_planned(windows, label):
+        """Fetches {key: (start, end, covered_days)}; returns the keys served with no candles."""
+        served = set()
+        results = fetch_ranges({key: (start, end, False) for key, (start, end, _) in windows.items()},
+                               "1minute", broker=ACTIVE_BROKER, log_error=_log_fyers_error, served=served)
+        empty = []
+        for key, df in results.items():
+            if df is not None and not df.empty:
+                frames[key].append(df)
+                if USE_CANDLE_STORE:
+                    CANDLE_STORE.save(key, "1minute", df, windows[key][2])
+            elif key in served:
+                empty.append(key)
+        print(f"  Fetching 1-Min Data [{label}]... {len(windows) - len(empty)}/{len(windows)} returned candles"
+              f" | {len(windows) - len(served)} failed")
+        return empty
+
+    print(f"  Fetch Plan: {len(plan)}/{len(contract_by_key)} contracts need a request "
+          f"({len(contract_by_key) - len(plan)} fully cached, known-empty or outside listing/expiry)")
+    empty_keys = fetch_planned(plan, "Planned Range") if plan else []
+
+    # One short retry for ranges the broker answered empty (strikes opened after the
+    # estimated listing). Days before a successful retry predate the strike, and a
+    # contract still empty after it has nothing in the range: both become known-empty.
+    retry = {key: fallback_range(plan[key]) for key in empty_keys}
+    retry = {key: window for key, window in retry.items() if window is not None}
+    still_empty = set(empty_keys) - set(retry)
+    if retry:
+        still_empty |= set(fetch_planned(retry, f"{FALLBACK_SESSIONS}-Session Retry"))
+    if USE_CANDLE_STORE:
+        for key in empty_keys:
+            filled = set(retry[key][2]) if key in retry and key not in still_empty else set()
+            CANDLE_STORE.save(key, "1minute", None, [d for d in plan[key][2] if d not in filled])
+    count_event("history_known_empty", len(still_empty))
+
+    if is_live_today and not fold_live:
+        live_keys = [key for key, expiry in expiry_by_key.items() if not expiry or str(pd.Timestamp(expiry).date()) >= last_date_str]
+        live_results = fetch_many(live_keys, "1minute", last_date_str, last_date_str, is_live=True,
+                                  broker=ACTIVE_BROKER, log_error=_log_fyers_error)
+        for key, intra_df in live_results.items():
+            if intra_df is not None and not intra_df.empty:
+                frames[key].append(intra_df)
+
+    # Without this, a dead token prints one "[API Block]" line per contract below.
+    get_auth_breaker(ACTIVE_BROKER).raise_if_tripped()
+    historical_dfs = []
+    for key, dfs in frames.items():
+        item = contract_by_key[key]
+        if not dfs:
+            print(f"{COLOR_DIM}  [API Block] Broker returned ZERO data for {item['symbol']} (Likely illiquid or expired){COLOR_RESET}")
+            continue
+        final_df = pd.concat(dfs, ignore_index=True)
+        final_df = final_df.drop_duplicates(subset=["Datetime"]).sort_values("Datetime").reset_index(drop=True)
+        final_df["Symbol"] = item["symbol"]
+        historical_dfs.append(final_df)
+    print()
 
-    spot_inst, options_inst = get_universe_data()
-    if not spot_inst: return
+    if not historical_dfs:
+        print(f"{COLOR_RED}No historical data retrieved.{COLOR_RESET}")
+        return None
+
+    return pd.concat(historical_dfs, ignore_index=True)
 
-    spot_prices = fetch_latest_spot_prices(spot_inst)
+def load_execution_tape(target_dates):
+    """Universe -> spot -> contract matrix -> Stage 1 -> Stage 2 -> execution tape, ONCE.
+
+    `target_dates` is ascending. Stage 1 runs per date, Stage 2 fetches the union of
+    liquid contracts over the union window, and indicators are computed once over the
+    whole span. Returns (tape_exec, {target_date: liquid symbols}) or (None, None).
+    """
+    with profile_stage("universe"):
+        spot_inst, options_inst = get_universe_data()
+    if not spot_inst: return None, None
+
+    with profile_stage("spot_prices"):
+        spot_prices = fetch_latest_spot_prices(spot_inst)
     if not spot_prices:
-        return
+        return None, None
 
-    target_contracts = build_options_matrix(spot_prices, options_inst)
+    with profile_stage("options_matrix"):
+        target_contracts = build_options_matrix(spot_prices, options_inst)
+    count_event("contracts_mapped", len(target_contracts))
 
     if not target_contracts:
         print(f"{COLOR_RED}[Error] No options contracts mapped.{COLOR_RESET}")
-        return
+        return None, None
 
     print(f"Mapped {len(target_contracts)} total option contracts for analysis.")
 
-    target_contracts = filter_liquid_options(target_contracts, target_date_str)
+    with profile_stage("liquidity_filter"):
+        liquid_by_date = screen_liquidity_by_date(target_contracts, target_dates)
+    liquid_contracts = list({c["key"]: c for d in target_dates for c in liquid_by_date[d]}.values())
+    count_event("contracts_liquid", len(liquid_contracts))
 
-    if not target_contracts:
+    if not liquid_contracts:
         print(f"{COLOR_YELLOW}All contracts failed the Liquidity (Vol >= {MIN_PREV_DAY_VOLUME}) or Premium (Price >= Rs{MIN_OPT_PREMIUM}) checks.{COLOR_RESET}")
-        return
-
-    trading_days = get_past_trading_days(target_date_str, num_days=BACKTRACE_DAYS)
-    if not trading_days: return
-
-    target_dt = pd.to_datetime(target_date_str)
-    current_now = dt.utcnow() + timedelta(hours=5, minutes=30)
-    is_live_today = target_date_str == current_now.strftime("%Y-%m-%d")
-
-    print(f"\nSTAGE 2 INGESTION: Multithreading Bulk 1-Min Data for {len(target_contracts)} Contracts...")
-    fetch_tasks = [(item, trading_days[0], target_date_str, is_live_today) for item in target_contracts]
-    historical_dfs = []
-
-    def fetch_worker(task):
-        try:
-            item, start_date, end_date, live = task
-            dfs = []
-            hist_end = end_date if not live else (current_now - timedelta(days=1)).strftime("%Y-%m-%d")
-
-            df = fetch_broker_data(item["key"], "1minute", start_date, hist_end)
-
-            if df is None or df.empty:
-                fallback_start = get_past_trading_days(end_date, num_days=5)[0]
-                df = fetch_broker_data(item["key"], "1minute", fallback_start, hist_end)
-
-            if df is None or df.empty:
-                extreme_start = get_past_trading_days(end_date, num_days=2)[0]
-                df = fetch_broker_data(item["key"], "1minute", extreme_start, hist_end)
-
-            if df is not None and not df.empty:
-                dfs.append(df)
-
-            if live:
-                intra_df = fetch_broker_data(item["key"], "1minute", end_date, end_date, is_live=True)
-                if intra_df is not None and not intra_df.empty:
-                    dfs.append(intra_df)
-
-            if not dfs:
-                print(f"{COLOR_DIM}  [API Block] Broker returned ZERO data for {item['symbol']} (Likely illiquid or expired){COLOR_RESET}")
-                return None
-
-            final_df = pd.concat(dfs, ignore_index=True)
-            final_df = final_df.drop_duplicates(subset=["Datetime"]).sort_values("Datetime").reset_index(drop=True)
-            final_df["Symbol"] = item["symbol"]
-            return final_df
-        except Exception:
-            pass
-        return None
+        return None, None
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_API_WORKERS) as executor:
-        futures = {executor.submit(fetch_worker, task): task for task in fetch_tasks}
-        completed = 0
-        for future in concurrent.futures.as_completed(futures):
-            completed += 1
-            print(f"  Fetching 1-Min Data... {completed}/{len(fetch_tasks)} processed")
-            try:
-                res = future.result()
-                if res is not None: historical_dfs.append(res)
-            except Exception:
-                pass
-    print()
+    trading_days = get_past_trading_days(target_dates[0], num_days=BACKTRACE_DAYS)
+    trading_days = sorted(set(trading_days) | set(get_trading_days_between(target_dates[0], target_dates[-1])))
+    if not trading_days: return None, None
 
-    if not historical_dfs:
-        print(f"{COLOR_RED}No historical data retrieved.{COLOR_RESET}")
-        return
+    with profile_stage("history_fetch"):
+        rolling_master_df = ingest_option_history(liquid_contracts, trading_days, target_dates[-1])
+    if rolling_master_df is None:
+        return None, None
+    count_event("history_rows", len(rolling_master_df))
+    if LEAN_TAPE:
+        compact_tape(rolling_master_df, TAPE_FLOAT)
+    history_mb = frame_megabytes(rolling_master_df)
 
-    rolling_master_df = pd.concat(historical_dfs, ignore_index=True)
     print("Computing 7-Pillar Scorecards & Velocity Matrices on Premium Data...")
+    with profile_stage("execution_tape"):
+        tape_exec = prepare_unified_execution_tape(rolling_master_df, MICRO_TIMEFRAME, MACRO_TIMEFRAMES, strategy_mode=GLOBAL_MACRO_STRATEGY_2D)
+    get_profiler().meta["tape_memory"] = {"lean": LEAN_TAPE, "rows": len(tape_exec), "history_mb": history_mb,
+                                          "tape_mb": frame_megabytes(tape_exec)}
+    liquid_symbols = {d: {c["symbol"] for c in liquid_by_date[d]} for d in target_dates}
+    return tape_exec, liquid_symbols
+
+def simulate_target_date(tape_exec, target_date_str, symbols=None):
+    """Runs the trade engine for ONE target date over its own BACKTRACE_DAYS window of the tape."""
+    window_start = pd.Timestamp(get_past_trading_days(target_date_str, num_days=BACKTRACE_DAYS)[0])
+    window_end = pd.Timestamp(target_date_str) + pd.Timedelta(days=1)
+    in_window = (tape_exec["Datetime"] >= window_start) & (tape_exec["Datetime"] < window_end)
+    if symbols is not None:
+        in_window &= tape_exec["Symbol"].isin(symbols)
+    tape = tape_exec[in_window]
+
+    all_anomalies = tape[tape["Direction"] != 0].copy()
+    # 🌟 Dense (time x symbol) panel + event-driven simulator: each episode's exit
+    # is a first-hit lookup over precomputed exit-condition columns instead of a
+    # per-minute walk over every open trade with dict lookups and iterrows().
+    with profile_stage("panel"):
+        panel = execution_panel(tape, MICRO_TIMEFRAME, MACRO_TIMEFRAMES)
 
-    tape_exec = prepare_unified_execution_tape(rolling_master_df, MICRO_TIMEFRAME, MACRO_TIMEFRAMES, strategy_mode=GLOBAL_MACRO_STRATEGY_2D)
-
-    all_anomalies = tape_exec[tape_exec["Direction"] != 0].copy()
-    anomalies_by_time = all_anomalies.groupby("Datetime")
-
-    closes_dict = tape_exec.set_index(["Datetime", "Symbol"])["Close"].to_dict()
-    micro_price_renko = tape_exec.set_index(["Datetime", "Symbol"])[f"Renko_Count_{MICRO_TIMEFRAME}"].to_dict()
-    micro_vol_renko = tape_exec.set_index(["Datetime", "Symbol"])[f"Vol_Renko_Count_{MICRO_TIMEFRAME}"].to_dict()
-    micro_vel_bars = tape_exec.set_index(["Datetime", "Symbol"])[f"Bars_Since_Brick_{MICRO_TIMEFRAME}"].to_dict()
-
-    macro_price_renkos = {tf: tape_exec.set_index(["Datetime", "Symbol"])[f"Renko_Count_{tf}"].to_dict() for tf in MACRO_TIMEFRAMES}
-    macro_vol_renkos = {tf: tape_exec.set_index(["Datetime", "Symbol"])[f"Vol_Renko_Count_{tf}"].to_dict() for tf in MACRO_TIMEFRAMES}
-
-    all_times = np.sort(tape_exec["Datetime"].unique())
     # 🌟 FIX: memory_bank now maps Symbol -> LIST of trade episodes, not a single
     # episode. The old code overwrote memory_bank[sym] every time a new trigger
     # fired after a prior exit, so only the LAST birth-time of the day survived —
     # every earlier trigger/exit for that contract was silently lost.
-    memory_bank = {}
-    cutoff_time_obj = pd.to_datetime(ENTRY_CUTOFF_TIME).time()
+    with profile_stage("simulation"):
+        memory_bank = simulate_episodes(
+            panel, all_anomalies, MICRO_TIMEFRAME, MACRO_TIMEFRAMES,
+            max_stall_bars=RENKO_VELOCITY_MAX_BARS,
+            micro_price_bricks=MICRO_EXIT_PRICE_BRICKS, micro_vol_bricks=MICRO_EXIT_VOL_BRICKS,
+            macro_price_bricks=MACRO_EXIT_PRICE_BRICKS, macro_vol_bricks=MACRO_EXIT_VOL_BRICKS,
+            entry_cutoff=ENTRY_CUTOFF_TIME, eod_start="15:15", eod_end="16:00", eod_tag="EOD",
+        )
+    count_event("trade_episodes", sum(len(episodes) for episodes in memory_bank.values()))
 
-    for t in all_times:
-        t_dt = pd.to_datetime(t)
+    def score_column(col):
+        return all_anomalies[col].to_numpy() if col in all_anomalies else np.zeros(len(all_anomalies))
 
-        for sym, episodes in memory_bank.items():
-            if not episodes:
-                continue
-            st = episodes[-1]
-            if st["state"] == "ACTIVE":
-                ltp = closes_dict.get((t_dt, sym))
-                mi_p_count = micro_price_renko.get((t_dt, sym), 0)
-                mi_v_count = micro_vol_renko.get((t_dt, sym), 0)
-                mi_bars_stalled = micro_vel_bars.get((t_dt, sym), 0)
-
-                if ltp is not None:
-                    exit_reason = None
-
-                    if mi_bars_stalled > RENKO_VELOCITY_MAX_BARS:
-                        exit_reason = f"Velocity Stall (No brick in {RENKO_VELOCITY_MAX_BARS} bars)"
-
-                    if not exit_reason:
-                        if st["dir"] == 1:
-                            if mi_p_count <= -MICRO_EXIT_PRICE_BRICKS: exit_reason = "Micro Price Reversal"
-                            elif mi_v_count <= -MICRO_EXIT_VOL_BRICKS: exit_reason = "Micro Volume Reversal"
-                            else:
-                                for tf in st["triggering_macro_tfs"]:
-                                    ma_p = macro_price_renkos[tf].get((t_dt, sym), 0)
-                                    ma_v = macro_vol_renkos[tf].get((t_dt, sym), 0)
-                                    if ma_p <= -MACRO_EXIT_PRICE_BRICKS:
-                                        exit_reason = f"Macro [{tf}] Price Break"
-                                        break
-                                    if ma_v <= -MACRO_EXIT_VOL_BRICKS:
-                                        exit_reason = f"Macro [{tf}] Volume Break"
-                                        break
-                        elif st["dir"] == -1:
-                            if mi_p_count >= MICRO_EXIT_PRICE_BRICKS: exit_reason = "Micro Price Reversal"
-                            elif mi_v_count >= MICRO_EXIT_VOL_BRICKS: exit_reason = "Micro Volume Reversal"
-                            else:
-                                for tf in st["triggering_macro_tfs"]:
-                                    ma_p = macro_price_renkos[tf].get((t_dt, sym), 0)
-                                    ma_v = macro_vol_renkos[tf].get((t_dt, sym), 0)
-                                    if ma_p >= MACRO_EXIT_PRICE_BRICKS:
-                                        exit_reason = f"Macro [{tf}] Price Break"
-                                        break
-                                    if ma_v >= MACRO_EXIT_VOL_BRICKS:
-                                        exit_reason = f"Macro [{tf}] Volume Break"
-                                        break
-
-                    if exit_reason:
-                        st["state"] = "EXITED"
-                        st["exit_time"] = t_dt.strftime("%Y-%m-%d %H:%M")
-                        st["exit_price"] = ltp
-                        st["exit_reason"] = exit_reason
-
-        if t_dt in anomalies_by_time.groups and t_dt.time() <= cutoff_time_obj:
-            for _, row in anomalies_by_time.get_group(t_dt).iterrows():
-                sym = row["Symbol"]
-                direction = row["Direction"]
-
-                triggered_m_tfs = []
-                for tf in MACRO_TIMEFRAMES:
-                    armed_col = f"Armed_Bull_{tf}" if direction == 1 else f"Armed_Bear_{tf}"
-                    if row.get(armed_col, False):
-                        triggered_m_tfs.append(tf)
-
-                existing = memory_bank.get(sym, [])
-                # Append a NEW episode whenever there's no prior episode, or the most
-                # recent one has already exited — instead of overwriting it.
-                if not existing or existing[-1]["state"] == "EXITED":
-                    new_episode = {
-                        "state": "ACTIVE",
-                        "origin": row["Close"],
-                        "date": t_dt.strftime("%Y-%m-%d"),
-                        "time": t_dt.strftime("%H:%M"),
-                        "dir": direction,
-                        "exit_time": None,
-                        "exit_price": None,
-                        "exit_reason": None,
-                        "triggering_macro_tfs": triggered_m_tfs,
-                        "macro_scores": {tf: row.get(f"Score_Bull_{tf}" if direction == 1 else f"Score_Bear_{tf}", 0) for tf in MACRO_TIMEFRAMES},
-                        "micro_score": row.get(f"Score_Bull_{MICRO_TIMEFRAME}" if direction == 1 else f"Score_Bear_{MICRO_TIMEFRAME}", 0)
-                    }
-                    memory_bank.setdefault(sym, []).append(new_episode)
-
-        if t_dt.hour == 15 and t_dt.minute >= 15:
-            for sym, episodes in memory_bank.items():
-                if episodes and episodes[-1]["state"] == "ACTIVE":
-                    st = episodes[-1]
-                    st["state"] = "EXITED"
-                    st["exit_time"] = t_dt.strftime("%Y-%m-%d %H:%M") + " (EOD)"
-                    st["exit_price"] = closes_dict.get((t_dt, sym), st["origin"])
-                    st["exit_reason"] = "End of Day Market Close"
-
-    today_master = tape_exec[tape_exec["Datetime"].dt.date == target_dt.date()]
+    scores = {(side, tf): score_column(f"Score_{side}_{tf}") for side in ("Bull", "Bear") for tf in MACRO_TIMEFRAMES + [MICRO_TIMEFRAME]}
+    for episodes in memory_bank.values():
+        for st in episodes:
+            side = "Bull" if st["dir"] == 1 else "Bear"
+            st["macro_scores"] = {tf: scores[(side, tf)][st["entry_row"]] for tf in MACRO_TIMEFRAMES}
+            st["micro_score"] = scores[(side, MICRO_TIMEFRAME)][st["entry_row"]]
+
+    return tape, memory_bank
+
+def collect_trades(tape, memory_bank, target_date_str):
+    """(active_runners, closed_trades, final_ltp_dict) for the target date, or None if it has no data."""
+    today_master = tape[tape["Datetime"].dt.date == pd.to_datetime(target_date_str).date()]
     if today_master.empty:
-        print(f"\n{COLOR_YELLOW}[Terminal Standby] Market data for {target_date_str} is empty.{COLOR_RESET}\n")
-        return
+        return None
 
     final_ltp_dict = today_master.groupby("Symbol")["Close"].last().to_dict()
 
-    # ==============================================================================
-    # 6. TERMINAL OUTPUT
-    # ==============================================================================
     # 🌟 Flatten each symbol's list of episodes: every trigger of the day now
     # produces its own row in the output (previously only the LAST one survived).
     active_runners = {}
@@ -1064,7 +1070,18 @@ def scan_institutional_tape(target_date_str):
                 closed_trades.append({**st, "sym": sym})
     # Sort chronologically so multiple triggers on the same contract print in order.
     closed_trades.sort(key=lambda x: (x["sym"], x["time"]))
+    return active_runners, closed_trades, final_ltp_dict
+
+def print_terminal_report(tape, memory_bank, target_date_str):
+    trades = collect_trades(tape, memory_bank, target_date_str)
+    if trades is None:
+        print(f"\n{COLOR_YELLOW}[Terminal Standby] Market data for {target_date_str} is empty.{COLOR_RESET}\n")
+        return
+    active_runners, closed_trades, final_ltp_dict = trades
 
+    # ==============================================================================
+    # 6. TERMINAL OUTPUT
+    # ==============================================================================
     tf_display_str = " | ".join(MACRO_TIMEFRAMES)
     print(f"\n{COLOR_CYAN}================================================================================================{COLOR_RESET}")
     print(f"{COLOR_BOLD}7-PILLAR QUALIFYING-TF OPTIONS ENGINE [{MICRO_TIMEFRAME} Micro | Macro: {tf_display_str}]{COLOR_RESET}")
@@ -1101,26 +1118,144 @@ def scan_institutional_tape(target_date_str):
     if not active_runners and not closed_trades:
         print(f"{COLOR_DIM}[Terminal Silent] No trades triggered today.{COLOR_RESET}\n")
 
+def build_trades_ledger(tape, memory_bank, target_date_str):
+    """One ledger row per trade of the target date (closed trades and open runners)."""
+    trades = collect_trades(tape, memory_bank, target_date_str)
+    if trades is None:
+        return []
+    active_runners, closed_trades, final_ltp_dict = trades
+
+    rows = []
+    for status, sym, st, price in ([("CLOSED", st["sym"], st, st["exit_price"]) for st in closed_trades]
+                                   + [("ACTIVE", sym, st, final_ltp_dict.get(sym, st["origin"])) for sym, st in active_runners.items()]):
+        pnl_pct = ((price - st["origin"]) / st["origin"]) * 100 if st["dir"] == 1 else ((st["origin"] - price) / st["origin"]) * 100
+        rows.append({
+            "target_date": target_date_str,
+            "symbol": sym,
+            "direction": "BULLISH" if st["dir"] == 1 else "BEARISH",
+            "status": status,
+            "entry_date": st["date"],
+            "entry_time": st["time"],
+            "entry_price": st["origin"],
+            "exit_time": st["exit_time"],
+            "exit_price": price,
+            "exit_reason": st["exit_reason"],
+            "pnl_pct": round(pnl_pct, 4),
+            "macro_tfs": ",".join(st["triggering_macro_tfs"]),
+            "micro_score": st["micro_score"],
+        })
+    return rows
+
+def scan_institutional_tape(target_date_str):
+    print(f"\nInitiating Options Engine for {target_date_str} [{ACTIVE_BROKER}]...")
+
+    tape_exec, _ = load_execution_tape([target_date_str])
+    if tape_exec is None:
+        return
+
+    tape, memory_bank = simulate_target_date(tape_exec, target_date_str)
+    with profile_stage("terminal_report"):
+        print_terminal_report(tape, memory_bank, target_date_str)
+
+def run_backtest_range(from_date_str, to_date_str):
+    """🌟 Batch backtest: ONE data load + ONE indicator pass, then every target date is
+    simulated from the shared tape. Writes a per-date trades ledger CSV."""
+    target_dates = get_trading_days_between(from_date_str, to_date_str)
+    if not target_dates:
+        print(f"{COLOR_RED}[Error] No trading days between {from_date_str} and {to_date_str}.{COLOR_RESET}")
+        return None
+
+    print(f"\nInitiating Options Backtest for {target_dates[0]} -> {target_dates[-1]} "
+          f"({len(target_dates)} sessions) [{ACTIVE_BROKER}]...")
+    tape_exec, liquid_symbols = load_execution_tape(target_dates)
+    if tape_exec is None:
+        return None
+
+    print(f"\n{COLOR_BOLD}BACKTEST LEDGER [{MICRO_TIMEFRAME} Micro | Macro: {' | '.join(MACRO_TIMEFRAMES)}]{COLOR_RESET}")
+    ledger_rows = []
+    for target_date_str in target_dates:
+        if not liquid_symbols[target_date_str]:
+            print(f"{COLOR_DIM}  {target_date_str}: no contracts passed the liquidity screen{COLOR_RESET}")
+            continue
+        tape, memory_bank = simulate_target_date(tape_exec, target_date_str, liquid_symbols[target_date_str])
+        rows = build_trades_ledger(tape, memory_bank, target_date_str)
+        ledger_rows.extend(rows)
+
+        closed = [r for r in rows if r["status"] == "CLOSED"]
+        avg_pnl = np.mean([r["pnl_pct"] for r in closed]) if closed else 0.0
+        color = COLOR_GREEN if avg_pnl >= 0 else COLOR_RED
+        print(f"  {color}{target_date_str}: {len(closed):>3} closed | {len(rows) - len(closed):>3} open | "
+              f"avg closed P&L {avg_pnl:+.2f}%{COLOR_RESET}")
+
+    ledger = pd.DataFrame(ledger_rows, columns=BACKTEST_LEDGER_COLUMNS)
+    ledger_path = BACKTEST_LEDGER_FILE.format(from_date=target_dates[0], to_date=target_dates[-1])
+    ledger.to_csv(ledger_path, index=False)
+    print(f"\nTrades ledger: {len(ledger)} rows across {len(target_dates)} sessions -> {ledger_path}")
+    return ledger
+
 # ==============================================================================
 # 7. RUN EXECUTOR
 # ==============================================================================
+def finish_run_report():
+    print(f"{COLOR_DIM}{get_rate_limiter(ACTIVE_BROKER).format_stats()}{COLOR_RESET}")
+    profiler = get_profiler()
+    print(f"{COLOR_DIM}{get_concurrency_limiter(ACTIVE_BROKER).format_stats()}{COLOR_RESET}")
+    profiler.meta["rate_limiter"] = get_rate_limiter(ACTIVE_BROKER).stats()
+    profiler.meta["concurrency"] = get_concurrency_limiter(ACTIVE_BROKER).stats()
+    profiler.meta["auth_breaker"] = get_auth_breaker(ACTIVE_BROKER).stats()
+    print(f"{COLOR_DIM}{profiler.format_summary()}{COLOR_RESET}")
+    if WRITE_PROFILE_REPORT:
+        print(f"{COLOR_DIM}Run profile written to {profiler.write_report()}{COLOR_RESET}")
+
+def report_auth_abort(err):
+    """The ONE diagnostic for a token that died mid-run (instead of thousands of per-contract lines)."""
+    breaker = get_auth_breaker(ACTIVE_BROKER)
+    print(f"\n{COLOR_RED}❌ {err.broker} authentication failed mid-run — aborting the sweep.{COLOR_RESET}")
+    print(f"{COLOR_RED}   First failure: {err.context}{' | HTTP ' + str(err.status_code) if err.status_code else ''} "
+          f"{err.body}{COLOR_RESET}")
+    print(f"{COLOR_YELLOW}   -> {breaker.short_circuited} queued/in-flight requests were skipped. "
+          f"Regenerate the {err.broker} access token (they expire daily) and re-run.{COLOR_RESET}")
+
 def run_production_sweep():
     validate_broker_auth()
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--date", type=str, default="")
+    parser.add_argument("--from-date", type=str, default="")
+    parser.add_argument("--to-date", type=str, default="")
     args, _ = parser.parse_known_args()
     raw_date_str = args.date or os.environ.get("PARAM_BACKTEST_DATE", "").strip()
+    from_date_str = args.from_date or os.environ.get("PARAM_BACKTEST_FROM_DATE", "").strip()
+    to_date_str = args.to_date or os.environ.get("PARAM_BACKTEST_TO_DATE", "").strip()
+
+    if from_date_str or to_date_str:
+        # Batch mode: a missing bound collapses the range to a single session.
+        from_date_str = dt.strptime(from_date_str or to_date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
+        to_date_str = dt.strptime(to_date_str or from_date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
+        start_run("system5_backtest", broker=ACTIVE_BROKER, from_date=from_date_str, to_date=to_date_str)
+        try:
+            run_backtest_range(from_date_str, to_date_str)
+        except BrokerAuthError as err:
+            report_auth_abort(err)
+            finish_run_report()
+            sys.exit(1)
+        finish_run_report()
+        return
 
     if not raw_date_str:
         target_dt = dt.utcnow() + timedelta(hours=5, minutes=30)
-        if target_dt.weekday() == 5: target_dt -= timedelta(days=1)
-        elif target_dt.weekday() == 6: target_dt -= timedelta(days=2)
-        target_date_str = target_dt.strftime("%Y-%m-%d")
+        target_date_str = last_session_on_or_before(target_dt.strftime("%Y-%m-%d"))
     else:
         target_date_str = dt.strptime(raw_date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
 
-    scan_institutional_tape(target_date_str)
+    start_run("system5", broker=ACTIVE_BROKER, target_date=target_date_str)
+    try:
+        scan_institutional_tape(target_date_str)
+    except BrokerAuthError as err:
+        report_auth_abort(err)
+        finish_run_report()
+        sys.exit(1)
+    finish_run_report()
 
 if __name__ == "__main__":
     run_production_sweep()
@@ -0,0 +1,198 @@
+"""adaptive_concurrency.py - AIMD Concurrency Controller for Broker APIs
+
+Replaces hand-picked worker counts (80 / 40 / 25 / 10 / 4) as the real cap on
+in-flight requests. Thread pools and semaphores stay as hard ceilings; this
+controller decides how many of those slots may be on the wire right now.
+- Additive increase: +1 in-flight slot per window of healthy responses
+  (HTTP 200 within LATENCY_TOLERANCE x the running baseline latency)
+- Multiplicative decrease: HTTP 429 / 5xx / network errors halve the limit,
+  at most once per DECREASE_COOLDOWN_SECS so one burst of failures from the
+  same window does not collapse it to the floor
+- Latency creep (queueing at the broker) holds the limit where it is instead
+  of growing it into a throttle; so does a limit the callers are not filling
+- ONE controller per broker, shared by threads and asyncio tasks alike
+  (works alongside the token bucket in rate_limiter.py, which caps req/sec);
+  waiting coroutines sleep on a per-event-loop asyncio.Event that release()
+  sets from whichever thread freed the slot, so nothing polls
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+BROKER_CONCURRENCY_DEFAULTS = {
+    "FYERS": {"initial": 8, "min": 1, "max": 64},
+    "UPSTOX": {"initial": 8, "min": 1, "max": 50},
+}
+DECREASE_FACTOR = 0.5
+DECREASE_COOLDOWN_SECS = 1.0
+LATENCY_TOLERANCE = 2.0
+LATENCY_FLOOR_SECS = 0.25
+LATENCY_BASELINE_ALPHA = 0.05
+
+
+class RequestOutcome:
+    """Handed out by the controller's context managers; call record(status) once the response is in."""
+
+    def __init__(self):
+        self.status = None
+
+    def record(self, status):
+        self.status = status
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, initial, minimum, maximum, name=""):
+        self.name = name
+        self.min_limit = max(1.0, float(minimum))
+        self.max_limit = max(self.min_limit, float(maximum))
+        self.limit = min(self.max_limit, max(self.min_limit, float(initial)))
+        self.in_flight = 0
+        self._baseline_latency = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._loop_waiters = {}  # event loop -> [asyncio.Event, coroutines waiting on it]
+
+        self.completed = 0
+        self.increases = 0
+        self.decreases = 0
+        self.peak_limit = self.limit
+        self.peak_in_flight = 0
+
+    # --------------------------------------------------------------------------
+    # Slots
+    # --------------------------------------------------------------------------
+    def _try_enter(self):
+        """Takes a slot if one is free; caller holds self._cond."""
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+        return False
+
+    def acquire(self):
+        """Blocks until an in-flight slot is free, then takes it."""
+        with self._cond:
+            while not self._try_enter():
+                self._cond.wait()
+
+    async def acquire_async(self):
+        """Coroutine twin of acquire() (never blocks the event loop)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._try_enter():
+                    return
+                # Cleared under the lock, so a release() after this check always wakes us.
+                waiting = self._loop_waiters.setdefault(loop, [asyncio.Event(), 0])
+                waiting[0].clear()
+                waiting[1] += 1
+            try:
+                await waiting[0].wait()
+            finally:
+                with self._cond:
+                    waiting[1] -= 1
+                    if waiting[1] == 0 and self._loop_waiters.get(loop) is waiting:
+                        del self._loop_waiters[loop]
+
+    def release(self, status, latency):
+        """Frees the slot and feeds the outcome back (status None = network error)."""
+        with self._cond:
+            # Only a window that actually filled the limit proves more slots are usable.
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            self.completed += 1
+            now = time.monotonic()
+            if status is None or status == 429 or status >= 500:
+                if now - self._last_decrease >= DECREASE_COOLDOWN_SECS:
+                    self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif status == 200:
+                baseline = latency if self._baseline_latency is None else self._baseline_latency
+                self._baseline_latency = baseline + LATENCY_BASELINE_ALPHA * (latency - baseline)
+                if saturated and latency <= max(LATENCY_FLOOR_SECS, baseline * LATENCY_TOLERANCE):
+                    # +1 slot per full window of healthy completions.
+                    before = int(self.limit)
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                    if int(self.limit) > before:
+                        self.increases += 1
+                    self.peak_limit = max(self.peak_limit, self.limit)
+            self._cond.notify_all()
+            for loop, (event, _) in list(self._loop_waiters.items()):
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:  # loop already closed
+                    del self._loop_waiters[loop]
+
+    @contextmanager
+    def request(self):
+        """`with controller.request() as outcome: ...; outcome.record(res.status_code)`"""
+        outcome = RequestOutcome()
+        self.acquire()
+        started = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.release(outcome.status, time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def request_async(self):
+        outcome = RequestOutcome()
+        await self.acquire_async()
+        started = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.release(outcome.status, time.perf_counter() - started)
+
+    # --------------------------------------------------------------------------
+    # Reporting
+    # --------------------------------------------------------------------------
+    def stats(self):
+        with self._cond:
+            return {
+                "broker": self.name,
+                "limit": round(self.limit, 2),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "peak_limit": round(self.peak_limit, 2),
+                "peak_in_flight": self.peak_in_flight,
+                "completed": self.completed,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "baseline_latency_ms": round(self._baseline_latency * 1000, 1) if self._baseline_latency is not None else None,
+            }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[Concurrency {s['broker']}] limit {s['limit']:g} (peak {s['peak_limit']:g}, "
+                f"range {s['min_limit']:g}-{s['max_limit']:g}) | peak in-flight {s['peak_in_flight']} "
+                f"| +{s['increases']} / -{s['decreases']} adjustments over {s['completed']} requests")
+
+
+_CONTROLLERS = {}
+_CONTROLLERS_LOCK = threading.Lock()
+
+
+def get_concurrency_limiter(broker):
+    """Returns the process-wide AIMD controller for `broker` ("FYERS" / "UPSTOX").
+
+    Bounds are overridable per deployment, e.g.
+    FYERS_MIN_CONCURRENCY=2 FYERS_MAX_CONCURRENCY=32 FYERS_INITIAL_CONCURRENCY=4
+    """
+    broker = broker.upper()
+    with _CONTROLLERS_LOCK:
+        controller = _CONTROLLERS.get(broker)
+        if controller is None:
+            defaults = BROKER_CONCURRENCY_DEFAULTS.get(broker, {"initial": 4, "min": 1, "max": 16})
+            controller = AdaptiveConcurrencyLimiter(
+                int(os.environ.get(f"{broker}_INITIAL_CONCURRENCY", defaults["initial"])),
+                int(os.environ.get(f"{broker}_MIN_CONCURRENCY", defaults["min"])),
+                int(os.environ.get(f"{broker}_MAX_CONCURRENCY", defaults["max"])),
+                name=broker,
+            )
+            _CONTROLLERS[broker] = controller
+        return controller
@@ -0,0 +1,233 @@
+"""async_fetcher.py - Asyncio/aiohttp Candle Ingestion Engine
+
+Drop-in bulk replacement for thread-pooled `fetch_broker_data` loops.
+- ONE pooled aiohttp session per batch (TCP/TLS keep-alive, per-host connection cap)
+- Bounded concurrency via an asyncio.Semaphore instead of 80 OS threads; the
+  per-broker AIMD controller (adaptive_concurrency.py) decides how many of
+  those slots are actually in flight
+- Every request draws from the shared per-broker token bucket (rate_limiter.py);
+  once the broker's auth breaker (auth_breaker.py) trips, the rest return None
+  without touching the network
+- Same return contract as fetch_broker_data: a DataFrame with a naive IST
+  `Datetime` column, or None when the broker had nothing / failed
+- `fetch_days()` covers a list of session days with as few RANGED requests per
+  key as the broker allows (plus the intraday endpoint for a live day), all in
+  one session, instead of one request per key per day
+"""
+
+import asyncio
+import os
+import time
+import urllib.parse
+
+import aiohttp
+import pandas as pd
+
+from adaptive_concurrency import get_concurrency_limiter
+from auth_breaker import get_auth_breaker
+from rate_limiter import get_rate_limiter
+from run_profiler import count_event, observe_latency
+
+ASYNC_MAX_CONCURRENCY = int(os.environ.get("ASYNC_MAX_CONCURRENCY", "64"))
+ASYNC_REQUEST_TIMEOUT = 10
+ASYNC_MAX_ATTEMPTS = 3
+
+# Widest calendar span one 1-minute history request may cover, per broker.
+MAX_RANGE_DAYS = {
+    "UPSTOX": int(os.environ.get("UPSTOX_MAX_RANGE_DAYS", "28")),
+    "FYERS": int(os.environ.get("FYERS_MAX_RANGE_DAYS", "100")),
+}
+
+
+def get_broker_headers(broker):
+    if broker == "UPSTOX":
+        return {"Accept": "application/json", "Authorization": f"Bearer {os.environ.get('UPSTOX_ACCESS_TOKEN', '')}"}
+    elif broker == "FYERS":
+        return {"Authorization": f"{os.environ.get('FYERS_CLIENT_ID', '')}:{os.environ.get('FYERS_ACCESS_TOKEN', '')}"}
+    return {}
+
+
+def build_history_url(broker, key, tf_type, start_dt, end_dt, is_live=False):
+    if broker == "UPSTOX":
+        encoded_key = urllib.parse.quote(key)
+        if is_live and tf_type == "1minute":
+            return f"https://api.upstox.com/v2/historical-candle/intraday/{encoded_key}/1minute"
+        res_tf = "1minute" if tf_type == "1minute" else "day"
+        return f"https://api.upstox.com/v2/historical-candle/{encoded_key}/{res_tf}/{end_dt}/{start_dt}"
+
+    # Fyers rejects an encoded ':' but a raw '&' (e.g. "NSE:GVT&D-EQ") truncates the query.
+    encoded_symbol = urllib.parse.quote(key, safe=':')
+    res_tf = "1" if tf_type == "1minute" else "D"
+    return (f"https://api-t1.fyers.in/data/history?symbol={encoded_symbol}&resolution={res_tf}"
+            f"&date_format=1&range_from={start_dt}&range_to={end_dt}")
+
+
+def parse_history_body(broker, body):
+    """Converts a decoded history response into the engine's candle DataFrame (or None)."""
+    if not body:
+        return None
+    if broker == "UPSTOX":
+        candles = (body.get("data") or {}).get("candles", [])
+        if not candles:
+            return None
+        df = pd.DataFrame(candles, columns=["Timestamp", "Open", "High", "Low", "Close", "Volume", "OI"])
+        df["Datetime"] = pd.to_datetime(df["Timestamp"]).dt.tz_localize(None).astype("datetime64[ns]")
+        return df
+
+    if body.get("s") != "ok" or not body.get("candles"):
+        return None
+    df = pd.DataFrame(body["candles"], columns=["Epoch", "Open", "High", "Low", "Close", "Volume"])
+    df["Datetime"] = pd.to_datetime(df["Epoch"], unit='s', utc=True).dt.tz_convert('Asia/Kolkata').dt.tz_localize(None).astype("datetime64[ns]")
+    return df
+
+
+async def _fetch_one(session, semaphore, limiter, broker, key, tf_type, start_dt, end_dt, is_live, log_error, served=None):
+    url = build_history_url(broker, key, tf_type, start_dt, end_dt, is_live)
+    concurrency = get_concurrency_limiter(broker)
+    breaker = get_auth_breaker(broker)
+    async with semaphore:
+        for attempt in range(ASYNC_MAX_ATTEMPTS):
+            if not breaker.allow():
+                return None
+            try:
+                await limiter.acquire_async()
+                # The AIMD slot covers only the wire time, not the retry back-off below.
+                async with concurrency.request_async() as outcome:
+                    started = time.perf_counter()
+                    async with session.get(url) as res:
+                        observe_latency(f"fetch_many[{tf_type}]", time.perf_counter() - started)
+                        count_event(f"http_status_{res.status}")
+                        outcome.record(res.status)
+                        status, retry_after = res.status, res.headers.get("Retry-After")
+                        if status == 200:
+                            body = await res.json(content_type=None)
+                        elif status not in (429, 500, 502, 503):
+                            error_text = (await res.text())[:300]
+
+                if status == 429:
+                    limiter.record_throttle(retry_after)
+                    continue
+                if status in (500, 502, 503):
+                    await asyncio.sleep(attempt + 1)
+                    continue
+                if status != 200:
+                    if breaker.observe(f"history {key}", status, error_text):
+                        return None
+                    if log_error:
+                        log_error(f"HTTP failure for {key}", status, error_text)
+                    return None
+
+                if broker == "FYERS" and body and body.get("s") == "error":
+                    if breaker.observe(f"history {key}", status, body):
+                        return None
+                    if log_error:
+                        log_error(f"API error for {key} (code={body.get('code')}, msg={body.get('message')})", 200)
+                    return None
+                if served is not None:
+                    # A real answer (possibly "no candles"), as opposed to a failure.
+                    served.add(key)
+                return parse_history_body(broker, body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                count_event("http_network_errors")
+                if log_error:
+                    log_error(f"Network exception on attempt {attempt + 1}: {e}")
+                await asyncio.sleep(1)
+            except Exception as e:
+                if log_error:
+                    log_error(f"Unexpected exception on attempt {attempt + 1}: {e}")
+                return None
+    return None
+
+
+async def _run_requests(requests, tf_type, broker, max_concurrency, progress, log_error, served=None):
+    """Runs {request_id: (key, start_dt, end_dt, is_live)} in one pooled session."""
+    limiter = get_rate_limiter(broker)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=max_concurrency,
+                                     keepalive_timeout=30, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=ASYNC_REQUEST_TIMEOUT * ASYNC_MAX_ATTEMPTS, sock_read=ASYNC_REQUEST_TIMEOUT)
+    results = {}
+
+    async with aiohttp.ClientSession(headers=get_broker_headers(broker), connector=connector, timeout=timeout) as session:
+        async def run(request_id, key, start_dt, end_dt, is_live):
+            results[request_id] = await _fetch_one(session, semaphore, limiter, broker, key, tf_type,
+                                                   start_dt, end_dt, is_live, log_error, served)
+            if progress:
+                progress(key, results[request_id])
+
+        await asyncio.gather(*(run(request_id, *spec) for request_id, spec in requests.items()))
+    return results
+
+
+async def fetch_many_async(keys, tf_type, start_dt, end_dt, is_live=False, broker="FYERS",
+                           max_concurrency=ASYNC_MAX_CONCURRENCY, progress=None, log_error=None, served=None):
+    requests = {k: (k, start_dt, end_dt, is_live) for k in dict.fromkeys(keys)}
+    return await _run_requests(requests, tf_type, broker, max_concurrency, progress, log_error, served)
+
+
+def fetch_many(keys, tf_type, start_dt, end_dt, is_live=False, broker="FYERS",
+               max_concurrency=ASYNC_MAX_CONCURRENCY, progress=None, log_error=None, served=None):
+    """Fetches the same candle window for every key concurrently.
+
+    Returns {key: DataFrame or None}. `progress(key, df)` is called as each key completes.
+    Pass a set as `served` to collect the keys the broker actually answered (with or
+    without candles), which tells "no data" apart from a failed request.
+    """
+    if not keys:
+        return {}
+    return asyncio.run(fetch_many_async(keys, tf_type, start_dt, end_dt, is_live=is_live, broker=broker,
+                                        max_concurrency=max_concurrency, progress=progress, log_error=log_error,
+                                        served=served))
+
+
+def fetch_ranges(ranges, tf_type="1minute", broker="FYERS", max_concurrency=ASYNC_MAX_CONCURRENCY,
+                 progress=None, log_error=None, served=None):
+    """Like fetch_many, but every key brings its own window: {key: (start_dt, end_dt, is_live)}."""
+    if not ranges:
+        return {}
+    requests = {key: (key, *window) for key, window in ranges.items()}
+    return asyncio.run(_run_requests(requests, tf_type, broker, max_concurrency, progress, log_error, served))
+
+
+def plan_date_windows(days, max_span_days):
+    """Groups 'YYYY-MM-DD' days into (first, last) windows spanning at most `max_span_days` calendar days."""
+    windows = []
+    for day in sorted(set(days)):
+        day_dt = pd.Timestamp(day)
+        if windows and (day_dt - pd.Timestamp(windows[-1][0])).days < max_span_days:
+            windows[-1][1] = day
+        else:
+            windows.append([day, day])
+    return [tuple(w) for w in windows]
+
+
+def fetch_days(keys, days, tf_type="1minute", broker="UPSTOX", live_day=None,
+               max_concurrency=ASYNC_MAX_CONCURRENCY, progress=None, log_error=None):
+    """Fetches every session in `days` for every key with ranged requests, concurrently.
+
+    `live_day` (today, while the market is open) goes to the intraday endpoint.
+    Returns {key: DataFrame restricted to `days` and sorted by Datetime, or None}.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys or not days:
+        return {}
+    windows = [(start, end, False) for start, end in
+               plan_date_windows([d for d in days if d != live_day], MAX_RANGE_DAYS.get(broker, 28))]
+    if live_day in days:
+        windows.append((live_day, live_day, True))
+
+    requests = {(k, w): (k, *windows[w]) for k in keys for w in range(len(windows))}
+    results = asyncio.run(_run_requests(requests, tf_type, broker, max_concurrency, progress, log_error))
+
+    wanted = pd.DatetimeIndex(pd.to_datetime(sorted(set(days))))
+    merged = {}
+    for key in keys:
+        parts = [results[(key, w)] for w in range(len(windows)) if results.get((key, w)) is not None]
+        if not parts:
+            merged[key] = None
+            continue
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        df = df[df["Datetime"].dt.normalize().isin(wanted)]
+        df = df.sort_values("Datetime", kind="stable").reset_index(drop=True)
+        merged[key] = df if not df.empty else None
+    return merged
@@ -0,0 +1,94 @@
+"""auth_breaker.py - Process-Wide Auth Circuit Breaker for Broker APIs
+
+An expired / rotated-out token fails every request of a run the same way, so the
+first auth failure is enough to know the rest are doomed.
+- ONE breaker per broker, shared by threads and asyncio tasks alike
+- The first HTTP 401 (or Fyers error code -16 "Could not authenticate") trips it
+- Every fetch path asks `allow()` before each attempt: once tripped, queued and
+  in-flight fetches return "no data" immediately instead of spending rate-limit
+  budget on the broker
+- Engines call `raise_if_tripped()` after each fetch stage; the BrokerAuthError
+  carries the ONE diagnostic (endpoint, status, body) to print before aborting
+"""
+
+import threading
+
+AUTH_HTTP_STATUSES = {401}
+AUTH_ERROR_CODES = {"FYERS": {-16}, "UPSTOX": set()}
+
+
+class BrokerAuthError(RuntimeError):
+    def __init__(self, broker, context, status_code=None, body=None):
+        self.broker = broker
+        self.context = context
+        self.status_code = status_code
+        self.body = str(body)[:300] if body is not None else ""
+        super().__init__(f"{broker} authentication failed: {context}"
+                         f"{' | HTTP ' + str(status_code) if status_code else ''} {self.body}".rstrip())
+
+
+class AuthCircuitBreaker:
+    def __init__(self, name=""):
+        self.name = name
+        self.error = None
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tripped(self):
+        return self.error is not None
+
+    def is_auth_failure(self, status_code, body=None):
+        if status_code in AUTH_HTTP_STATUSES:
+            return True
+        code = body.get("code") if isinstance(body, dict) else None
+        return code in AUTH_ERROR_CODES.get(self.name, set())
+
+    def trip(self, context, status_code=None, body=None):
+        """Opens the breaker; only the first caller's details are kept. True if this call tripped it."""
+        with self._lock:
+            if self.error is not None:
+                return False
+            self.error = BrokerAuthError(self.name, context, status_code, body)
+            return True
+
+    def observe(self, context, status_code, body=None):
+        """Trips the breaker if (status, decoded body) is an auth failure; returns whether it was one."""
+        if not self.is_auth_failure(status_code, body):
+            return False
+        self.trip(context, status_code, body)
+        return True
+
+    def allow(self):
+        """False (and counted) once the breaker is open: the caller should give up without a request."""
+        if self.error is None:
+            return True
+        with self._lock:
+            self.short_circuited += 1
+        return False
+
+    def raise_if_tripped(self):
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        return {
+            "broker": self.name,
+            "tripped": self.tripped,
+            "short_circuited": self.short_circuited,
+            "reason": str(self.error) if self.error is not None else None,
+        }
+
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_auth_breaker(broker):
+    """Returns the process-wide auth breaker for `broker` ("FYERS" / "UPSTOX")."""
+    broker = broker.upper()
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(broker)
+        if breaker is None:
+            breaker = _BREAKERS[broker] = AuthCircuitBreaker(broker)
+        return breaker
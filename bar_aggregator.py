@@ -0,0 +1,112 @@
+"""bar_aggregator.py - One-Pass Multi-Resolution OHLCV Bar Builder
+
+Replaces one `groupby(["Symbol", pd.Grouper(freq=tf)]).agg(...)` pass over the
+whole 1-minute tape per timeframe (micro resample + every macro tier).
+- The 1-minute tape is factorized and sorted symbol-major ONCE
+- Each resolution gets integer bucket ids, (Datetime - origin) // step. Bars
+  start wherever the symbol or the bucket changes, and OHLCV is reduced over
+  those boundaries with ufunc.reduceat (first / max / min / last / sum)
+- A coarser resolution is built from the finest already-built one whose step
+  divides it (15min from 5min, 60min from 30min, 1D from 60min...), so an extra
+  tier costs a pass over a fraction of the rows
+- Same bars as the pandas Grouper (closed="left", label="left"). The default
+  origin is midnight of the tape's first day, like Grouper's "start_day". Pass
+  a session anchor such as pd.Timestamp("2000-01-01 09:15") for 09:15-aligned
+  intraday bars (daily bars always start at midnight, as with the Grouper)
+- Every output is symbol-contiguous and comes with its SymbolLayout, and
+  `rows` puts the 1-minute tape itself in that order without another sort
+"""
+
+import numpy as np
+import pandas as pd
+
+from symbol_layout import SymbolLayout
+
+BAR_COLUMNS = ["Symbol", "Datetime", "Open", "High", "Low", "Close", "Volume"]
+DAY_NS = pd.Timedelta("1D").value
+
+
+class _Bars:
+    """Symbol-major OHLCV arrays; `times` are int64 nanoseconds."""
+
+    def __init__(self, codes, times, open_, high, low, close, volume):
+        self.codes, self.times = codes, times
+        self.open, self.high, self.low, self.close, self.volume = open_, high, low, close, volume
+
+    def __len__(self):
+        return len(self.times)
+
+
+def _reduce(src, origin, step):
+    bucket = (src.times - origin) // step
+    n = len(src)
+    if n == 0:
+        return src
+    new_bar = np.empty(n, dtype=bool)
+    new_bar[0] = True
+    np.not_equal(bucket[1:], bucket[:-1], out=new_bar[1:])
+    new_bar[1:] |= src.codes[1:] != src.codes[:-1]
+    starts = np.flatnonzero(new_bar)
+    ends = np.append(starts[1:], n) - 1
+    return _Bars(
+        src.codes[starts],
+        origin + bucket[starts] * step,
+        src.open[starts],
+        np.maximum.reduceat(src.high, starts),
+        np.minimum.reduceat(src.low, starts),
+        src.close[ends],
+        np.add.reduceat(src.volume, starts),
+    )
+
+
+class MultiResolutionBars:
+    def __init__(self, df, origin=None):
+        valid = df["Datetime"].notna().to_numpy()
+        df = df[valid]
+        codes, self.symbols = pd.factorize(df["Symbol"], sort=True)
+        times = df["Datetime"].to_numpy().astype("datetime64[ns]").view(np.int64)
+        order = np.lexsort((times, codes))
+        self.rows = np.flatnonzero(valid)[order]  # positional rows of the input, symbol-major
+
+        def col(name):
+            return df[name].to_numpy()[order]
+
+        self.base = _Bars(codes[order], times[order], col("Open"), col("High"), col("Low"), col("Close"), col("Volume"))
+        first_day = pd.Timestamp(times.min()).normalize() if len(times) else pd.Timestamp(0)
+        self.day_origin = first_day.as_unit("ns").value
+        self.origin = pd.Timestamp(first_day if origin is None else origin).as_unit("ns").value
+        self._built = {}
+
+    def _origin_for(self, step):
+        return self.day_origin if step % DAY_NS == 0 else self.origin
+
+    def _source_for(self, step):
+        """The finest already-built resolution on the same origin whose step divides `step`."""
+        origin = self._origin_for(step)
+        divisors = [s for s in self._built if s < step and step % s == 0 and self._origin_for(s) == origin]
+        return self._built[max(divisors)] if divisors else self.base
+
+    def _build(self, step):
+        if step not in self._built:
+            self._built[step] = _reduce(self._source_for(step), self._origin_for(step), step)
+        return self._built[step]
+
+    def bars(self, freq):
+        """OHLCV bars for `freq` ("3min", "30min", "1D"...), sorted by Symbol then Datetime."""
+        b = self._build(pd.to_timedelta(freq).value)
+        return pd.DataFrame({
+            "Symbol": self.symbols.take(b.codes),
+            "Datetime": b.times.view("datetime64[ns]"),
+            "Open": b.open, "High": b.high, "Low": b.low, "Close": b.close, "Volume": b.volume,
+        })
+
+    def layout(self, freq=None):
+        """SymbolLayout of bars(freq), or of the 1-minute tape in `rows` order when freq is None."""
+        b = self.base if freq is None else self._build(pd.to_timedelta(freq).value)
+        return SymbolLayout(b.codes)
+
+    def build(self, freqs):
+        """Builds every resolution finest-first so coarser tiers reuse finer ones."""
+        for step in sorted({pd.to_timedelta(f).value for f in freqs}):
+            self._build(step)
+        return self
@@ -0,0 +1,324 @@
+"""broker_replay.py - Broker HTTP Recording Layer & Localhost Replay Server
+
+Runs any engine (System*.py, sectors/*.py, get_history.py) against recorded
+broker traffic instead of live Fyers / Upstox, for offline benchmarking and
+regression runs outside market hours.
+- `record`: runs a script with its `requests` and `aiohttp` calls to the broker
+  hosts captured to disk (history, quotes, profile, symbol masters), one file
+  pair per distinct request (method + host + path + sorted query, auth excluded)
+- `replay`: runs a script with those hosts rewritten to a localhost replay
+  server (started in-process unless --url points at one) and prints the
+  script's wall time plus the server's counters at exit
+- `serve`: the replay server on its own, with configurable latency / jitter, a
+  per-host token-bucket rate limit (HTTP 429 + Retry-After when exceeded) and
+  seeded random 429 injection, so runs are deterministic
+- Requests that were never recorded get HTTP 404, and those misses are counted
+
+    python broker_replay.py record -- System5.py -d 2026-10-08
+    python broker_replay.py replay --latency-ms 40 --rate 10 --inject-429 0.02 -- System5.py -d 2026-10-08
+
+Pass explicit dates when replaying. A default of "today" will not match what
+was recorded.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import runpy
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+REPLAY_DIR = os.environ.get("BROKER_REPLAY_DIR", "broker_recordings")
+BROKER_HOSTS = tuple(h.strip() for h in os.environ.get(
+    "BROKER_REPLAY_HOSTS",
+    "api-t1.fyers.in,api.fyers.in,public.fyers.in,api.upstox.com,assets.upstox.com,worldtimeapi.org",
+).split(",") if h.strip())
+RECORDED_HEADERS = ("Content-Type", "Date", "Retry-After")
+
+
+def request_key(method, url):
+    """(host, digest) identifying a request regardless of query order or auth headers."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    raw = f"{method.upper()} {parts.netloc}{parts.path}?{query}"
+    return parts.netloc, hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _is_broker_url(url):
+    return urlsplit(str(url)).netloc in BROKER_HOSTS
+
+
+# ==============================================================================
+# 1. RECORDING
+# ==============================================================================
+class Recorder:
+    def __init__(self, root=REPLAY_DIR):
+        self.root = root
+        self.saved = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, method, url):
+        host, digest = request_key(method, url)
+        base = os.path.join(self.root, host, digest[:2], digest)
+        return f"{base}.json", f"{base}.body"
+
+    def save(self, method, url, status, headers, body):
+        # 429s are the replay server's job; 304s carry no body worth replaying.
+        if status in (304, 429):
+            return
+        meta_path, body_path = self._paths(method, url)
+        with self._lock:
+            if os.path.exists(meta_path) and status >= 300:
+                # Never let a later failure overwrite a good recording of the same request.
+                return
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            meta = {
+                "method": method.upper(),
+                "url": url,
+                "status": status,
+                "headers": {h: headers[h] for h in RECORDED_HEADERS if h in headers},
+                "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            for path, data, mode in ((body_path, body, "wb"), (meta_path, json.dumps(meta, indent=1), "w")):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, mode) as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            self.saved += 1
+
+    def load(self, method, url):
+        """(status, headers, body) for a recorded request, or None."""
+        meta_path, body_path = self._paths(method, url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta["status"], meta["headers"], f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+# ==============================================================================
+# 2. TRANSPORT HOOKS (requests + aiohttp)
+# ==============================================================================
+def install_hooks(recorder=None, replay_url=None):
+    """Patches requests and aiohttp so broker calls are recorded or sent to `replay_url`."""
+    import requests
+
+    original_request = requests.Session.request
+
+    def rewrite(url):
+        parts = urlsplit(str(url))
+        return f"{replay_url.rstrip('/')}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+    def session_request(self, method, url, *args, **kwargs):
+        if not _is_broker_url(url):
+            return original_request(self, method, url, *args, **kwargs)
+        if replay_url:
+            return original_request(self, method, rewrite(url), *args, **kwargs)
+        res = original_request(self, method, url, *args, **kwargs)
+        first = res.history[0] if res.history else res
+        recorder.save(method, first.request.url, res.status_code, res.headers, res.content)
+        return res
+
+    requests.Session.request = session_request
+
+    try:
+        import aiohttp
+    except ImportError:
+        return
+    original_aio_request = aiohttp.ClientSession._request
+
+    async def aio_request(self, method, str_or_url, *args, **kwargs):
+        if not _is_broker_url(str_or_url):
+            return await original_aio_request(self, method, str_or_url, *args, **kwargs)
+        if replay_url:
+            return await original_aio_request(self, method, rewrite(str_or_url), *args, **kwargs)
+        res = await original_aio_request(self, method, str_or_url, *args, **kwargs)
+        body = await res.read()  # cached on the response, so the caller can still read it
+        recorder.save(method, str(res.request_info.url), res.status, res.headers, body)
+        return res
+
+    aiohttp.ClientSession._request = aio_request
+
+
+# ==============================================================================
+# 3. REPLAY SERVER
+# ==============================================================================
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, root=REPLAY_DIR, latency_ms=0.0, jitter_ms=0.0,
+                 rate=0.0, burst=10, inject_429=0.0, seed=0):
+        super().__init__(("127.0.0.1", port), ReplayHandler)
+        self.recorder = Recorder(root)
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.inject_429 = float(inject_429)
+        self._rng = random.Random(seed)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "served": 0, "misses": 0, "throttled_rate": 0, "throttled_injected": 0}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def admit(self, host):
+        """None if the request may proceed, else the 429 counter to bump."""
+        with self._lock:
+            if self.inject_429 and self._rng.random() < self.inject_429:
+                return "throttled_injected"
+            if self.rate <= 0:
+                return None
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1.0:
+                self._buckets[host] = (tokens, now)
+                return "throttled_rate"
+            self._buckets[host] = (tokens - 1.0, now)
+            return None
+
+    def delay(self):
+        with self._lock:
+            extra = self._rng.uniform(0.0, self.jitter) if self.jitter else 0.0
+        return self.latency + extra
+
+    def format_stats(self):
+        c = self.counters
+        return (f"[Replay Server] {c['requests']} requests | {c['served']} served | {c['misses']} not recorded "
+                f"| 429s: {c['throttled_rate']} rate-limited + {c['throttled_injected']} injected")
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, headers, body):
+        self.send_response_only(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if "Date" not in headers:
+            self.send_header("Date", self.date_time_string())
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _handle(self):
+        server = self.server
+        server.count("requests")
+        host, _, rest = self.path.lstrip("/").partition("/")
+        url = f"https://{host}/{rest}"
+        time.sleep(server.delay())
+
+        throttled = server.admit(host)
+        if throttled:
+            server.count(throttled)
+            self._respond(429, {"Content-Type": "application/json", "Retry-After": "1"},
+                          b'{"s":"error","code":429,"message":"request limit reached"}')
+            return
+
+        recorded = server.recorder.load(self.command, url)
+        if recorded is None and self.command == "HEAD":
+            recorded = server.recorder.load("GET", url)
+        if recorded is None:
+            server.count("misses")
+            self._respond(404, {"Content-Type": "application/json"},
+                          b'{"s":"error","code":-404,"message":"not recorded"}')
+            return
+        server.count("served")
+        self._respond(*recorded)
+
+    do_GET = do_POST = do_HEAD = _handle
+
+
+def start_replay_server(**options):
+    """Starts a ReplayServer on a free localhost port in a daemon thread."""
+    server = ReplayServer(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ==============================================================================
+# 4. CLI
+# ==============================================================================
+def run_script(command):
+    """Runs `script.py args...` as __main__ in this process; returns its exit code."""
+    script, args = command[0], command[1:]
+    sys.argv = [script] + args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay broker HTTP traffic.")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    for mode in ("record", "replay", "serve"):
+        p = sub.add_parser(mode)
+        p.add_argument("--dir", default=REPLAY_DIR)
+        if mode != "record":
+            p.add_argument("--port", type=int, default=0)
+            p.add_argument("--latency-ms", type=float, default=0.0)
+            p.add_argument("--jitter-ms", type=float, default=0.0)
+            p.add_argument("--rate", type=float, default=0.0, help="req/sec per host (0 = unlimited)")
+            p.add_argument("--burst", type=float, default=10)
+            p.add_argument("--inject-429", type=float, default=0.0, help="probability of a random 429")
+            p.add_argument("--seed", type=int, default=0)
+        if mode == "replay":
+            p.add_argument("--url", default="", help="use an already running replay server")
+        if mode != "serve":
+            p.add_argument("command", nargs=argparse.REMAINDER, help="-- script.py [args...]")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        command = args.command[1:] if args.command[:1] == ["--"] else args.command
+        recorder = Recorder(args.dir)
+        install_hooks(recorder=recorder)
+        code = run_script(command)
+        print(f"[Record] {recorder.saved} broker responses saved under {args.dir}")
+        sys.exit(code)
+
+    options = dict(port=args.port, root=args.dir, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                   rate=args.rate, burst=args.burst, inject_429=args.inject_429, seed=args.seed)
+    if args.mode == "serve":
+        server = ReplayServer(**options)
+        print(f"[Replay Server] serving {args.dir} on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print(server.format_stats())
+        return
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    server = None if args.url else start_replay_server(**options)
+    install_hooks(replay_url=args.url or server.url)
+    started = time.perf_counter()
+    code = run_script(command)
+    print(f"[Replay] {command[0]} finished in {time.perf_counter() - started:.2f}s (exit {code})")
+    if server is not None:
+        print(server.format_stats())
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
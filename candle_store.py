@@ -0,0 +1,98 @@
+"""candle_store.py - Persistent Local Candle Store (Incremental Top-Up Cache)
+
+On-disk columnar cache for broker candles so that every engine run only asks
+the broker for the days it has never seen before.
+- Layout: <root>/<resolution>/<quoted symbol>/<YYYY-MM-DD>.parquet
+- One partition per CLOSED trading day (the live session is never persisted)
+- Empty partitions mark "fetched, broker had no candles" so holidays and
+  pre-listing days are not re-requested on every run
+- Atomic writes (tmp file + os.replace) so a crash never leaves half a file
+"""
+
+import os
+import urllib.parse
+
+import pandas as pd
+
+CANDLE_STORE_DIR = os.environ.get("CANDLE_STORE_DIR", "candle_store")
+CANDLE_COLUMNS = ["Datetime", "Open", "High", "Low", "Close", "Volume"]
+
+
+class CandleStore:
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+
+    def _symbol_dir(self, symbol, resolution):
+        # Broker keys contain ':', '|' and '&' (e.g. "NSE:GVT&D-EQ", "NSE_FO|12345"),
+        # so the symbol is fully percent-encoded into a single safe directory name.
+        return os.path.join(self.root, resolution, urllib.parse.quote(symbol, safe=""))
+
+    def _partition_path(self, symbol, resolution, day):
+        return os.path.join(self._symbol_dir(symbol, resolution), f"{day}.parquet")
+
+    def stored_days(self, symbol, resolution):
+        """Returns the set of 'YYYY-MM-DD' days already persisted for this symbol."""
+        sym_dir = self._symbol_dir(symbol, resolution)
+        if not os.path.isdir(sym_dir):
+            return set()
+        return {name[:-len(".parquet")] for name in os.listdir(sym_dir) if name.endswith(".parquet")}
+
+    def load(self, symbol, resolution, days):
+        """Reads every cached partition in `days`.
+
+        Returns (df_or_None, missing_days) where missing_days keeps the order of `days`.
+        A corrupt partition is treated as missing so it simply gets re-fetched.
+        """
+        stored = self.stored_days(symbol, resolution)
+        frames, missing = [], []
+        for day in days:
+            if day not in stored:
+                missing.append(day)
+                continue
+            try:
+                part = pd.read_parquet(self._partition_path(symbol, resolution, day))
+            except Exception:
+                missing.append(day)
+                continue
+            if not part.empty:
+                frames.append(part)
+
+        if not frames:
+            return None, missing
+        df = pd.concat(frames, ignore_index=True)
+        df["Datetime"] = df["Datetime"].astype("datetime64[ns]")
+        return df, missing
+
+    def save(self, symbol, resolution, df, covered_days):
+        """Persists `df` split into one partition per day in `covered_days`.
+
+        `covered_days` must only contain CLOSED sessions that the successful broker
+        request actually spanned; days in it without candles are written as empty
+        partitions (negative cache), days outside it are never touched.
+        """
+        if not covered_days:
+            return
+        sym_dir = self._symbol_dir(symbol, resolution)
+        os.makedirs(sym_dir, exist_ok=True)
+
+        if df is not None and not df.empty:
+            cols = [c for c in CANDLE_COLUMNS if c in df.columns]
+            data = df[cols].copy()
+            data["Datetime"] = data["Datetime"].astype("datetime64[ns]")
+            day_keys = data["Datetime"].dt.strftime("%Y-%m-%d")
+        else:
+            data = pd.DataFrame({c: pd.Series(dtype="float64") for c in CANDLE_COLUMNS})
+            data["Datetime"] = data["Datetime"].astype("datetime64[ns]")
+            day_keys = pd.Series(dtype="object")
+
+        for day in covered_days:
+            part = data[day_keys == day] if len(day_keys) else data
+            part = part.drop_duplicates(subset=["Datetime"]).sort_values("Datetime").reset_index(drop=True)
+            final_path = self._partition_path(symbol, resolution, day)
+            tmp_path = f"{final_path}.{os.getpid()}.tmp"
+            try:
+                part.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, final_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
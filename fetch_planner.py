@@ -0,0 +1,72 @@
+"""fetch_planner.py - Bounded History Fetch Plans for Option Contracts
+
+Works out, per contract, the ONE date range worth asking the broker for, instead
+of a wide request followed by 5-day / 2-day retries and a separate live call.
+- A contract only trades between its listing and its expiry. Listing is
+  estimated from the monthly cycle (stock options are listed LISTING_CYCLES
+  monthly expiries ahead) using trading_calendar, and expiry comes straight
+  from the instrument master
+- Days the local candle store already holds are never requested again; that
+  includes its empty partitions, which act as the per-contract "known empty"
+  negative cache for illiquid contracts
+- On Fyers the live session rides along in the same history request (its
+  history endpoint already serves today); Upstox keeps its intraday endpoint
+"""
+
+import pandas as pd
+
+from trading_calendar import monthly_expiry, next_session
+
+LISTING_CYCLES = 3
+FALLBACK_SESSIONS = 2
+
+
+def estimated_listing_date(expiry, exchange="NSE", cycles=LISTING_CYCLES):
+    """First session after the monthly expiry `cycles` months before `expiry` (None = no lower bound)."""
+    ts = pd.Timestamp(expiry)
+    month = ts.year * 12 + ts.month - 1 - cycles
+    anchor = monthly_expiry(month // 12, month % 12 + 1, exchange)
+    return next_session(anchor) if anchor else None
+
+
+def plan_contract_range(expiry, missing_days, live_day=None):
+    """(start, end, covered_days) for one contract, or None when it needs no request.
+
+    `missing_days` are the closed sessions the candle store does not hold yet;
+    `covered_days` is the subset the contract could actually have traded in,
+    which is what a served (even empty) answer may be cached for. `live_day`
+    extends the range to today when the broker serves it from history.
+    """
+    expiry = str(pd.Timestamp(expiry).date()) if expiry else None
+    listing = estimated_listing_date(expiry) if expiry else None
+    covered = [d for d in missing_days
+               if (listing is None or d >= listing) and (expiry is None or d <= expiry)]
+    end = covered[-1] if covered else None
+    if live_day and (expiry is None or live_day <= expiry):
+        end = live_day
+    if end is None:
+        return None
+    return (covered[0] if covered else live_day), end, covered
+
+
+def plan_history_ranges(expiry_by_key, missing_by_key, live_day=None):
+    """{key: (start, end, covered_days)} for every contract that still needs a request."""
+    plan = {}
+    for key, missing_days in missing_by_key.items():
+        window = plan_contract_range(expiry_by_key.get(key), missing_days, live_day)
+        if window is not None:
+            plan[key] = window
+    return plan
+
+
+def fallback_range(window, sessions=FALLBACK_SESSIONS):
+    """The last `sessions` covered days of a planned range (None if it was already that short).
+
+    Brokers sometimes answer a range reaching back before a strike existed with no
+    candles at all; one short retry covers strikes opened after the estimated listing.
+    """
+    start, end, covered = window
+    if len(covered) <= sessions:
+        return None
+    short = covered[-sessions:]
+    return short[0], end, short
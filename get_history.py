@@ -1,13 +1,40 @@
+"""get_history.py - Resumable, Parallel F&O Daily Backfill
+
+Backfills daily candles for the whole F&O universe from Upstox.
+- Symbols are fetched concurrently (100-day chunks per request) under the
+  shared token bucket, AIMD concurrency controller and auth breaker
+- Each symbol's candles are appended as ONE Parquet part per run to a
+  dataset partitioned by symbol: <BACKFILL_DIR>/<quoted symbol>/<run>.parquet
+- A per-symbol checkpoint (<BACKFILL_DIR>/_checkpoint.json) records the range
+  already stored, written only after the part lands, so a crash loses at most
+  the symbols in flight and a re-run only asks for dates outside that range
+- historical_fno.csv is still exported at the end for the workflow artifact
+"""
+
 import os
 import requests
 import pandas as pd
 import json
 import gzip
 import io
+import threading
+import time
 import urllib.parse
-import time  # <-- Added for speed braking
+import concurrent.futures
 from datetime import datetime, timedelta
 
+from adaptive_concurrency import get_concurrency_limiter
+from auth_breaker import get_auth_breaker
+from rate_limiter import get_rate_limiter
+from trading_calendar import previous_session
+
+BACKFILL_DIR = os.environ.get("BACKFILL_DIR", "historical_fno")
+BACKFILL_EXPORT_CSV = os.environ.get("BACKFILL_EXPORT_CSV", "historical_fno.csv")
+CHECKPOINT_FILE = "_checkpoint.json"
+CHUNK_DAYS = 100
+MAX_ATTEMPTS = 5
+CANDLE_COLUMNS = ["Date", "Symbol", "Open", "High", "Low", "Close", "Volume"]
+
 def get_dynamic_fno_universe():
     print("🌐 Downloading Live Upstox NSE Master Contract...")
     nse_url = "https://assets.upstox.com/market-quote/instruments/exchange/NSE.json.gz"
@@ -40,11 +67,160 @@ def get_dynamic_fno_universe():
         print(f"❌ JSON Parsing Error: {str(e)}")
         return []
 
+class BackfillCheckpoint:
+    """{symbol: {"from": first stored date, "through": last complete date}}, saved atomically."""
+
+    def __init__(self, root=BACKFILL_DIR):
+        self.path = os.path.join(root, CHECKPOINT_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def get(self, symbol):
+        return self.state.get(symbol)
+
+    def update(self, symbol, fetched_from, fetched_through):
+        with self._lock:
+            done = self.state.get(symbol)
+            if done:
+                fetched_from, fetched_through = min(fetched_from, done["from"]), max(fetched_through, done["through"])
+            self.state[symbol] = {"from": fetched_from, "through": fetched_through}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def _shift(date_str, days):
+    return (datetime.strptime(date_str, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def plan_symbol_ranges(done, from_date, to_date):
+    """Date ranges still missing for one symbol, given its checkpoint entry.
+
+    Each range is stretched to touch the stored [from, through] span, whatever the
+    other requested bound is, so the checkpoint's single span never covers a gap
+    that was not fetched (e.g. a later PARAM_FROM_DATE after a long pause).
+    """
+    if not done:
+        return [(from_date, to_date)] if from_date <= to_date else []
+    ranges = []
+    if from_date < done["from"]:
+        ranges.append((from_date, _shift(done["from"], -1)))
+    if to_date > done["through"]:
+        ranges.append((_shift(done["through"], 1), to_date))
+    return ranges
+
+
+def chunk_range(from_date, to_date, days=CHUNK_DAYS):
+    """(from, to) chunks of at most `days` calendar days covering [from_date, to_date]."""
+    chunks, start = [], from_date
+    while start <= to_date:
+        end = min(to_date, _shift(start, days))
+        chunks.append((start, end))
+        start = _shift(end, 1)
+    return chunks
+
+
+def fetch_daily_chunk(encoded_key, symbol, str_from, str_to, headers):
+    """Daily candles for one chunk ([] when the broker has none, None on failure)."""
+    limiter = get_rate_limiter("UPSTOX")
+    concurrency = get_concurrency_limiter("UPSTOX")
+    breaker = get_auth_breaker("UPSTOX")
+    url = f"https://api.upstox.com/v2/historical-candle/{encoded_key}/day/{str_to}/{str_from}"
+
+    for attempt in range(MAX_ATTEMPTS):
+        if not breaker.allow():
+            return None
+        try:
+            limiter.acquire()
+            with concurrency.request() as outcome:
+                response = requests.get(url, headers=headers, timeout=30)
+                outcome.record(response.status_code)
+        except requests.exceptions.RequestException:
+            time.sleep(1)
+            continue
+
+        if response.status_code == 429:
+            limiter.record_throttle(response.headers.get("Retry-After"))
+            continue
+        if response.status_code in (500, 502, 503):
+            time.sleep(attempt + 1)
+            continue
+        if response.status_code == 200:
+            return response.json().get('data', {}).get('candles', [])
+        if not breaker.observe(f"daily history {symbol}", response.status_code, response.text[:300]):
+            print(f"⚠️ API Error for {symbol} ({str_from} to {str_to}): HTTP {response.status_code} - {response.text}")
+        return None
+    return None
+
+
+def candles_frame(symbol, candles):
+    """Raw Upstox candle arrays -> typed CANDLE_COLUMNS frame (no per-row dicts)."""
+    df = pd.DataFrame(candles, columns=["Timestamp", "Open", "High", "Low", "Close", "Volume", "OI"][:len(candles[0])])
+    df["Date"] = df["Timestamp"].str.slice(0, 10)
+    df["Symbol"] = symbol
+    df[["Open", "High", "Low", "Close", "Volume"]] = df[["Open", "High", "Low", "Close", "Volume"]].astype("float64")
+    return df[CANDLE_COLUMNS].drop_duplicates(subset=["Date"]).sort_values("Date").reset_index(drop=True)
+
+
+def write_symbol_part(root, symbol, df, run_tag):
+    sym_dir = os.path.join(root, urllib.parse.quote(symbol, safe=""))
+    os.makedirs(sym_dir, exist_ok=True)
+    final_path = os.path.join(sym_dir, f"{run_tag}.parquet")
+    tmp_path = f"{final_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, final_path)
+
+
+def load_history(root=BACKFILL_DIR):
+    """Reads the whole dataset back; later runs win where a date was stored twice."""
+    frames = []
+    for sym_dir in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        full_dir = os.path.join(root, sym_dir)
+        if not os.path.isdir(full_dir):
+            continue
+        for name in sorted(os.listdir(full_dir)):
+            if name.endswith(".parquet"):
+                frames.append(pd.read_parquet(os.path.join(full_dir, name)))
+    if not frames:
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset=['Symbol', 'Date'], keep="last")
+    return df.sort_values(['Symbol', 'Date']).reset_index(drop=True)
+
+
+def backfill_symbol(asset, ranges, headers, checkpoint, run_tag, through_cap, root=BACKFILL_DIR):
+    """Fetches every missing range of one symbol, stores it, then checkpoints it.
+
+    Returns the number of candles stored, or None if any chunk failed (nothing is
+    checkpointed then, so the next run retries the whole gap).
+    """
+    symbol = asset["symbol"]
+    encoded_key = urllib.parse.quote(asset["key"])
+    candles = []
+    for range_from, range_to in ranges:
+        for str_from, str_to in chunk_range(range_from, range_to):
+            chunk = fetch_daily_chunk(encoded_key, symbol, str_from, str_to, headers)
+            if chunk is None:
+                return None
+            candles.extend(chunk)
+
+    if candles:
+        write_symbol_part(root, symbol, candles_frame(symbol, candles), run_tag)
+    checkpoint.update(symbol, min(r[0] for r in ranges), min(through_cap, max(r[1] for r in ranges)))
+    return len(candles)
+
+
 def download_fno_history():
     access_token = os.environ.get("UPSTOX_ACCESS_TOKEN")
-    from_date_str = os.environ.get("PARAM_FROM_DATE", "2024-01-01")
-    to_date_str = os.environ.get("PARAM_TO_DATE", datetime.now().strftime("%Y-%m-%d"))
-    
+    from_date_str = os.environ.get("PARAM_FROM_DATE", "") or "2024-01-01"
+    to_date_str = os.environ.get("PARAM_TO_DATE", "") or datetime.now().strftime("%Y-%m-%d")
+
     if not access_token:
         print("❌ Error: UPSTOX_ACCESS_TOKEN missing.")
         return
@@ -52,66 +228,57 @@ def download_fno_history():
     fno_universe = get_dynamic_fno_universe()
     if not fno_universe:
         return
-    
-    all_rows = []
-    print(f"📥 Fetching Daily Candles from {from_date_str} to {to_date_str} (Using 100-Day Chunks)...")
 
-    final_start = datetime.strptime(from_date_str, "%Y-%m-%d")
-    final_end = datetime.strptime(to_date_str, "%Y-%m-%d")
+    # Today's daily candle is still forming: fetch it, but don't checkpoint past the last closed session.
+    today = (datetime.utcnow() + timedelta(hours=5, minutes=30)).strftime("%Y-%m-%d")
+    through_str = min(to_date_str, previous_session(today))
+    checkpoint = BackfillCheckpoint(BACKFILL_DIR)
+    headers = {'Accept': 'application/json', 'Authorization': f'Bearer {access_token}'}
+    run_tag = datetime.now().strftime("%Y%m%dT%H%M%S%f")
 
+    plans = {}
     for asset in fno_universe:
-        symbol = asset["symbol"]
-        encoded_key = urllib.parse.quote(asset["key"])
-        
-        current_end = final_end
-        asset_candles = []
-        
-        while current_end > final_start:
-            # SHIFT TO 100-DAY CHUNKS to bypass Upstox Data Limits
-            current_start = max(current_end - timedelta(days=100), final_start)
-            
-            str_to = current_end.strftime("%Y-%m-%d")
-            str_from = current_start.strftime("%Y-%m-%d")
-            
-            url = f"https://api.upstox.com/v2/historical-candle/{encoded_key}/day/{str_to}/{str_from}"
-            headers = {'Accept': 'application/json', 'Authorization': f'Bearer {access_token}'}
-            
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                data = response.json().get('data', {}).get('candles', [])
-                if data:
-                    asset_candles.extend(data)
-            else:
-                print(f"⚠️ API Error for {symbol} ({str_from} to {str_to}): HTTP {response.status_code} - {response.text}")
-                break 
-                
-            current_end = current_start - timedelta(days=1)
-            
-            # CRITICAL SPEED BRAKE: Prevents the 10 requests/second rate limit crash
-            time.sleep(0.3) 
-            
-        if asset_candles:
-            for c in asset_candles:
-                all_rows.append({
-                    'Date': c[0].split('T')[0],
-                    'Symbol': symbol,
-                    'Open': float(c[1]),
-                    'High': float(c[2]),
-                    'Low': float(c[3]),
-                    'Close': float(c[4]),
-                    'Volume': float(c[5])
-                })
-            print(f"✅ Extracted {len(asset_candles)} candles for {symbol}")
-
-    if all_rows:
-        df = pd.DataFrame(all_rows)
-        df = df.drop_duplicates(subset=['Symbol', 'Date'])
-        df = df.sort_values(['Symbol', 'Date']).reset_index(drop=True)
-        df.to_csv("historical_fno.csv", index=False)
-        print(f"🎉 Success! Saved {len(df)} rows of data to 'historical_fno.csv'.")
-    else:
-        print("❌ No data collected. Check the API error messages above.")
+        ranges = plan_symbol_ranges(checkpoint.get(asset["symbol"]), from_date_str, to_date_str)
+        if ranges:
+            plans[asset["symbol"]] = (asset, ranges)
+
+    print(f"📥 Fetching Daily Candles from {from_date_str} to {to_date_str} (100-Day Chunks, Parallel)...")
+    print(f"   {len(plans)}/{len(fno_universe)} symbols need data | "
+          f"{len(fno_universe) - len(plans)} already up to date in '{BACKFILL_DIR}'")
+
+    failed = []
+    workers = int(get_concurrency_limiter("UPSTOX").max_limit)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(backfill_symbol, asset, ranges, headers, checkpoint, run_tag, through_str, BACKFILL_DIR): symbol
+                   for symbol, (asset, ranges) in plans.items()}
+        for future in concurrent.futures.as_completed(futures):
+            symbol = futures[future]
+            try:
+                stored = future.result()
+            except Exception as e:
+                print(f"⚠️ Backfill failed for {symbol}: {e}")
+                stored = None
+            if stored is None:
+                failed.append(symbol)
+            elif stored:
+                print(f"✅ Extracted {stored} candles for {symbol}")
+
+    breaker = get_auth_breaker("UPSTOX")
+    if breaker.tripped:
+        print(f"❌ {breaker.error} — stopped early; re-run with a fresh token to resume.")
+    elif failed:
+        print(f"⚠️ {len(failed)} symbols failed and will be retried on the next run: {', '.join(sorted(failed)[:20])}")
+
+    if BACKFILL_EXPORT_CSV:
+        df = load_history(BACKFILL_DIR)
+        df = df[(df['Date'] >= from_date_str) & (df['Date'] <= to_date_str)]
+        if not df.empty:
+            df.to_csv(BACKFILL_EXPORT_CSV, index=False)
+            print(f"🎉 Success! Saved {len(df)} rows of data to '{BACKFILL_EXPORT_CSV}'.")
+        else:
+            print("❌ No data collected. Check the API error messages above.")
+    print(get_rate_limiter("UPSTOX").format_stats())
+    print(get_concurrency_limiter("UPSTOX").format_stats())
 
 if __name__ == "__main__":
     download_fno_history()
@@ -0,0 +1,261 @@
+"""indicator_kernels.py - Grouped EWM / Rolling Indicator Kernels
+
+One-pass replacements for `groupby("Symbol")[col].transform(lambda x: x.ewm(...))`
+and friends inside calculate_core_technicals (plus the grouped cumsum / shift the
+Renko and trigger stages need).
+- Every kernel takes a SYMBOL-MAJOR contiguous array plus segment offsets
+  (segment k = values[offsets[k]:offsets[k + 1]]) and restarts state per segment
+- numba kernels are straight ports of pandas' window aggregations (same
+  com->alpha conversion, Kahan-compensated rolling sum and cumsum, skip-NaN
+  min/max, midpoint median), so outputs match the old lambdas value for value
+- Rolling median keeps a sorted sliding buffer (binary insert / delete), i.e.
+  O(window) memmove per bar instead of re-sorting every window
+- Without numba, the same math runs through pandas' grouped window engines
+  (one Cython pass with group bounds, no Python lambda per symbol)
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def ewm_com(alpha=None, span=None):
+    """Centre of mass exactly as pandas derives it from alpha / span."""
+    if alpha is not None:
+        return 1.0 / alpha - 1.0
+    return (span - 1) / 2.0
+
+
+def _group_labels(offsets):
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+# ------------------------------------------------------------------------------
+# numba kernels
+# ------------------------------------------------------------------------------
+def _ewm_mean_nb(values, offsets, com):
+    out = np.empty(len(values))
+    alpha = 1.0 / (1.0 + com)
+    old_wt_factor = 1.0 - alpha
+    new_wt = alpha
+    for seg in range(len(offsets) - 1):
+        start, end = offsets[seg], offsets[seg + 1]
+        if end <= start:
+            continue
+        weighted = values[start]
+        nobs = 1 if weighted == weighted else 0
+        out[start] = weighted if nobs >= 1 else np.nan
+        old_wt = 1.0
+        for i in range(start + 1, end):
+            cur = values[i]
+            is_obs = cur == cur
+            if is_obs:
+                nobs += 1
+            if weighted == weighted:
+                old_wt *= old_wt_factor
+                if is_obs:
+                    if weighted != cur:
+                        weighted = old_wt * weighted + new_wt * cur
+                        weighted /= (old_wt + new_wt)
+                    old_wt = 1.0
+            elif is_obs:
+                weighted = cur
+            out[i] = weighted if nobs >= 1 else np.nan
+    return out
+
+
+def _rolling_mean_nb(values, offsets, window):
+    out = np.empty(len(values))
+    for seg in range(len(offsets) - 1):
+        start, end = offsets[seg], offsets[seg + 1]
+        nobs, neg_ct = 0, 0
+        sum_x, comp_add, comp_remove = 0.0, 0.0, 0.0
+        same_ct, prev_value = 0, values[start] if end > start else 0.0
+        for i in range(start, end):
+            if i - window >= start:
+                val = values[i - window]
+                if val == val:
+                    nobs -= 1
+                    y = -val - comp_remove
+                    t = sum_x + y
+                    comp_remove = t - sum_x - y
+                    sum_x = t
+                    if np.signbit(val):
+                        neg_ct -= 1
+            val = values[i]
+            if val == val:
+                nobs += 1
+                y = val - comp_add
+                t = sum_x + y
+                comp_add = t - sum_x - y
+                sum_x = t
+                if np.signbit(val):
+                    neg_ct += 1
+                if val == prev_value:
+                    same_ct += 1
+                else:
+                    same_ct = 1
+                prev_value = val
+            if nobs > 0:
+                result = sum_x / nobs
+                if same_ct >= nobs:
+                    result = prev_value
+                elif neg_ct == 0 and result < 0:
+                    result = 0.0
+                elif neg_ct == nobs and result > 0:
+                    result = 0.0
+                out[i] = result
+            else:
+                out[i] = np.nan
+    return out
+
+
+def _rolling_extreme_nb(values, offsets, window, is_max):
+    out = np.empty(len(values))
+    dq = np.empty(window + 1, dtype=np.int64)
+    for seg in range(len(offsets) - 1):
+        start, end = offsets[seg], offsets[seg + 1]
+        head, tail = 0, 0
+        for i in range(start, end):
+            # Monotonic deque of candidate indices inside [i - window + 1, i].
+            if head < tail and dq[head % (window + 1)] <= i - window:
+                head += 1
+            val = values[i]
+            if val == val:
+                while head < tail:
+                    last = values[dq[(tail - 1) % (window + 1)]]
+                    if (is_max and last <= val) or ((not is_max) and last >= val):
+                        tail -= 1
+                    else:
+                        break
+                dq[tail % (window + 1)] = i
+                tail += 1
+            out[i] = values[dq[head % (window + 1)]] if head < tail else np.nan
+    return out
+
+
+def _rolling_median_nb(values, offsets, window):
+    out = np.empty(len(values))
+    buf = np.empty(window)
+    for seg in range(len(offsets) - 1):
+        start, end = offsets[seg], offsets[seg + 1]
+        n = 0
+        for i in range(start, end):
+            if i - window >= start:
+                old = values[i - window]
+                if old == old:
+                    pos = np.searchsorted(buf[:n], old)
+                    buf[pos:n - 1] = buf[pos + 1:n].copy()
+                    n -= 1
+            val = values[i]
+            if val == val:
+                pos = np.searchsorted(buf[:n], val)
+                buf[pos + 1:n + 1] = buf[pos:n].copy()
+                buf[pos] = val
+                n += 1
+            if n == 0:
+                out[i] = np.nan
+            elif n % 2:
+                out[i] = buf[n // 2]
+            else:
+                out[i] = (buf[n // 2] + buf[n // 2 - 1]) / 2
+    return out
+
+
+def _cumsum_nb(values, offsets):
+    out = np.empty(len(values))
+    for seg in range(len(offsets) - 1):
+        total = 0.0
+        compensation = 0.0
+        for i in range(offsets[seg], offsets[seg + 1]):
+            cur = values[i]
+            if cur == cur:
+                y = cur - compensation
+                t = total + y
+                compensation = t - total - y
+                total = t
+                out[i] = total
+            else:
+                out[i] = np.nan
+    return out
+
+
+if njit is not None:
+    _cumsum_nb = njit(cache=True, nogil=True)(_cumsum_nb)
+    _ewm_mean_nb = njit(cache=True, nogil=True)(_ewm_mean_nb)
+    _rolling_mean_nb = njit(cache=True, nogil=True)(_rolling_mean_nb)
+    _rolling_extreme_nb = njit(cache=True, nogil=True)(_rolling_extreme_nb)
+    _rolling_median_nb = njit(cache=True, nogil=True)(_rolling_median_nb)
+
+
+def _prep(values, offsets):
+    return (np.ascontiguousarray(values, dtype=np.float64),
+            np.ascontiguousarray(offsets, dtype=np.int64))
+
+
+# ------------------------------------------------------------------------------
+# Public grouped kernels
+# ------------------------------------------------------------------------------
+def grouped_ewm_mean(values, offsets, com):
+    values, offsets = _prep(values, offsets)
+    if njit is not None:
+        return _ewm_mean_nb(values, offsets, float(com))
+    s = pd.Series(values).groupby(_group_labels(offsets), sort=False)
+    return s.ewm(com=com, adjust=False).mean().to_numpy()
+
+
+def grouped_rolling_mean(values, offsets, window):
+    values, offsets = _prep(values, offsets)
+    if njit is not None:
+        return _rolling_mean_nb(values, offsets, int(window))
+    s = pd.Series(values).groupby(_group_labels(offsets), sort=False)
+    return s.rolling(window, min_periods=1).mean().to_numpy()
+
+
+def grouped_rolling_max(values, offsets, window):
+    values, offsets = _prep(values, offsets)
+    if njit is not None:
+        return _rolling_extreme_nb(values, offsets, int(window), True)
+    s = pd.Series(values).groupby(_group_labels(offsets), sort=False)
+    return s.rolling(window, min_periods=1).max().to_numpy()
+
+
+def grouped_rolling_min(values, offsets, window):
+    values, offsets = _prep(values, offsets)
+    if njit is not None:
+        return _rolling_extreme_nb(values, offsets, int(window), False)
+    s = pd.Series(values).groupby(_group_labels(offsets), sort=False)
+    return s.rolling(window, min_periods=1).min().to_numpy()
+
+
+def grouped_rolling_median(values, offsets, window):
+    values, offsets = _prep(values, offsets)
+    if njit is not None:
+        return _rolling_median_nb(values, offsets, int(window))
+    s = pd.Series(values).groupby(_group_labels(offsets), sort=False)
+    return s.rolling(window, min_periods=1).median().to_numpy()
+
+
+def grouped_cumsum(values, offsets):
+    """Per-segment running sum; NaNs stay NaN and are skipped, like groupby().cumsum()."""
+    values, offsets = _prep(values, offsets)
+    if njit is not None:
+        return _cumsum_nb(values, offsets)
+    return pd.Series(values).groupby(_group_labels(offsets), sort=False).cumsum().to_numpy()
+
+
+def grouped_shift(values, offsets, periods=1):
+    """Per-segment shift by `periods` (>0), NaN-filled at each segment start."""
+    values = np.asarray(values, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    out = np.full(len(values), np.nan)
+    if periods < len(values):
+        out[periods:] = values[:-periods]
+    seg_starts, seg_lens = offsets[:-1], np.diff(offsets)
+    for k in range(periods):
+        out[seg_starts[k < seg_lens] + k] = np.nan
+    return out
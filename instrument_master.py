@@ -0,0 +1,175 @@
+"""instrument_master.py - Cached, Vectorized Fyers Instrument Master
+
+One shared loader for the Fyers public symbol files (NSE_CM / NSE_FO / BSE_FO)
+used by System4, System5 and the sector scanners.
+- Downloads each segment at most ONCE per trading day (ETag/Last-Modified
+  conditional GET once the cached copy is from an earlier day)
+- Parses with pandas.read_csv + vectorized column detection (no per-line loops)
+- Persists a typed parquet table sorted by underlying/expiry/strike/type, so every
+  later startup is a single columnar read plus integer-slice lookups
+"""
+
+import json
+import os
+from datetime import datetime as dt, timedelta
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+import requests
+
+FYERS_SYMBOL_MASTER_URL = "https://public.fyers.in/sym_details/{segment}.csv"
+INSTRUMENT_CACHE_DIR = os.environ.get("INSTRUMENT_CACHE_DIR", "instrument_cache")
+MASTER_COLUMNS = ["ticker", "underlying", "expiry", "strike", "opt_type", "lot_size", "fytoken"]
+
+# Documented Fyers symbol-master layout; only used when value-based detection fails.
+_DEFAULT_COLS = {"fytoken": 0, "lot_size": 3, "expiry": 8, "ticker": 9, "underlying": 13, "strike": 15, "opt_type": 16}
+
+
+def _ist_today():
+    return (dt.utcnow() + timedelta(hours=5, minutes=30)).strftime("%Y-%m-%d")
+
+
+def _detect_columns(raw):
+    """Finds the ticker / expiry / option-type columns by their VALUES, not positions.
+
+    Strike and underlying are read relative to the option-type column (1 and 3 to its
+    left), which is the layout every Fyers derivatives file has used so far.
+    """
+    cols = dict(_DEFAULT_COLS)
+    sample = raw.head(500)
+
+    for col in sample.columns:
+        as_str = sample[col].astype(str).str.strip()
+        if as_str.str.match(r"^(NSE|BSE|MCX):").mean() > 0.9:
+            cols["ticker"] = col
+            break
+
+    for col in reversed(list(sample.columns)):
+        if sample[col].astype(str).str.strip().isin(["CE", "PE", "XX"]).mean() > 0.9:
+            cols["opt_type"] = col
+            cols["strike"] = col - 1
+            cols["underlying"] = col - 3
+            break
+
+    for col in sample.columns:
+        num = pd.to_numeric(sample[col], errors="coerce")
+        if num.notna().mean() > 0.9 and num.between(1.5e9, 3e9).mean() > 0.9:
+            cols["expiry"] = col
+            break
+    return cols
+
+
+def parse_symbol_master(text):
+    """Parses a raw Fyers symbol-master CSV into the typed MASTER_COLUMNS table."""
+    raw = pd.read_csv(StringIO(text), header=None, low_memory=False, dtype=str)
+    if raw.empty:
+        return pd.DataFrame(columns=MASTER_COLUMNS)
+    cols = _detect_columns(raw)
+
+    def column(name):
+        idx = cols[name]
+        return raw[idx] if idx in raw.columns else pd.Series(np.nan, index=raw.index)
+
+    epoch = pd.to_numeric(column("expiry"), errors="coerce")
+    expiry = pd.to_datetime(epoch.where(epoch.between(1.5e9, 3e9)), unit="s", utc=True)
+    table = pd.DataFrame({
+        "ticker": column("ticker").astype(str).str.strip(),
+        "underlying": column("underlying").astype(str).str.strip().str.upper(),
+        "expiry": expiry.dt.tz_convert("Asia/Kolkata").dt.tz_localize(None).dt.normalize(),
+        "strike": pd.to_numeric(column("strike"), errors="coerce"),
+        "opt_type": column("opt_type").astype(str).str.strip().str.upper(),
+        "lot_size": pd.to_numeric(column("lot_size"), errors="coerce").fillna(0).astype("int32"),
+        "fytoken": column("fytoken").astype(str).str.strip(),
+    })
+    table = table[table["ticker"].str.contains(":", regex=False)]
+    table["opt_type"] = table["opt_type"].where(table["opt_type"].isin(["CE", "PE"]), "XX")
+    table["underlying"] = table["underlying"].astype("category")
+    table["opt_type"] = table["opt_type"].astype("category")
+    table["expiry"] = table["expiry"].astype("datetime64[ns]")
+    return table.sort_values(["underlying", "expiry", "strike", "opt_type"], kind="mergesort").reset_index(drop=True)
+
+
+def load_fyers_segment(segment, force_refresh=False):
+    """Returns the typed master table for `segment`, hitting the network at most once a day."""
+    os.makedirs(INSTRUMENT_CACHE_DIR, exist_ok=True)
+    table_path = os.path.join(INSTRUMENT_CACHE_DIR, f"{segment}.parquet")
+    meta_path = os.path.join(INSTRUMENT_CACHE_DIR, f"{segment}.meta.json")
+    today = _ist_today()
+
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(table_path):
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+        except Exception:
+            meta = {}
+
+    if meta and meta.get("date") == today and not force_refresh:
+        return pd.read_parquet(table_path)
+
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if meta and not force_refresh:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        res = requests.get(FYERS_SYMBOL_MASTER_URL.format(segment=segment), headers=headers, timeout=30)
+    except requests.exceptions.RequestException:
+        # Network hiccup: a stale-but-valid master beats no universe at all.
+        return pd.read_parquet(table_path) if meta else pd.DataFrame(columns=MASTER_COLUMNS)
+
+    if res.status_code == 304 and meta:
+        table = pd.read_parquet(table_path)
+    elif res.status_code == 200:
+        table = parse_symbol_master(res.text)
+        table.to_parquet(f"{table_path}.tmp", index=False)
+        os.replace(f"{table_path}.tmp", table_path)
+    else:
+        return pd.read_parquet(table_path) if meta else pd.DataFrame(columns=MASTER_COLUMNS)
+
+    with open(meta_path, "w") as f:
+        json.dump({"date": today, "etag": res.headers.get("ETag", meta.get("etag")),
+                   "last_modified": res.headers.get("Last-Modified", meta.get("last_modified"))}, f)
+    return table
+
+
+class OptionIndex:
+    """Integer-slice lookups over a master table sorted by underlying/expiry/strike/type."""
+
+    def __init__(self, table):
+        self.table = table[table["opt_type"].isin(["CE", "PE"]) & table["expiry"].notna() & table["strike"].notna()]
+        self.table = self.table.reset_index(drop=True)
+        codes = self.table["underlying"].astype(str).to_numpy()
+        if len(codes):
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            ends = np.r_[starts[1:], len(codes)]
+            self._slices = {codes[s]: (s, e) for s, e in zip(starts, ends)}
+        else:
+            self._slices = {}
+
+    def underlyings(self):
+        return list(self._slices)
+
+    def options(self, underlying, expiry=None):
+        start, end = self._slices.get(underlying, (0, 0))
+        chunk = self.table.iloc[start:end]
+        if expiry is not None:
+            chunk = chunk[chunk["expiry"] == pd.Timestamp(expiry)]
+        return chunk
+
+    def expiries(self, underlying, on_or_after=None):
+        exp = self.options(underlying)["expiry"].drop_duplicates()
+        if on_or_after is not None:
+            exp = exp[exp >= pd.Timestamp(on_or_after)]
+        return list(exp.dt.strftime("%Y-%m-%d"))
+
+
+def get_equity_ticker_map(segment="NSE_CM"):
+    """Maps base symbol -> confirmed '-EQ' ticker (e.g. 'RELIANCE' -> 'NSE:RELIANCE-EQ')."""
+    table = load_fyers_segment(segment)
+    eq = table[table["ticker"].str.endswith("-EQ")]
+    base = eq["ticker"].str.split(":", n=1).str[-1].str[:-len("-EQ")]
+    return dict(zip(base, eq["ticker"]))
@@ -0,0 +1,67 @@
+"""macro_alignment.py - Index-Based Micro -> Macro Tier Alignment
+
+Replaces one `pd.merge_asof(df_micro, env_df, on="Datetime", by="Symbol")` per
+macro timeframe (each one re-sorting the micro tape by Datetime and copying
+every column, then a re-sort back to Symbol/Datetime afterwards).
+- The micro tape's symbol codes and time ranks are computed ONCE, in whatever
+  row order the tape already has (nothing is sorted or copied)
+- Per macro tier, every micro bar is mapped to its latest completed macro bar
+  (Eval_Time <= bar time, same symbol) with ONE searchsorted over a combined
+  (symbol, time rank) key
+- Macro columns are then gathered by integer index; micro bars with no
+  completed macro bar yet get the caller's fill value (NaN by default), the
+  same rows merge_asof left empty
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _ns(times):
+    return np.asarray(times, dtype="datetime64[ns]").view(np.int64)
+
+
+class MacroAlignment:
+    def __init__(self, df, symbol_col="Symbol", time_col="Datetime"):
+        self.codes, self.symbols = pd.factorize(df[symbol_col])
+        times = _ns(df[time_col])
+        self.stamps, self.ranks = np.unique(times, return_inverse=True)
+        self.width = len(self.stamps) + 1
+        self.keys = self.codes.astype(np.int64) * self.width + self.ranks
+
+    def latest_index(self, env_df, symbol_col="Symbol", time_col="Datetime"):
+        """Row position in `env_df` of each micro row's latest completed macro bar (-1 if none)."""
+        env_codes = self.symbols.get_indexer(env_df[symbol_col])
+        # A macro stamp ranks at the first micro stamp it is <= to, so
+        # "macro time <= micro time" becomes "macro rank <= micro rank".
+        env_ranks = np.searchsorted(self.stamps, _ns(env_df[time_col]), side="left")
+        known = np.flatnonzero(env_codes >= 0)
+        if len(known) == 0:
+            return np.full(len(self.keys), -1, dtype=np.int64)
+        env_keys = env_codes[known].astype(np.int64) * self.width + env_ranks[known]
+        order = np.argsort(env_keys, kind="stable")
+        env_keys, rows = env_keys[order], known[order]
+
+        pos = np.searchsorted(env_keys, self.keys, side="right") - 1
+        hit = pos >= 0
+        hit[hit] = env_keys[pos[hit]] // self.width == self.codes[hit]
+        return np.where(hit, rows[np.maximum(pos, 0)], -1)
+
+    def attach(self, df, env_df, fills=None, skip=("Symbol", "Datetime")):
+        """Gathers every `env_df` column (bar `skip`) onto `df` in place; `fills` maps column -> value (and dtype) for misses."""
+        idx = self.latest_index(env_df)
+        hit = idx >= 0
+        safe = np.maximum(idx, 0)
+        fills = fills or {}
+        for col in env_df.columns:
+            if col in skip:
+                continue
+            values = env_df[col].to_numpy()
+            if col in fills:
+                fill = np.asarray(fills[col])
+                out = np.where(hit, values[safe] if len(values) else fill, fill).astype(fill.dtype)
+            else:
+                out = np.full(len(idx), np.nan, dtype=np.result_type(values.dtype, np.float64))
+                out[hit] = values[idx[hit]]
+            df[col] = out
+        return df
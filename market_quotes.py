@@ -0,0 +1,173 @@
+"""market_quotes.py - Batched Quote Snapshots (Fyers / Upstox)
+
+One multi-symbol quote call replaces one history request per instrument when
+all a stage needs is a snapshot (last price, previous close, session volume).
+- Fyers /data/quotes takes 50 symbols per call, Upstox /market-quote/quotes 500
+- Every call draws from the shared per-broker token bucket (rate_limiter.py)
+  and holds one slot of the AIMD concurrency controller (adaptive_concurrency.py)
+- Each quote carries the session date it belongs to, so callers can tell a
+  snapshot of a completed session from a live one
+- Symbols the broker does not return are simply absent: callers fall back to
+  history for those
+- `get_ltp_batch(keys)` is the broker-agnostic "last price for many symbols"
+  entry point (spot prices, marks)
+"""
+
+import os
+import time
+
+import pandas as pd
+import requests
+
+from adaptive_concurrency import get_concurrency_limiter
+from auth_breaker import get_auth_breaker
+from rate_limiter import get_rate_limiter
+from run_profiler import count_event, observe_latency
+
+QUOTE_BATCH_SIZE = {"FYERS": 50, "UPSTOX": 500}
+QUOTE_REQUEST_TIMEOUT = 10
+QUOTE_MAX_ATTEMPTS = 3
+
+
+def _auth_headers(broker):
+    if broker == "UPSTOX":
+        return {"Accept": "application/json", "Authorization": f"Bearer {os.environ.get('UPSTOX_ACCESS_TOKEN', '')}"}
+    return {"Authorization": f"{os.environ.get('FYERS_CLIENT_ID', '')}:{os.environ.get('FYERS_ACCESS_TOKEN', '')}"}
+
+
+def _session_date(value, unit):
+    """Epoch (seconds / milliseconds) or ISO timestamp -> IST 'YYYY-MM-DD' (None if unparsable)."""
+    try:
+        if value is None or value == "":
+            return None
+        if unit and str(value).isdigit():
+            ts = pd.to_datetime(int(value), unit=unit, utc=True)
+        else:
+            ts = pd.Timestamp(value)
+            ts = ts.tz_localize("Asia/Kolkata") if ts.tzinfo is None else ts
+        return ts.tz_convert("Asia/Kolkata").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_quotes_body(broker, body):
+    """Decoded quotes response -> {key: {"ltp", "prev_close", "volume", "session_date"}}."""
+    quotes = {}
+    if not isinstance(body, dict):
+        return quotes
+    if broker == "UPSTOX":
+        data = body.get("data")
+        for item in data.values() if isinstance(data, dict) else []:
+            if not isinstance(item, dict):
+                continue
+            key = item.get("instrument_token")
+            ltp = _number(item.get("last_price"))
+            if not key or ltp is None:
+                continue
+            change = _number(item.get("net_change"))
+            quotes[key] = {
+                "ltp": ltp,
+                "prev_close": ltp - change if change is not None else None,
+                "volume": _number(item.get("volume")),
+                "session_date": _session_date(item.get("last_trade_time"), "ms") or _session_date(item.get("timestamp"), None),
+            }
+        return quotes
+
+    items = body.get("d")
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        values = item.get("v") if isinstance(item.get("v"), dict) else {}
+        key = item.get("n") or values.get("symbol")
+        ltp = _number(values.get("lp"))
+        if item.get("s") != "ok" or not key or ltp is None:
+            continue
+        quotes[key] = {
+            "ltp": ltp,
+            "prev_close": _number(values.get("prev_close_price")),
+            "volume": _number(values.get("volume")),
+            "session_date": _session_date(values.get("tt"), "s"),
+        }
+    return quotes
+
+
+def _get_batch(broker, batch, headers, limiter, log_error):
+    if broker == "UPSTOX":
+        url, params = "https://api.upstox.com/v2/market-quote/quotes", {"instrument_key": ",".join(batch)}
+    else:
+        url, params = "https://api-t1.fyers.in/data/quotes", {"symbols": ",".join(batch)}
+
+    breaker = get_auth_breaker(broker)
+    for attempt in range(QUOTE_MAX_ATTEMPTS):
+        if not breaker.allow():
+            return {}
+        try:
+            limiter.acquire()
+            started = time.perf_counter()
+            with get_concurrency_limiter(broker).request() as outcome:
+                res = requests.get(url, params=params, headers=headers, timeout=QUOTE_REQUEST_TIMEOUT)
+                outcome.record(res.status_code)
+            observe_latency("fetch_quotes", time.perf_counter() - started)
+            count_event(f"http_status_{res.status_code}")
+            if res.status_code == 429:
+                limiter.record_throttle(res.headers.get("Retry-After"))
+                continue
+            if res.status_code in (500, 502, 503):
+                time.sleep(attempt + 1)
+                continue
+            if res.status_code != 200:
+                if breaker.observe(f"quotes ({len(batch)} symbols)", res.status_code, res.text):
+                    return {}
+                if log_error:
+                    log_error(f"Quote batch HTTP failure ({len(batch)} symbols)", res.status_code, res.text[:300])
+                return {}
+            body = res.json()
+            if not isinstance(body, dict):
+                # A 200 whose JSON is a list / null: these keys fall back to history.
+                if log_error:
+                    log_error(f"Quote batch returned a non-object body ({len(batch)} symbols)", 200, res.text[:300])
+                return {}
+            if broker == "FYERS" and body.get("s") == "error":
+                if breaker.observe(f"quotes ({len(batch)} symbols)", res.status_code, body):
+                    return {}
+                if log_error:
+                    log_error(f"Quote batch API error (code={body.get('code')}, msg={body.get('message')})", 200)
+                return {}
+            return parse_quotes_body(broker, body)
+        except requests.exceptions.RequestException as e:
+            count_event("http_network_errors")
+            if log_error:
+                log_error(f"Quote batch network exception on attempt {attempt + 1}: {e}")
+            time.sleep(1)
+        except ValueError:
+            return {}
+    return {}
+
+
+def fetch_quotes(keys, broker="FYERS", log_error=None):
+    """Quote snapshots for every key in QUOTE_BATCH_SIZE chunks; missing keys are left out."""
+    keys = list(dict.fromkeys(k for k in keys if k))
+    limiter = get_rate_limiter(broker)
+    headers = _auth_headers(broker)
+    size = QUOTE_BATCH_SIZE.get(broker, 50)
+
+    quotes = {}
+    for i in range(0, len(keys), size):
+        batch = keys[i:i + size]
+        wanted = set(batch)
+        quotes.update({k: q for k, q in _get_batch(broker, batch, headers, limiter, log_error).items() if k in wanted})
+    count_event("quote_hits", len(quotes))
+    count_event("quote_misses", len(keys) - len(quotes))
+    return quotes
+
+
+def get_ltp_batch(keys, broker="FYERS", log_error=None):
+    """{key: last traded price} from batch quote calls; unquoted keys are left out."""
+    return {key: q["ltp"] for key, q in fetch_quotes(keys, broker=broker, log_error=log_error).items() if q["ltp"]}
@@ -0,0 +1,53 @@
+"""pillar_scorecard.py - Bit-Packed Seven-Pillar Scorecard
+
+Each bar's seven pillar verdicts (price Renko, volume Renko, Renko velocity,
+RSI, ADX/DMI, EMA spread, stochastic) are packed into ONE uint8 bitmask per
+direction, bit i = PILLARS[i], instead of seven int64 series per side.
+- Score is the popcount of the mask; a bar is vetoed when it misses a mandatory
+  pillar, (mask & mandatory) != mandatory
+- A mask only has 256 possible values, so a ScorecardConfig (mandatory pillars +
+  minimum score) is compiled into a 256-entry armed/not-armed table, and arming
+  a whole tape is one table lookup
+- `armed_grid` evaluates any number of configs against the same mask array (one
+  lookup per config), for threshold / mandatory sweeps without rebuilding pillars
+"""
+
+import numpy as np
+
+PILLARS = ("PRICE_RENKO", "VOL_RENKO", "RENKO_VELOCITY", "RSI_BB", "ADX_DMI", "EMA_SPREAD", "STOCHASTIC")
+POPCOUNT = np.array([bin(m).count("1") for m in range(256)], dtype=np.int8)
+_ALL_MASKS = np.arange(256, dtype=np.uint8)
+
+
+def pack_pillars(flags):
+    """Per-bar bool arrays in PILLARS order -> uint8 bitmask per bar."""
+    mask = np.zeros(len(flags[0]), dtype=np.uint8)
+    for bit, flag in enumerate(flags):
+        mask |= np.asarray(flag, dtype=np.uint8) << np.uint8(bit)
+    return mask
+
+
+def pillar_score(mask):
+    """Number of pillars set per bar (int8, 0..7)."""
+    return POPCOUNT[mask]
+
+
+class ScorecardConfig:
+    def __init__(self, mandatory, min_score):
+        """`mandatory`: seven bools in PILLARS order; `min_score`: pillars needed out of 7."""
+        self.mandatory = np.uint8(sum(1 << bit for bit, required in enumerate(mandatory) if required))
+        self.min_score = int(min_score)
+        self.table = (POPCOUNT >= self.min_score) & ((_ALL_MASKS & self.mandatory) == self.mandatory)
+
+    def __repr__(self):
+        required = [name for bit, name in enumerate(PILLARS) if self.mandatory >> bit & 1]
+        return f"ScorecardConfig(mandatory={required}, min_score={self.min_score})"
+
+    def armed(self, mask):
+        """Bars whose mask meets the minimum score and every mandatory pillar."""
+        return self.table[mask]
+
+
+def armed_grid(mask, configs):
+    """(len(configs), bars) bool matrix: every config armed against the same masks."""
+    return np.stack([config.table for config in configs])[:, mask]
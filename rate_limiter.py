@@ -0,0 +1,139 @@
+"""rate_limiter.py - Process-Wide Token-Bucket Rate Limiter for Broker APIs
+
+Every fetch path (System1/3/4/5, get_history.py) draws from ONE shared bucket per
+broker instead of sleeping a fixed amount before each call.
+- Configurable sustained rate (req/sec) and burst size, overridable via env vars
+- Threads only block when the bucket is actually empty
+- HTTP 429 pauses the WHOLE bucket once (honouring Retry-After), instead of every
+  worker independently sleeping a random 1-3 seconds
+- Counters (requests, waits, seconds waited, 429s) for tuning the limits
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+# Published broker limits (history endpoints). Override per deployment, e.g.
+# FYERS_MAX_REQ_PER_SEC=8 FYERS_MAX_REQ_BURST=8 python System5.py
+BROKER_RATE_DEFAULTS = {
+    "FYERS": {"rate": 10.0, "burst": 10},
+    "UPSTOX": {"rate": 25.0, "burst": 25},
+}
+THROTTLE_COOLDOWN_SECS = 1.0
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate, burst, name=""):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.tokens_waited = 0
+        self.wait_seconds = 0.0
+        self.throttled_429 = 0
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def acquire(self):
+        """Blocks until one request token is available, then consumes it."""
+        if self.rate <= 0:
+            with self._lock:
+                self.requests += 1
+            return
+
+        start, waited = time.monotonic(), False
+        while True:
+            delay = self._try_take(start, waited)
+            if delay <= 0:
+                return
+            waited = True
+            time.sleep(delay)
+
+    def _try_take(self, start, waited):
+        """One non-blocking attempt; returns 0.0 on success, else the delay to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.requests += 1
+                if waited:
+                    self.tokens_waited += 1
+                    self.wait_seconds += now - start
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    async def acquire_async(self):
+        """Coroutine twin of acquire() for the asyncio ingestion engine (never blocks the loop)."""
+        if self.rate <= 0:
+            with self._lock:
+                self.requests += 1
+            return
+        start, waited = time.monotonic(), False
+        while True:
+            delay = self._try_take(start, waited)
+            if delay <= 0:
+                return
+            waited = True
+            await asyncio.sleep(delay)
+
+    def record_throttle(self, retry_after=None):
+        """Registers an HTTP 429: empties the bucket and pauses it for everyone."""
+        try:
+            cooldown = float(retry_after) if retry_after else THROTTLE_COOLDOWN_SECS
+        except (TypeError, ValueError):
+            cooldown = THROTTLE_COOLDOWN_SECS
+        with self._lock:
+            self.throttled_429 += 1
+            now = time.monotonic()
+            self._tokens = 0.0
+            self._last = now
+            self._paused_until = max(self._paused_until, now + cooldown)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "broker": self.name,
+                "rate_per_sec": self.rate,
+                "burst": self.burst,
+                "requests": self.requests,
+                "tokens_waited": self.tokens_waited,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "throttled_429": self.throttled_429,
+            }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"[Rate Limiter {s['broker']}] {s['requests']} requests @ {s['rate_per_sec']:g}/s "
+                f"(burst {s['burst']:g}) | waited {s['tokens_waited']}x for {s['wait_seconds']:.1f}s "
+                f"| HTTP 429 seen: {s['throttled_429']}")
+
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(broker):
+    """Returns the process-wide limiter for `broker` ("FYERS" / "UPSTOX")."""
+    broker = broker.upper()
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(broker)
+        if limiter is None:
+            defaults = BROKER_RATE_DEFAULTS.get(broker, {"rate": 10.0, "burst": 10})
+            rate = float(os.environ.get(f"{broker}_MAX_REQ_PER_SEC", defaults["rate"]))
+            burst = float(os.environ.get(f"{broker}_MAX_REQ_BURST", defaults["burst"]))
+            limiter = TokenBucketLimiter(rate, burst, name=broker)
+            _LIMITERS[broker] = limiter
+        return limiter
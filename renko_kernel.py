@@ -0,0 +1,71 @@
+"""renko_kernel.py - Native-Speed 45-Degree Renko Brick Kernel
+
+Shared kernel behind construct_45deg_renko_matrix / construct_volume_delta_renko_matrix
+in every System engine.
+- Runs ALL symbols in one call over contiguous arrays + segment offsets
+- JIT-compiled with numba when it is installed, plain Python loop otherwise
+- Brick arithmetic mirrors the original per-symbol loops operation for operation
+  (Python max() NaN semantics, float floor division, int truncation), so the
+  counts are bit-identical to the old implementation
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _renko_counts_py(values, brick_sizes, offsets, min_brick):
+    counts = np.zeros(len(values))
+    for seg in range(len(offsets) - 1):
+        start, end = offsets[seg], offsets[seg + 1]
+        if end <= start:
+            continue
+        curr_trend, curr_count, curr_level = 0, 0, values[start]
+        for i in range(start + 1, end):
+            # Same as max(brick_sizes[i], min_brick): a NaN brick stays NaN (no brick).
+            bs = min_brick if min_brick > brick_sizes[i] else brick_sizes[i]
+            move = values[i] - curr_level
+            if curr_trend >= 0:
+                if move >= bs:
+                    bricks = int(move // bs)
+                    curr_trend = 1
+                    curr_count = curr_count + bricks if curr_count > 0 else bricks
+                    curr_level += bricks * bs
+                elif move <= -(2 * bs):
+                    bricks = int(abs(move) // bs)
+                    curr_trend = -1
+                    curr_count = -bricks
+                    curr_level -= bricks * bs
+            else:
+                if move <= -bs:
+                    bricks = int(abs(move) // bs)
+                    curr_trend = -1
+                    curr_count = curr_count - bricks if curr_count < 0 else -bricks
+                    curr_level -= bricks * bs
+                elif move >= (2 * bs):
+                    bricks = int(move // bs)
+                    curr_trend = 1
+                    curr_count = bricks
+                    curr_level += bricks * bs
+            counts[i] = curr_count
+    return counts
+
+
+_renko_counts_jit = njit(cache=True, nogil=True)(_renko_counts_py) if njit is not None else None
+
+
+def renko_brick_counts(values, brick_sizes, offsets, min_brick):
+    """Signed running brick counts for symbol-contiguous `values`.
+
+    `offsets` has one more entry than there are segments: segment k spans
+    values[offsets[k]:offsets[k + 1]]. The first bar of every segment is 0.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    brick_sizes = np.ascontiguousarray(brick_sizes, dtype=np.float64)
+    offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+    kernel = _renko_counts_jit if _renko_counts_jit is not None else _renko_counts_py
+    return kernel(values, brick_sizes, offsets, float(min_brick))
+
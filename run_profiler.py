@@ -0,0 +1,180 @@
+"""run_profiler.py - Stage Timers, Counters & Latency Histograms per Run
+
+Lightweight instrumentation for the System5 pipeline (and anything that imports
+the shared fetchers).
+- `with profile_stage("history_fetch"):` records wall time, process CPU time and
+  peak RSS per stage; nested stages are reported as "parent/child" and repeated
+  stages (e.g. one simulation per backtest date) accumulate calls and seconds
+- `count_event(name, n)` for plain counters (contracts, rows, HTTP statuses)
+- `observe_latency(name, seconds)` feeds a per-endpoint latency histogram
+  (fixed millisecond buckets + p50/p90/p99)
+- `start_run(name, **meta)` opens a fresh report; `write_report()` dumps it as
+  JSON under PROFILE_REPORT_DIR so runs can be diffed for regressions
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_REPORT_DIR = os.environ.get("PROFILE_REPORT_DIR", "profile_reports")
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes.
+    return round(peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0, 1)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.samples = []
+
+    def observe(self, seconds):
+        ms = seconds * 1000.0
+        self.samples.append(ms)
+        for i, edge in enumerate(self.buckets_ms):
+            if ms <= edge:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        n = len(ordered)
+
+        def pct(q):
+            return round(ordered[min(n - 1, int(q * n))], 1) if n else None
+
+        buckets = {f"<={edge}ms": c for edge, c in zip(self.buckets_ms, self.counts)}
+        buckets[f">{self.buckets_ms[-1]}ms"] = self.counts[-1]
+        return {
+            "count": n,
+            "total_seconds": round(sum(ordered) / 1000.0, 3),
+            "mean_ms": round(sum(ordered) / n, 1) if n else None,
+            "p50_ms": pct(0.50),
+            "p90_ms": pct(0.90),
+            "p99_ms": pct(0.99),
+            "max_ms": round(ordered[-1], 1) if n else None,
+            "buckets": buckets,
+        }
+
+
+class RunProfiler:
+    def __init__(self, name, **meta):
+        self.name = name
+        self.meta = dict(meta)
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stages = {}
+        self.counters = {}
+        self.histograms = {}
+
+    @contextmanager
+    def stage(self, name):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        full_name = "/".join(stack + [name])
+        stack.append(name)
+        t0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stack.pop()
+            wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+            with self._lock:
+                entry = self.stages.setdefault(full_name, {"calls": 0, "wall_seconds": 0.0, "process_cpu_seconds": 0.0})
+                entry["calls"] += 1
+                entry["wall_seconds"] += wall
+                entry["process_cpu_seconds"] += cpu
+                entry["peak_rss_mb"] = peak_rss_mb()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe_latency(self, name, seconds):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = LatencyHistogram()
+            hist.observe(seconds)
+
+    def report(self):
+        with self._lock:
+            stages = {name: {**entry, "wall_seconds": round(entry["wall_seconds"], 3),
+                             "process_cpu_seconds": round(entry["process_cpu_seconds"], 3)}
+                      for name, entry in self.stages.items()}
+            return {
+                "run": self.name,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "wall_seconds": round(time.perf_counter() - self._t0, 3),
+                "process_cpu_seconds": round(time.process_time() - self._cpu0, 3),
+                "peak_rss_mb": peak_rss_mb(),
+                "meta": self.meta,
+                "stages": stages,
+                "counters": dict(self.counters),
+                "latency": {name: hist.summary() for name, hist in self.histograms.items()},
+            }
+
+    def write_report(self, directory=PROFILE_REPORT_DIR):
+        """Writes the JSON report and returns its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}_{self.started_at:%Y%m%d_%H%M%S}.json")
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2, default=str)
+        return path
+
+    def format_summary(self):
+        rep = self.report()
+        lines = [f"[Run Profile {rep['run']}] {rep['wall_seconds']:.1f}s wall | peak RSS {rep['peak_rss_mb']} MB"]
+        for name, entry in rep["stages"].items():
+            calls = f" x{entry['calls']}" if entry["calls"] > 1 else ""
+            lines.append(f"  {name:<40} {entry['wall_seconds']:>8.2f}s{calls}")
+        for name, lat in rep["latency"].items():
+            lines.append(f"  {name:<40} {lat['count']} req | p50 {lat['p50_ms']}ms | p90 {lat['p90_ms']}ms | max {lat['max_ms']}ms")
+        return "\n".join(lines)
+
+
+_CURRENT = RunProfiler("default")
+
+
+def start_run(name, **meta):
+    """Starts a fresh process-wide report (call once at the top of a run)."""
+    global _CURRENT
+    _CURRENT = RunProfiler(name, **meta)
+    return _CURRENT
+
+
+def get_profiler():
+    return _CURRENT
+
+
+def profile_stage(name):
+    return _CURRENT.stage(name)
+
+
+def count_event(name, n=1):
+    _CURRENT.count(name, n)
+
+
+def observe_latency(name, seconds):
+    _CURRENT.observe_latency(name, seconds)
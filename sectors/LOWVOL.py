@@ -21,10 +21,8 @@ import json
 import logging
 import warnings
 import smtplib
-import re
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from io import StringIO
 from pathlib import Path
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -32,14 +30,14 @@ from datetime import datetime, timedelta
 
 import numpy as np
 import pandas as pd
-import requests
 from fyers_apiv3 import fyersModel
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from instrument_master import OptionIndex, load_fyers_segment
+from trading_calendar import last_session_on_or_before
+
 IST = "Asia/Kolkata"
-FYERS_MASTER_URLS = [
-    "https://public.fyers.in/sym_details/NSE_FO.csv",
-    "https://public.fyers.in/sym_details/BSE_FO.csv"
-]
+FYERS_MASTER_SEGMENTS = ["NSE_FO", "BSE_FO"]
 MARKET_OPEN = "09:15:00"
 MARKET_CLOSE = "15:30:00"
 VERSION = "2026-07-12-prod-options-v4-final"
@@ -173,9 +171,7 @@ def current_session_date():
     d = now.date()
     if now.time() < pd.Timestamp(MARKET_OPEN).time():
         d = d - timedelta(days=1)
-    while pd.Timestamp(d).weekday() >= 5:
-        d = d - timedelta(days=1)
-    return d
+    return pd.Timestamp(last_session_on_or_before(d)).date()
 
 def init_fyers():
     try:
@@ -351,65 +347,33 @@ def build_row(symbol, anchor_915, anchor_source, calc_anchor, ltp_price, levels)
 
 def get_recent_expiry_options(fyers):
     symbols = []
-    pattern = re.compile(r"^(NSE:NIFTY|NSE:BANKNIFTY|BSE:SENSEX)\d+")
-    
-    for url in FYERS_MASTER_URLS:
+    pattern = r"^(NSE:NIFTY|NSE:BANKNIFTY|BSE:SENSEX)\d+"
+
+    for segment in FYERS_MASTER_SEGMENTS:
         try:
-            logger.info(f"Fetching option chain from {url}...")
-            text = requests.get(url, timeout=30).text
-            raw = pd.read_csv(StringIO(text), header=None, low_memory=False)
-            
-            ticker_col, expiry_col, strike_col, underlying_col = None, None, None, None
-            for col in raw.columns:
-                sample = raw[col].dropna().astype(str).head(100)
-                if ticker_col is None and (sample.str.startswith("NSE:").any() or sample.str.startswith("BSE:").any()):
-                    ticker_col = col
-                elif pd.api.types.is_numeric_dtype(raw[col]):
-                    num_sample = raw[col].dropna()
-                    if not num_sample.empty:
-                        if expiry_col is None and (num_sample > 1500000000).any() and (num_sample < 2200000000).any():
-                            expiry_col = col
-                        elif strike_col is None and (num_sample > 1000).any() and (num_sample < 200000).any():
-                            strike_col = col
-                elif underlying_col is None and sample.isin(["NIFTY", "BANKNIFTY", "SENSEX"]).any():
-                    underlying_col = col
-
-            if ticker_col is None: ticker_col = 9
-            if expiry_col is None: expiry_col = 8
-            if strike_col is None: strike_col = 16
-            if underlying_col is None: underlying_col = 13
-                
-            tickers = raw[ticker_col].astype(str).str.strip().str.upper()
-            expiries = raw[expiry_col]
-            strikes = pd.to_numeric(raw[strike_col], errors='coerce')
-            underlyings = raw[underlying_col].astype(str).str.strip().str.upper()
-            
-            mask = tickers.str.match(pattern) & tickers.str.endswith(('CE', 'PE'))
-            opt_df = raw[mask].copy()
+            logger.info(f"Loading option chain from {segment} master (cached daily)...")
+            opt_df = OptionIndex(load_fyers_segment(segment)).table
+            opt_df = opt_df[opt_df["ticker"].str.upper().str.match(pattern)]
             if opt_df.empty: continue
-                
-            opt_df['Ticker'], opt_df['Expiry'] = tickers[mask], expiries[mask]
-            opt_df['Strike'], opt_df['Underlying'] = strikes[mask], underlyings[mask]
-            
+
             for prefix, u_key in [("NSE:NIFTY", "NIFTY"), ("NSE:BANKNIFTY", "BANKNIFTY"), ("BSE:SENSEX", "SENSEX")]:
-                u_df = opt_df[opt_df['Underlying'] == u_key]
-                if u_df.empty: u_df = opt_df[opt_df['Ticker'].str.startswith(prefix)]
+                u_df = opt_df[opt_df["underlying"].astype(str) == u_key]
+                if u_df.empty: u_df = opt_df[opt_df["ticker"].str.startswith(prefix)]
                 if u_df.empty: continue
-                
-                min_expiry = u_df['Expiry'].min()
-                nearest_df = u_df[u_df['Expiry'] == min_expiry]
-                
-                center_strike = nearest_df['Strike'].median()
+
+                nearest_df = u_df[u_df["expiry"] == u_df["expiry"].min()]
+
+                center_strike = nearest_df["strike"].median()
                 if not pd.isna(center_strike) and center_strike > 0:
-                    distance_pct = 0.025 
+                    distance_pct = 0.025
                     lower_bound, upper_bound = center_strike * (1 - distance_pct), center_strike * (1 + distance_pct)
-                    nearest_df = nearest_df[(nearest_df['Strike'] >= lower_bound) & (nearest_df['Strike'] <= upper_bound)]
-                
-                symbols.extend(nearest_df['Ticker'].tolist())
-                
+                    nearest_df = nearest_df[(nearest_df["strike"] >= lower_bound) & (nearest_df["strike"] <= upper_bound)]
+
+                symbols.extend(nearest_df["ticker"].str.upper().tolist())
+
         except Exception as e:
-            logger.warning(f"Failed to fetch master data: {e}")
-            
+            logger.warning(f"Failed to load master data: {e}")
+
     out = sorted(list(set(symbols)))
     logger.info(f"Mathematical Filter: Found {len(out)} near-ATM strikes.")
     return out[:cfg.symbol_limit] if cfg.symbol_limit > 0 else out
@@ -0,0 +1,57 @@
+"""symbol_layout.py - Canonical Symbol-Major Tape Layout
+
+One description of how a tape's rows are grouped by symbol, built ONCE per tape
+and handed to every technicals / Renko / velocity / trigger stage, instead of
+each stage re-factorizing the Symbol strings and argsorting them, or re-hashing
+them through groupby("Symbol").
+- `codes`: integer symbol code per row; `offsets`: segment k spans rows
+  offsets[k]:offsets[k + 1] of the symbol-major arrays
+- A tape that is already symbol-contiguous (the canonical layout every engine
+  builds) needs no reordering at all: gather / scatter hand arrays straight
+  through, so the stages run on the frame's own columns
+- Any other row order still works (stable argsort by code, so rows keep their
+  relative order inside each symbol), it just pays one permutation per gather / scatter
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class SymbolLayout:
+    def __init__(self, codes):
+        """`codes` are non-negative integer symbol ids in row order."""
+        self.codes = codes = np.asarray(codes, dtype=np.int64)
+        n = len(codes)
+        starts = np.flatnonzero(np.append(True, codes[1:] != codes[:-1])) if n else np.zeros(0, dtype=np.int64)
+        counts = np.bincount(codes)
+        if len(starts) == np.count_nonzero(counts):
+            # Already one contiguous run per symbol: row order IS symbol-major order.
+            self.order = None
+            self.offsets = np.append(starts, n).astype(np.int64)
+        else:
+            self.order = np.argsort(codes, kind="stable")
+            counts = counts[counts > 0]
+            self.offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=self.offsets[1:])
+
+    @classmethod
+    def of(cls, symbols):
+        """Layout of a Symbol column (the one place its strings get hashed)."""
+        codes, _ = pd.factorize(np.asarray(symbols), sort=False)
+        return cls(codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def gather(self, values, dtype=np.float64):
+        """Row-order values -> symbol-major array."""
+        values = np.asarray(values, dtype=dtype)
+        return values if self.order is None else values[self.order]
+
+    def scatter(self, values):
+        """Symbol-major array -> row order."""
+        if self.order is None:
+            return values
+        out = np.empty_like(values)
+        out[self.order] = values
+        return out
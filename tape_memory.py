@@ -0,0 +1,29 @@
+"""tape_memory.py - Memory-Lean Tape Dtypes
+
+The 1-minute history tape and the execution tape built from it are the largest
+objects of a run (rows = days x 375 minutes x contracts, ~60 columns wide).
+- `compact_tape`: Symbol becomes a categorical (small integer codes instead of
+  one Python string object per row) and OHLC prices become float32, in place
+- Volume stays float64: per-minute option volumes can pass float32's exact
+  integer range (2**24)
+- `frame_megabytes` measures a frame's real footprint (string objects included)
+  for the run profile
+"""
+
+import numpy as np
+
+PRICE_COLUMNS = ("Open", "High", "Low", "Close")
+
+
+def compact_tape(df, float_dtype=np.float32):
+    """Categorical Symbol + `float_dtype` prices, in place; returns df."""
+    if "Symbol" in df and df["Symbol"].dtype != "category":
+        df["Symbol"] = df["Symbol"].astype("category")
+    for name in PRICE_COLUMNS:
+        if name in df and df[name].dtype != float_dtype:
+            df[name] = df[name].astype(float_dtype)
+    return df
+
+
+def frame_megabytes(df):
+    return round(float(df.memory_usage(deep=True).sum()) / 1e6, 1)
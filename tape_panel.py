@@ -0,0 +1,75 @@
+"""tape_panel.py - Dense Time x Symbol Panel for Trade Management
+
+Replaces the `set_index(["Datetime", "Symbol"]).to_dict()` caches the exit loops
+used to build, one per field.
+- ONE time axis (sorted unique bar timestamps) and ONE symbol axis shared by
+  every field; each field is a plain 2-D NumPy array [time_idx, symbol_idx]
+- `present` marks which (time, symbol) cells exist on the tape, so a missing
+  bar still reads as "no LTP" exactly like dict.get() returning None
+- Renko counts / bar counters are small integers and are stored as float32
+  (exact), prices stay float64: a few bytes per cell instead of a tuple-keyed
+  dict entry per cell per field
+- Calendar helpers per time index (date, HH:MM, minute of day) are computed
+  once, so the loop never calls pd.to_datetime() per minute
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TapePanel:
+    def __init__(self, tape, fields):
+        """`fields` maps column name -> storage dtype; missing cells read as 0."""
+        time_idx, times = pd.factorize(tape["Datetime"], sort=True)
+        sym_idx, symbols = pd.factorize(tape["Symbol"], sort=False)
+
+        self.stamps = pd.DatetimeIndex(times)
+        self.symbols = list(symbols)
+        self.sym_index = {sym: i for i, sym in enumerate(self.symbols)}
+        self.shape = (len(self.stamps), len(self.symbols))
+
+        self.present = np.zeros(self.shape, dtype=bool)
+        self.present[time_idx, sym_idx] = True
+
+        self.fields = {}
+        for name, dtype in fields.items():
+            grid = np.zeros(self.shape, dtype=dtype)
+            grid[time_idx, sym_idx] = tape[name].to_numpy(dtype=dtype)
+            self.fields[name] = grid
+
+        self.minute_of_day = (self.stamps.hour * 60 + self.stamps.minute).to_numpy()
+        self.seconds_of_day = self.minute_of_day * 60 + self.stamps.second.to_numpy()
+        self.date_strs = self.stamps.strftime("%Y-%m-%d").to_numpy()
+        self.hhmm_strs = self.stamps.strftime("%H:%M").to_numpy()
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def stamp_str(self, t_idx):
+        return f"{self.date_strs[t_idx]} {self.hhmm_strs[t_idx]}"
+
+    def nbytes(self):
+        return self.present.nbytes + sum(grid.nbytes for grid in self.fields.values())
+
+
+def execution_panel(tape_exec, micro_tf, macro_tfs):
+    """Panel with every field the trade-management loops read."""
+    fields = {
+        "Close": np.float64,
+        f"Renko_Count_{micro_tf}": np.float32,
+        f"Vol_Renko_Count_{micro_tf}": np.float32,
+        f"Bars_Since_Brick_{micro_tf}": np.float32,
+    }
+    for tf in macro_tfs:
+        fields[f"Renko_Count_{tf}"] = np.float32
+        fields[f"Vol_Renko_Count_{tf}"] = np.float32
+    return TapePanel(tape_exec, fields)
+
+
+def seconds_of_day(time_str):
+    """'14:45' / '14:45:30' -> seconds since midnight (matches the panel's seconds_of_day)."""
+    t = pd.to_datetime(time_str).time()
+    return t.hour * 3600 + t.minute * 60 + t.second
@@ -0,0 +1,159 @@
+"""trade_simulator.py - Event-Driven Trade Simulator over a TapePanel
+
+Replaces the per-minute Python state machine in scan_institutional_tape
+(every timestamp x every open episode x dict lookups + iterrows for entries).
+- Exit conditions (velocity stall, micro price / volume reversal, macro price /
+  volume break) become per-symbol boolean columns over the panel's time axis
+- A reverse running minimum turns each column into "next bar at or after t
+  where this condition fires", so an episode's exit is ONE lookup per
+  condition instead of a walk over every following minute
+- Entries are read straight from the anomaly arrays; after an exit the next
+  accepted trigger is found with searchsorted, so work scales with the number
+  of episodes, not minutes x symbols
+- Same semantics as the loop it replaces: exits are checked before entries on
+  each bar (an exit bar may re-enter), only bars present on the tape can exit
+  a trade, entries stop at ENTRY_CUTOFF_TIME, the EOD window closes whatever is
+  still open after that bar's entries, and condition ties resolve in the old
+  check order (stall, micro price, micro volume, then each macro TF price/volume)
+"""
+
+import numpy as np
+
+from tape_panel import seconds_of_day
+
+
+def next_true_index(mask):
+    """For each position i, the first j >= i with mask[j] True (len(mask) if none)."""
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(idx[::-1])[::-1]
+
+
+def _exit_columns(panel, s, direction, micro_tf, macro_tfs, rules):
+    """Ordered (reason, next-hit index) pairs for one symbol column and direction."""
+    present = panel.present[:, s]
+
+    def breaks(field, bricks):
+        values = panel[field][:, s]
+        # Bull trades exit on bearish counts (<= -bricks), bear trades on bullish ones.
+        hit = values <= -bricks if direction == 1 else values >= bricks
+        return next_true_index(hit & present)
+
+    stall = panel[f"Bars_Since_Brick_{micro_tf}"][:, s] > rules["max_stall_bars"]
+    columns = [
+        (f"Velocity Stall (No brick in {rules['max_stall_bars']} bars)", next_true_index(stall & present)),
+        ("Micro Price Reversal", breaks(f"Renko_Count_{micro_tf}", rules["micro_price_bricks"])),
+        ("Micro Volume Reversal", breaks(f"Vol_Renko_Count_{micro_tf}", rules["micro_vol_bricks"])),
+    ]
+    macro = {}
+    for tf in macro_tfs:
+        macro[tf] = [
+            (f"Macro [{tf}] Price Break", breaks(f"Renko_Count_{tf}", rules["macro_price_bricks"])),
+            (f"Macro [{tf}] Volume Break", breaks(f"Vol_Renko_Count_{tf}", rules["macro_vol_bricks"])),
+        ]
+    return columns, macro
+
+
+def simulate_episodes(panel, entries, micro_tf, macro_tfs, max_stall_bars, micro_price_bricks,
+                      micro_vol_bricks, macro_price_bricks, macro_vol_bricks, entry_cutoff,
+                      eod_start, eod_end="16:00", eod_tag="EOD", long_only_exits=False):
+    """Runs every symbol's trade episodes over the whole panel.
+
+    `entries` is the anomaly frame (Datetime, Symbol, Direction, Close and the
+    Armed_Bull_/Armed_Bear_<tf> columns). Returns {symbol: [episode, ...]} in
+    chronological order; each episode carries "entry_row", its position in
+    `entries`, so callers can attach extra per-trigger fields, plus the panel
+    time indexes "entry_bar" / "exit_bar". Symbols are keyed in the order of
+    their first trade, the order the per-minute loop inserted them.
+    `long_only_exits` checks bearish breaks whatever the trade direction.
+    """
+    rules = {
+        "max_stall_bars": max_stall_bars,
+        "micro_price_bricks": micro_price_bricks,
+        "micro_vol_bricks": micro_vol_bricks,
+        "macro_price_bricks": macro_price_bricks,
+        "macro_vol_bricks": macro_vol_bricks,
+    }
+    n_times = len(panel)
+    eod_window = ((panel.seconds_of_day >= seconds_of_day(eod_start))
+                  & (panel.seconds_of_day < seconds_of_day(eod_end)))
+    next_eod = np.append(next_true_index(eod_window), n_times)
+    closes, present = panel["Close"], panel.present
+
+    t_idx = panel.stamps.get_indexer(entries["Datetime"])
+    s_idx = np.array([panel.sym_index[sym] for sym in entries["Symbol"]], dtype=np.int64)
+    directions = entries["Direction"].to_numpy()
+    origins = entries["Close"].to_numpy()
+    armed = {}
+    for tf in macro_tfs:
+        for side in ("Bull", "Bear"):
+            col = f"Armed_{side}_{tf}"
+            armed[(side, tf)] = entries[col].to_numpy() if col in entries else np.zeros(len(entries), dtype=bool)
+
+    eligible = panel.seconds_of_day[t_idx] <= seconds_of_day(entry_cutoff)
+    # Stable symbol-major, time-ordered walk; ties keep the tape's row order like iterrows did.
+    rows = np.flatnonzero(eligible)
+    rows = rows[np.lexsort((t_idx[rows], s_idx[rows]))]
+    bounds = np.flatnonzero(np.r_[True, s_idx[rows][1:] != s_idx[rows][:-1], True])
+
+    memory_bank = {}
+    for b in range(len(bounds) - 1):
+        sym_rows = rows[bounds[b]:bounds[b + 1]]
+        s = s_idx[sym_rows[0]]
+        sym = panel.symbols[s]
+        times = t_idx[sym_rows]
+        exit_cache = {}
+        episodes = []
+        k = 0
+        while k < len(sym_rows):
+            row = sym_rows[k]
+            t_entry = times[k]
+            direction = directions[row]
+            side = "Bull" if direction == 1 else "Bear"
+            triggered = [tf for tf in macro_tfs if armed[(side, tf)][row]]
+
+            check_dir = 1 if (long_only_exits or direction == 1) else -1
+            if check_dir not in exit_cache:
+                exit_cache[check_dir] = _exit_columns(panel, s, check_dir, micro_tf, macro_tfs, rules)
+            columns, macro = exit_cache[check_dir]
+            ordered = columns + [pair for tf in triggered for pair in macro[tf]]
+
+            t_sig, reason = n_times, None
+            if t_entry + 1 < n_times:
+                hits = np.array([hit[t_entry + 1] for _, hit in ordered])
+                first = int(np.argmin(hits))
+                t_sig, reason = int(hits[first]), ordered[first][0]
+            t_eod = int(next_eod[t_entry])
+
+            episode = {
+                "state": "ACTIVE",
+                "origin": origins[row],
+                "date": panel.date_strs[t_entry],
+                "time": panel.hhmm_strs[t_entry],
+                "dir": direction,
+                "exit_time": None,
+                "exit_price": None,
+                "exit_reason": None,
+                "triggering_macro_tfs": triggered,
+                "entry_row": int(row),
+                "entry_bar": int(t_entry),
+                "exit_bar": None,
+            }
+            episodes.append(episode)
+
+            if t_sig < n_times and t_sig <= t_eod:
+                # Exit checks run before entries, so a trigger on the exit bar re-enters.
+                episode.update(state="EXITED", exit_time=panel.stamp_str(t_sig),
+                               exit_price=closes[t_sig, s], exit_reason=reason, exit_bar=t_sig)
+                k += np.searchsorted(times[k:], t_sig, side="left")
+            elif t_eod < n_times:
+                # EOD runs after entries, so nothing on the EOD bar itself can re-enter.
+                episode.update(state="EXITED", exit_time=f"{panel.stamp_str(t_eod)} ({eod_tag})",
+                               exit_price=closes[t_eod, s] if present[t_eod, s] else origins[row],
+                               exit_reason="End of Day Market Close", exit_bar=t_eod)
+                k += np.searchsorted(times[k:], t_eod, side="right")
+            else:
+                break
+        memory_bank[sym] = episodes
+    first_trade = {sym: (eps[0]["entry_bar"], eps[0]["entry_row"]) for sym, eps in memory_bank.items()}
+    return {sym: memory_bank[sym] for sym in sorted(memory_bank, key=first_trade.get)}
@@ -0,0 +1,295 @@
+"""trading_calendar.py - NSE/BSE Trading Calendar (Offline Holiday Table)
+
+Single source of truth for "which days actually trade" across every System
+engine and fetch planner, replacing the `weekday() < 5` loops.
+- Bundled exchange holiday table (no network call at startup); NSE and BSE
+  equity / F&O segments share the same list
+- Special weekend sessions (budget days, DR drills) count as sessions;
+  evening Muhurat sessions are kept separately because they have no 09:15 open
+- Weekly / monthly expiry rules with their effective dates, shifted to the
+  previous session when the expiry day is a holiday
+- Vectorized helpers over ONE sorted datetime64[D] session array:
+  is_session(), session_index(), previous_sessions(), sessions_between()
+- Late circulars can be patched in without a release via
+  TRADING_CALENDAR_EXTRA_HOLIDAYS / TRADING_CALENDAR_EXTRA_SESSIONS
+  (comma-separated YYYY-MM-DD lists)
+
+The table spans CALENDAR_START..CALENDAR_END, the years with bundled holiday
+lists. Dates outside it fall back to plain weekdays (plus the two env lists),
+and the first such lookup prints a one-time warning, because a holiday there is
+otherwise treated as a session.
+"""
+
+import calendar
+import os
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_START = "2024-01-01"
+CALENDAR_END = "2026-12-31"
+REGULAR_SESSION = ("09:15", "15:30")
+
+EXCHANGE_HOLIDAYS = {
+    # 2024
+    "2024-01-22": "Special Holiday (Ram Lalla Pran Pratishtha)",
+    "2024-01-26": "Republic Day",
+    "2024-03-08": "Mahashivratri",
+    "2024-03-25": "Holi",
+    "2024-03-29": "Good Friday",
+    "2024-04-11": "Id-Ul-Fitr (Ramadan)",
+    "2024-04-17": "Shri Ram Navmi",
+    "2024-05-01": "Maharashtra Day",
+    "2024-05-20": "General Parliamentary Elections",
+    "2024-06-17": "Bakri Id",
+    "2024-07-17": "Moharram",
+    "2024-08-15": "Independence Day",
+    "2024-10-02": "Mahatma Gandhi Jayanti",
+    "2024-11-01": "Diwali Laxmi Pujan",
+    "2024-11-15": "Gurunanak Jayanti",
+    "2024-11-20": "Maharashtra Assembly Elections",
+    "2024-12-25": "Christmas",
+    # 2025
+    "2025-02-26": "Mahashivratri",
+    "2025-03-14": "Holi",
+    "2025-03-31": "Id-Ul-Fitr (Ramadan)",
+    "2025-04-10": "Shri Mahavir Jayanti",
+    "2025-04-14": "Dr. Baba Saheb Ambedkar Jayanti",
+    "2025-04-18": "Good Friday",
+    "2025-05-01": "Maharashtra Day",
+    "2025-08-15": "Independence Day",
+    "2025-08-27": "Ganesh Chaturthi",
+    "2025-10-02": "Mahatma Gandhi Jayanti / Dussehra",
+    "2025-10-21": "Diwali Laxmi Pujan",
+    "2025-10-22": "Balipratipada",
+    "2025-11-05": "Prakash Gurpurb Sri Guru Nanak Dev",
+    "2025-12-25": "Christmas",
+    # 2026
+    "2026-01-15": "Maharashtra Municipal Corporation Elections",
+    "2026-01-26": "Republic Day",
+    "2026-03-03": "Holi",
+    "2026-03-26": "Shri Ram Navami",
+    "2026-03-31": "Shri Mahavir Jayanti",
+    "2026-04-03": "Good Friday",
+    "2026-04-14": "Dr. Baba Saheb Ambedkar Jayanti",
+    "2026-05-01": "Maharashtra Day",
+    "2026-05-28": "Bakri Id",
+    "2026-06-26": "Muharram",
+    "2026-09-14": "Ganesh Chaturthi",
+    "2026-10-02": "Mahatma Gandhi Jayanti",
+    "2026-10-20": "Dussehra",
+    "2026-11-10": "Diwali Balipratipada",
+    "2026-11-24": "Prakash Gurpurb Sri Guru Nanak Dev",
+    "2026-12-25": "Christmas",
+}
+
+# Weekend sessions that trade like a normal day (date -> (open, close, label)).
+SPECIAL_SESSIONS = {
+    "2024-01-20": ("09:15", "15:30", "Saturday Full Session"),
+    "2024-03-02": ("09:15", "12:30", "Saturday Special Live Session (DR drill)"),
+    "2024-05-18": ("09:15", "12:30", "Saturday Special Live Session (DR drill)"),
+    "2025-02-01": ("09:15", "15:30", "Union Budget Session"),
+    "2026-02-01": ("09:15", "15:30", "Union Budget Session"),
+}
+
+# One-hour evening sessions; not counted as lookback sessions.
+MUHURAT_SESSIONS = {
+    "2024-11-01": ("18:00", "19:00", "Muhurat Trading"),
+    "2025-10-21": ("13:45", "14:45", "Muhurat Trading"),
+    "2026-11-08": ("18:00", "19:00", "Muhurat Trading"),  # hours provisional until the exchange circular
+}
+
+# Index derivative expiry weekday (Mon=0), as (effective_from, weekday) in date order.
+EXPIRY_WEEKDAY_RULES = {
+    "NSE": [("2000-01-01", 3), ("2025-09-01", 1)],
+    "BSE": [("2000-01-01", 4), ("2025-01-01", 1), ("2025-09-01", 3)],
+}
+
+
+def _env_dates(name):
+    return [d.strip() for d in os.environ.get(name, "").split(",") if d.strip()]
+
+
+TABLE_START, TABLE_END = np.datetime64(CALENDAR_START, "D"), np.datetime64(CALENDAR_END, "D")
+EXTRA_HOLIDAYS = np.array(_env_dates("TRADING_CALENDAR_EXTRA_HOLIDAYS"), dtype="datetime64[D]")
+EXTRA_SESSIONS = np.array(_env_dates("TRADING_CALENDAR_EXTRA_SESSIONS"), dtype="datetime64[D]")
+
+
+def _build_sessions():
+    days = np.arange(TABLE_START, TABLE_END + 1)
+    holidays = np.concatenate([np.array(list(EXCHANGE_HOLIDAYS), dtype="datetime64[D]"), EXTRA_HOLIDAYS])
+    specials = np.concatenate([np.array(list(SPECIAL_SESSIONS), dtype="datetime64[D]"), EXTRA_SESSIONS])
+    is_open = np.is_busday(days, holidays=holidays) | np.isin(days, specials)
+    return days[is_open]
+
+
+SESSIONS = _build_sessions()
+_fallback_warned = False
+
+
+def _to_day(date):
+    """'YYYY-MM-DD' / datetime / Timestamp -> numpy datetime64[D]."""
+    return np.datetime64(pd.Timestamp(date).date(), "D")
+
+
+def _to_days(dates):
+    return pd.to_datetime(np.asarray(dates).ravel()).to_numpy().astype("datetime64[D]")
+
+
+def _fmt(days):
+    return [str(d) for d in np.asarray(days, dtype="datetime64[D]")]
+
+
+def _in_table(day):
+    return TABLE_START <= day <= TABLE_END
+
+
+def _weekday_sessions(days):
+    """Session flags for dates outside the bundled table: weekdays, minus / plus the env lists."""
+    global _fallback_warned
+    if not _fallback_warned:
+        _fallback_warned = True
+        print(f"[Trading Calendar] ⚠️ Dates outside {CALENDAR_START}..{CALENDAR_END} have no bundled holiday list; "
+              f"plain weekdays count as sessions there. Add exchange holidays via TRADING_CALENDAR_EXTRA_HOLIDAYS.")
+    return np.is_busday(days, holidays=EXTRA_HOLIDAYS) | np.isin(days, EXTRA_SESSIONS)
+
+
+def _fallback_weekdays(end_day, count):
+    """Day-by-day walk back from `end_day` for lookups that leave the bundled table."""
+    out, day = [], end_day
+    while len(out) < count:
+        if is_session(day):
+            out.append(day)
+        day -= 1
+    return out[::-1]
+
+
+# ------------------------------------------------------------------------------
+# Vectorized helpers
+# ------------------------------------------------------------------------------
+def is_session(dates):
+    """True where the date trades. Scalar in -> bool, array-like in -> bool ndarray."""
+    if np.ndim(dates) == 0:
+        day = _to_day(dates)
+        if not _in_table(day):
+            return bool(_weekday_sessions(day))
+        return bool(SESSIONS[np.searchsorted(SESSIONS, day)] == day)
+    days = _to_days(dates)
+    pos = np.minimum(np.searchsorted(SESSIONS, days), len(SESSIONS) - 1)
+    out = SESSIONS[pos] == days
+    outside = (days < TABLE_START) | (days > TABLE_END)
+    if outside.any():
+        out[outside] = _weekday_sessions(days[outside])
+    return out
+
+
+def session_index(timestamps):
+    """Position of each timestamp's day in SESSIONS (-1 for non-session days)."""
+    days = _to_days(timestamps)
+    pos = np.searchsorted(SESSIONS, days)
+    hit = SESSIONS[np.minimum(pos, len(SESSIONS) - 1)] == days
+    return np.where(hit, pos, -1).astype(np.int64)
+
+
+def previous_sessions(date, n):
+    """The last `n` sessions on or before `date` (inclusive), oldest first, as 'YYYY-MM-DD'."""
+    day = _to_day(date)
+    if not _in_table(day):
+        return _fmt(_fallback_weekdays(day, n))
+    end = np.searchsorted(SESSIONS, day, side="right")
+    if end < n:
+        return _fmt(_fallback_weekdays(SESSIONS[0] - 1, n - end) + list(SESSIONS[:end]))
+    return _fmt(SESSIONS[end - n:end])
+
+
+def previous_session(date):
+    """The session strictly before `date`."""
+    day = _to_day(date)
+    pos = np.searchsorted(SESSIONS, day, side="left")
+    if not _in_table(day) or pos == 0:
+        return _fmt(_fallback_weekdays(day - 1, 1))[0]
+    return _fmt([SESSIONS[pos - 1]])[0]
+
+
+def next_session(date):
+    """The session strictly after `date`."""
+    day = _to_day(date)
+    pos = np.searchsorted(SESSIONS, day, side="right")
+    if _in_table(day) and pos < len(SESSIONS):
+        return _fmt([SESSIONS[pos]])[0]
+    day += 1
+    while not is_session(day):
+        day += 1
+    return str(day)
+
+
+def last_session_on_or_before(date):
+    return previous_sessions(date, 1)[0]
+
+
+def sessions_between(from_date, to_date):
+    """Every session in [from_date, to_date] as 'YYYY-MM-DD'."""
+    lo, hi = _to_day(from_date), _to_day(to_date)
+    if _in_table(lo) and _in_table(hi):
+        return _fmt(SESSIONS[np.searchsorted(SESSIONS, lo, side="left"):np.searchsorted(SESSIONS, hi, side="right")])
+    days = np.arange(lo, hi + 1)
+    is_open = np.isin(days, SESSIONS)
+    outside = (days < TABLE_START) | (days > TABLE_END)
+    if outside.any():
+        is_open[outside] = _weekday_sessions(days[outside])
+    return _fmt(days[is_open])
+
+
+def session_hours(date):
+    """(open, close) 'HH:MM' for a session day, None when the market is shut."""
+    key = str(_to_day(date))
+    if key in SPECIAL_SESSIONS:
+        return SPECIAL_SESSIONS[key][:2]
+    if is_session(key):
+        return REGULAR_SESSION
+    if key in MUHURAT_SESSIONS:
+        return MUHURAT_SESSIONS[key][:2]
+    return None
+
+
+# ------------------------------------------------------------------------------
+# Expiry rules
+# ------------------------------------------------------------------------------
+def expiry_weekday(date, exchange="NSE"):
+    day = str(_to_day(date))
+    weekday = None
+    for effective_from, rule_weekday in EXPIRY_WEEKDAY_RULES[exchange]:
+        if day >= effective_from:
+            weekday = rule_weekday
+    return weekday
+
+
+def _roll_back_to_session(day):
+    while not is_session(day):
+        day -= 1
+    return day
+
+
+def monthly_expiry(year, month, exchange="NSE"):
+    """Last expiry-weekday of the month, moved to the previous session on a holiday (None before any rule)."""
+    last = np.datetime64(f"{year:04d}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}")
+    weekday = expiry_weekday(str(last), exchange)
+    if weekday is None:
+        return None
+    last -= (pd.Timestamp(last).weekday() - weekday) % 7
+    return str(_roll_back_to_session(last))
+
+
+def weekly_expiry(on_or_after, exchange="NSE"):
+    """First weekly expiry that is still tradable on or after `on_or_after`."""
+    day = _to_day(on_or_after)
+    while True:
+        target = day + (expiry_weekday(str(day), exchange) - pd.Timestamp(day).weekday()) % 7
+        expiry = _roll_back_to_session(target)
+        if expiry >= _to_day(on_or_after):
+            return str(expiry)
+        day = target + 1
+
+
+def is_expiry_day(date, exchange="NSE"):
+    return is_session(date) and weekly_expiry(date, exchange) == str(_to_day(date))
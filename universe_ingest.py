@@ -0,0 +1,45 @@
+"""universe_ingest.py - Multi-Day 1-Minute Universe Tape for the Equity Screeners
+
+Shared by System.py and System2.py, so the ingestion path cannot drift between them.
+- One RANGED request per symbol per date window (async_fetcher.fetch_days), all
+  drawing from the shared Upstox rate limit, instead of one per symbol per day
+- Adds the screeners' Symbol / Turnover / abs_move columns per symbol
+- Returns the tape in day-major, universe order (the layout of the old per-day loop)
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from async_fetcher import fetch_days
+
+
+def fetch_universe_tape(universe, trading_days):
+    """Ranged, concurrent 1-minute ingestion for the whole universe across `trading_days`, or None."""
+    if not os.environ.get("UPSTOX_ACCESS_TOKEN") or not universe or not trading_days:
+        return None
+    today_str = (datetime.utcnow() + timedelta(hours=5, minutes=30)).strftime("%Y-%m-%d")
+    started = time.time()
+    candles = fetch_days([item['key'] for item in universe], trading_days, broker="UPSTOX",
+                         live_day=today_str if today_str in trading_days else None)
+
+    frames = []
+    for item in universe:
+        df = candles.get(item['key'])
+        if df is not None and not df.empty:
+            df = df.copy()
+            df['Symbol'] = item['symbol']
+            df['Turnover'] = df['Volume'] * df['Close']
+            df['abs_move'] = (df['Close'] - df['Open']).abs()
+            frames.append(df)
+    if not frames:
+        return None
+
+    tape = pd.concat(frames, ignore_index=True)
+    day_order = np.argsort(tape['Datetime'].dt.normalize().to_numpy(), kind='stable')
+    tape = tape.iloc[day_order].reset_index(drop=True)
+    print(f"   [Ingestion] {len(frames)}/{len(universe)} symbols | {len(tape):,} candles in {time.time() - started:.1f}s")
+    return tape